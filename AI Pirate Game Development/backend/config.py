@@ -16,6 +16,14 @@ class Settings(BaseSettings):
     kie_ai_api_key: str = os.getenv("KIE_AI_API_KEY", "")
     openrouter_api_key: str = os.getenv("OPENROUTER_API_KEY", "")
     openrouter_base_url: str = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+    kie_ai_base_url: str = os.getenv("KIE_AI_BASE_URL", "https://api.kie.ai/api/v1")
+    
+    # Upstream HTTP connection pool (shared by all services)
+    upstream_http2: bool = os.getenv("UPSTREAM_HTTP2", "True").lower() == "true"
+    upstream_max_connections: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "50"))
+    upstream_max_keepalive_connections: int = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    upstream_keepalive_expiry: float = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+    upstream_connect_timeout: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "10"))
     
     # ElevenLabs (via Kie.ai)
     elevenlabs_model: str = os.getenv("ELEVENLABS_MODEL", "elevenlabs/text-to-speech-turbo-2-5")
@@ -33,6 +41,10 @@ class Settings(BaseSettings):
     tts_format: str = os.getenv("TTS_FORMAT", "mp3")  # mp3/wav for TTS-only
     use_gpt_audio: bool = os.getenv("USE_GPT_AUDIO", "True").lower() == "true"
     
+    # LLM models for the merit evaluator and the semantic treasure-phrase check
+    evaluation_model: str = os.getenv("EVALUATION_MODEL", "anthropic/claude-sonnet-4.5")
+    validator_model: str = os.getenv("VALIDATOR_MODEL", "anthropic/claude-sonnet-4.5")
+    
     # Server
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", 8000))
@@ -52,6 +64,155 @@ class Settings(BaseSettings):
     loss_threshold_medium: int = -50
     loss_threshold_hard: int = -90
     
+    # Streaming replies: characters held back until the forbidden-phrase checks pass
+    stream_holdback_chars: int = int(os.getenv("STREAM_HOLDBACK_CHARS", "48"))
+    
+    # Speculative generation: run the merit check and pirate generation in parallel
+    speculative_generation: bool = os.getenv("SPECULATIVE_GENERATION", "False").lower() == "true"
+    speculative_margin: int = int(os.getenv("SPECULATIVE_MARGIN", "10"))  # Launch both prompt variants this close to the threshold
+    
+    # Incremental merit evaluation: send only scores + rolling summary + newest exchange
+    incremental_merit: bool = os.getenv("INCREMENTAL_MERIT", "False").lower() == "true"
+    merit_full_eval_interval: int = int(os.getenv("MERIT_FULL_EVAL_INTERVAL", "5"))  # Full re-evaluation every N turns
+    merit_summary_max_chars: int = int(os.getenv("MERIT_SUMMARY_MAX_CHARS", "600"))
+    
+    # Fused validation: pirate model self-reports gives_treasure instead of a separate semantic check
+    fused_validation: bool = os.getenv("FUSED_VALIDATION", "False").lower() == "true"
+    fused_audit_sample_rate: float = float(os.getenv("FUSED_AUDIT_SAMPLE_RATE", "0.1"))  # Share of turns re-checked in the background
+    
+    # Tiered treasure-giving detection: local classifier rules out clear negatives, the LLM decides the rest
+    # (keep off until a model's held-out evaluation backs TREASURE_CLASSIFIER_LOW)
+    treasure_classifier_enabled: bool = os.getenv("TREASURE_CLASSIFIER", "False").lower() == "true"
+    treasure_classifier_low: float = float(os.getenv("TREASURE_CLASSIFIER_LOW", "0.1"))  # Below: not giving treasure
+    treasure_check_log_path: str = os.getenv("TREASURE_CHECK_LOG", "")  # JSONL of LLM-checked replies for retraining
+    
+    # Per-turn deadline: stages that overrun their slice degrade instead of waiting on upstream timeouts
+    turn_deadline_seconds: float = float(os.getenv("TURN_DEADLINE_SECONDS", "0"))  # 0 disables; Sonnet turns need ~20+
+    turn_merit_share: float = float(os.getenv("TURN_MERIT_SHARE", "0.4"))  # Of the turn budget, for the merit check
+    turn_validation_reserve_seconds: float = float(os.getenv("TURN_VALIDATION_RESERVE_SECONDS", "1.0"))  # Kept back from generation
+    
+    # How often in-flight turns and audio streams check whether the client is still connected
+    disconnect_poll_interval: float = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+    
+    # Admission control: concurrent requests per upstream, then a bounded wait queue (429/503 + Retry-After)
+    admission_control: bool = os.getenv("ADMISSION_CONTROL", "True").lower() == "true"
+    admission_llm_concurrency: int = int(os.getenv("ADMISSION_LLM_CONCURRENCY", "16"))  # Conversation turns
+    admission_llm_queue: int = int(os.getenv("ADMISSION_LLM_QUEUE", "64"))
+    admission_stt_concurrency: int = int(os.getenv("ADMISSION_STT_CONCURRENCY", "8"))
+    admission_stt_queue: int = int(os.getenv("ADMISSION_STT_QUEUE", "32"))
+    admission_tts_concurrency: int = int(os.getenv("ADMISSION_TTS_CONCURRENCY", "8"))  # On-demand audio streams
+    admission_tts_queue: int = int(os.getenv("ADMISSION_TTS_QUEUE", "32"))
+    admission_max_queue_seconds: float = float(os.getenv("ADMISSION_MAX_QUEUE_SECONDS", "10"))
+    
+    # Fair sharing between clients: weighted fair queuing plus a token bucket per client for LLM turns
+    admission_client_key: str = os.getenv("ADMISSION_CLIENT_KEY", "ip")  # "ip" or "game" (game_id)
+    admission_llm_client_rate: float = float(os.getenv("ADMISSION_LLM_CLIENT_RATE", "0"))  # Turns/second refill, 0 = unlimited (off: classrooms share one IP behind NAT)
+    admission_llm_client_burst: float = float(os.getenv("ADMISSION_LLM_CLIENT_BURST", "20"))
+    admission_weight_easy: float = float(os.getenv("ADMISSION_WEIGHT_EASY", "1.0"))
+    admission_weight_medium: float = float(os.getenv("ADMISSION_WEIGHT_MEDIUM", "1.0"))
+    admission_weight_hard: float = float(os.getenv("ADMISSION_WEIGHT_HARD", "0.5"))  # Sonnet turns hold a slot longer
+    admission_max_clients: int = int(os.getenv("ADMISSION_MAX_CLIENTS", "1024"))
+    
+    # Game state storage: memory (single worker), sqlite (WAL, one host) or redis (any Redis-protocol server)
+    game_store: str = os.getenv("GAME_STORE", "memory")
+    game_store_path: str = os.getenv("GAME_STORE_PATH", "games.db")
+    redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    redis_key_prefix: str = os.getenv("REDIS_KEY_PREFIX", "pirat:")
+    game_lock_lease_seconds: float = float(os.getenv("GAME_LOCK_LEASE_SECONDS", "30"))  # Renewed while held; bounds the wait after a crashed worker
+    game_lock_wait_seconds: float = float(os.getenv("GAME_LOCK_WAIT_SECONDS", "120"))
+    
+    # Game eviction (idle TTL applies to every store, the count/byte limits and archive to GAME_STORE=memory)
+    game_idle_ttl_seconds: float = float(os.getenv("GAME_IDLE_TTL_SECONDS", "3600"))  # 0 keeps games forever
+    game_max_count: int = int(os.getenv("GAME_MAX_COUNT", "5000"))  # 0 = unlimited
+    game_max_bytes: int = int(os.getenv("GAME_MAX_BYTES", str(256 * 1024 * 1024)))  # Estimated from history size, 0 = unlimited
+    game_sweep_interval_seconds: float = float(os.getenv("GAME_SWEEP_INTERVAL_SECONDS", "60"))
+    game_evicted_ids_max: int = int(os.getenv("GAME_EVICTED_IDS_MAX", "100000"))  # Remembered for 410 responses
+    game_tombstone_seconds: float = float(os.getenv("GAME_TOMBSTONE_SECONDS", "604800"))  # Expired IDs kept by sqlite/redis for 410s
+    game_archive_path: str = os.getenv("GAME_ARCHIVE_PATH", "")  # JSONL archive of evicted games
+    
+    # Idempotency-Key on /api/game/conversation
+    idempotency_ttl_seconds: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+    idempotency_max_entries: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    
+    # Background TTS per turn (started as soon as the reply is final, for requests with pregenerate_audio)
+    audio_pregeneration: bool = os.getenv("AUDIO_PREGENERATION", "true").lower() == "true"
+    turn_audio_max_bytes: int = int(os.getenv("TURN_AUDIO_MAX_BYTES", str(8 * 1024 * 1024)))  # Per turn
+    turn_audio_max_turns: int = int(os.getenv("TURN_AUDIO_MAX_TURNS", "200"))  # Buffers kept in memory
+    turn_audio_ttl_seconds: float = float(os.getenv("TURN_AUDIO_TTL_SECONDS", "300"))  # After synthesis finished
+    
+    # Content-addressed TTS cache (memory LRU + on-disk LRU)
+    tts_cache_enabled: bool = os.getenv("TTS_CACHE", "True").lower() == "true"
+    tts_cache_dir: str = os.getenv("TTS_CACHE_DIR", ".tts_cache")  # Empty = memory tier only
+    tts_cache_memory_bytes: int = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+    tts_cache_disk_bytes: int = int(os.getenv("TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+    tts_cache_max_entry_bytes: int = int(os.getenv("TTS_CACHE_MAX_ENTRY_BYTES", str(4 * 1024 * 1024)))
+    
+    # Startup pre-rendering of canned lines into the TTS cache
+    audio_warmup: bool = os.getenv("AUDIO_WARMUP", "True").lower() == "true"
+    prerender_greetings: bool = os.getenv("PRERENDER_GREETINGS", "False").lower() == "true"
+    audio_warmup_concurrency: int = int(os.getenv("AUDIO_WARMUP_CONCURRENCY", "3"))
+    
+    # Kie.ai task completion: shared adaptive poller + optional webhook
+    kie_poll_initial_interval: float = float(os.getenv("KIE_POLL_INITIAL_INTERVAL", "0.25"))
+    kie_poll_max_interval: float = float(os.getenv("KIE_POLL_MAX_INTERVAL", "2.0"))
+    kie_poll_backoff: float = float(os.getenv("KIE_POLL_BACKOFF", "1.5"))
+    kie_poll_max_concurrency: int = int(os.getenv("KIE_POLL_MAX_CONCURRENCY", "8"))  # recordInfo requests in flight
+    kie_callback_base_url: str = os.getenv("KIE_CALLBACK_BASE_URL", "")  # Public URL of this backend, enables callBackUrl
+    kie_callback_token: str = os.getenv("KIE_CALLBACK_TOKEN", "")  # Shared secret checked by the webhook
+    kie_poll_callback_delay: float = float(os.getenv("KIE_POLL_CALLBACK_DELAY", "5.0"))  # First poll when a webhook is set
+    
+    # Optional post-processing of the GPT Audio PCM16 stream (needs numpy: pip install ".[audio]")
+    audio_postprocess: bool = os.getenv("AUDIO_POSTPROCESS", "False").lower() == "true"
+    audio_output_sample_rate: int = int(os.getenv("AUDIO_OUTPUT_SAMPLE_RATE", "16000"))
+    audio_input_channels: int = int(os.getenv("AUDIO_INPUT_CHANNELS", "1"))  # >1 is downmixed to mono
+    audio_output_codec: str = os.getenv("AUDIO_OUTPUT_CODEC", "pcm16")  # pcm16 or mulaw
+    audio_output_wav_header: bool = os.getenv("AUDIO_OUTPUT_WAV_HEADER", "False").lower() == "true"
+    
+    # Sentence-pipelined TTS: synthesise multi-sentence replies per sentence, in parallel, streamed in order
+    tts_sentence_pipeline: bool = os.getenv("TTS_SENTENCE_PIPELINE", "False").lower() == "true"
+    tts_sentence_parallelism: int = int(os.getenv("TTS_SENTENCE_PARALLELISM", "2"))
+    tts_sentence_min_chars: int = int(os.getenv("TTS_SENTENCE_MIN_CHARS", "20"))  # Shorter fragments are merged
+    
+    # Hedged TTS: start the other backend (Kie.ai / GPT Audio) if the primary has no first byte in time
+    tts_hedging: bool = os.getenv("TTS_HEDGING", "False").lower() == "true"
+    tts_hedge_initial_delay: float = float(os.getenv("TTS_HEDGE_INITIAL_DELAY", "1.5"))  # Until enough samples
+    tts_hedge_min_samples: int = int(os.getenv("TTS_HEDGE_MIN_SAMPLES", "20"))
+    tts_hedge_quantile: float = float(os.getenv("TTS_HEDGE_QUANTILE", "0.95"))  # Of primary first-byte latency
+    tts_hedge_min_delay: float = float(os.getenv("TTS_HEDGE_MIN_DELAY", "0.3"))
+    tts_hedge_max_delay: float = float(os.getenv("TTS_HEDGE_MAX_DELAY", "5.0"))
+    
+    # Model routing: per-model circuit breakers and fallback chains (comma-separated) per role
+    llm_routing: bool = os.getenv("LLM_ROUTING", "True").lower() == "true"
+    llm_fallbacks_pirate: str = os.getenv("LLM_FALLBACKS_PIRATE", "google/gemini-3-flash-preview,anthropic/claude-sonnet-4.5")
+    llm_fallbacks_evaluator: str = os.getenv("LLM_FALLBACKS_EVALUATOR", "google/gemini-3-flash-preview")
+    llm_fallbacks_validator: str = os.getenv("LLM_FALLBACKS_VALIDATOR", "google/gemini-3-flash-preview")
+    llm_budget_pirate_seconds: float = float(os.getenv("LLM_BUDGET_PIRATE_SECONDS", "15"))  # To first token when streaming
+    llm_budget_evaluator_seconds: float = float(os.getenv("LLM_BUDGET_EVALUATOR_SECONDS", "12"))
+    llm_budget_validator_seconds: float = float(os.getenv("LLM_BUDGET_VALIDATOR_SECONDS", "8"))
+    llm_budget_deadline_share: float = float(os.getenv("LLM_BUDGET_DEADLINE_SHARE", "0.6"))  # Of the stage time left, rest kept for the fallback
+    llm_breaker_failures: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # Consecutive
+    llm_breaker_error_rate: float = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+    llm_breaker_min_samples: int = int(os.getenv("LLM_BREAKER_MIN_SAMPLES", "10"))
+    llm_breaker_cooldown_seconds: float = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+    llm_stats_window: int = int(os.getenv("LLM_STATS_WINDOW", "50"))
+    
+    # Usage ledger: tokens, cost and latency per game, turn and stage (GET /api/admin/usage)
+    usage_ledger: bool = os.getenv("USAGE_LEDGER", "True").lower() == "true"
+    usage_ledger_max_entries: int = int(os.getenv("USAGE_LEDGER_MAX_ENTRIES", "50000"))  # Ring of individual calls
+    usage_ledger_max_games: int = int(os.getenv("USAGE_LEDGER_MAX_GAMES", "10000"))  # Per-game totals kept
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")  # Bearer token for /api/admin/*; unset = admin API disabled
+    
+    # Per-game token budgets (0 = unlimited); past it each role switches to its budget model
+    token_budget_easy: int = int(os.getenv("TOKEN_BUDGET_EASY", "0"))
+    token_budget_medium: int = int(os.getenv("TOKEN_BUDGET_MEDIUM", "0"))
+    token_budget_hard: int = int(os.getenv("TOKEN_BUDGET_HARD", "0"))
+    token_budget_pirate_model: str = os.getenv("TOKEN_BUDGET_PIRATE_MODEL", "google/gemini-3-flash-preview")
+    token_budget_evaluator_model: str = os.getenv("TOKEN_BUDGET_EVALUATOR_MODEL", "google/gemini-3-flash-preview")
+    token_budget_validator_model: str = os.getenv("TOKEN_BUDGET_VALIDATOR_MODEL", "google/gemini-3-flash-preview")
+    
+    # Prometheus metrics at GET /metrics (recording is always on; this only hides the endpoint)
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    
     # Score range
     score_min: int = -100
     score_max: int = 100
@@ -67,6 +228,10 @@ DIFFICULTY_LEVELS: Dict[str, Dict[str, Any]] = {
         "name": "Łatwy",
         "merit_threshold": 40,
         "loss_threshold": -30,
+        "greetings": [  # Opening lines, pre-rendered to audio at startup with PRERENDER_GREETINGS
+            "Ahoj, przyjacielu! Siadaj, pogadajmy, tylko trzymaj się z dala od mojego skarbu!",
+            "Witaj na pokładzie! Czego szukasz na moim statku?"
+        ],
         "llm_model": "google/gemini-3-flash-preview",  # Google Gemini 3 Flash Preview via OpenRouter
         "system_prompt_base": """Jesteś Kapitanem {name}, przyjaznym i ufnym piratem, który chroni swój skarb. 
 Masz ukryty skarb, który jest dla ciebie bardzo cenny. Dostosowujesz się do osoby, z którą rozmawiasz - jeśli to członek załogi, traktujesz go jak załogę. 
@@ -82,6 +247,10 @@ WAŻNE: Twoje odpowiedzi muszą być KRÓTKIE - maksymalnie 2 zdania. Bądź zwi
         "name": "Średni",
         "merit_threshold": 60,
         "loss_threshold": -50,
+        "greetings": [
+            "Ahoj! Kim jesteś i czego chcesz od starego pirata?",
+            "Hmm, nowa twarz na pokładzie... Mów, czego szukasz, ale uważaj na słowa."
+        ],
         "llm_model": "anthropic/claude-sonnet-4.5",  # Anthropic Claude Sonnet 4.5 via OpenRouter
         "system_prompt_base": """Jesteś Kapitanem {name}, ostrożnym ale elastycznym piratem, który chroni swój skarb. 
 Masz ukryty skarb, który jest dla ciebie bardzo cenny. Dostosowujesz swoje zachowanie do osoby, z którą rozmawiasz - członkowie załogi, kupcy, przyjaciele itp. 
@@ -96,6 +265,10 @@ WAŻNE: Twoje odpowiedzi muszą być KRÓTKIE - maksymalnie 2 zdania. Bądź zwi
         "name": "Trudny",
         "merit_threshold": 80,
         "loss_threshold": -90,
+        "greetings": [
+            "Stój! Nikt nie wchodzi na mój pokład bez powodu. Gadaj, kim jesteś!",
+            "Znam wszystkie sztuczki, szczurze lądowy. Zobaczmy, czym mnie dziś zaskoczysz."
+        ],
         "llm_model": "anthropic/claude-sonnet-4.5",  # Anthropic Claude Sonnet 4.5 via OpenRouter (best model)
         "system_prompt_base": """Jesteś Kapitanem {name}, wysoce inteligentnym i bardzo podejrzliwym piratem, który chroni swój skarb. 
 Masz ukryty skarb, który jest dla ciebie niezwykle cenny. Dostosowujesz się do partnerów rozmowy - jeśli twierdzą że są załogą, traktujesz ich jak załogę. 
@@ -1,7 +1,7 @@
 """
 LangGraph state machine for conversation flow
 """
-from typing import TypedDict, Annotated, Literal, Dict, Optional
+from typing import TypedDict, Annotated, Literal, Dict, Optional, AsyncIterator, Any
 from langgraph.graph import StateGraph, END
 try:
     from langgraph.graph.message import add_messages
@@ -11,9 +11,26 @@ except ImportError:
 from langchain_core.messages import HumanMessage, AIMessage
 from backend.services.openrouter_service import OpenRouterService
 from backend.services.merit_check import MeritCheckService
-from backend.services.validation import ValidationService
-from backend.config import DIFFICULTY_LEVELS, FORBIDDEN_PHRASE
+from backend.services.validation import ValidationService, StreamingPhraseGuard, FUSED_REPLY_INSTRUCTION
+from backend.services.metrics import metrics
+from backend.services.model_router import model_router
+from backend.config import DIFFICULTY_LEVELS, FORBIDDEN_PHRASE, settings
+import functools
 import operator
+import asyncio
+import random
+import time
+
+
+def timed_node(node: str):
+    """Record a node's duration in pirate_graph_node_seconds (graph and streaming paths alike)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with metrics.node_seconds.time(node):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
 
 
 class ConversationState(TypedDict):
@@ -25,6 +42,7 @@ class ConversationState(TypedDict):
     strategies_attempted: list
     player_personas: list
     merit_score: int
+    previous_merit_score: int  # Score after the previous turn (used to guess the prompt variant)
     merit_has_earned_it: bool
     pirate_response: str
     is_blocked: bool
@@ -33,6 +51,10 @@ class ConversationState(TypedDict):
     similar_treasure_phrase_detected: bool
     similarity_confidence: float
     negative_categories: Optional[Dict[str, int]]  # Optional: negative point categories breakdown
+    merit_evaluator_state: Optional[Dict[str, Any]]  # Incremental merit mode: previous scores + rolling summary
+    fused_verdict: Optional[Dict[str, Any]]  # Fused validation mode: pirate's self-declared gives_treasure + confidence
+    deadline: Optional[float]  # time.monotonic() by which the turn should finish (None = no deadline)
+    degraded_stages: list  # Stages that ran out of budget and used a fallback
 
 
 class ConversationGraph:
@@ -42,6 +64,35 @@ class ConversationGraph:
         self.llm_service = OpenRouterService()
         self.merit_service = MeritCheckService()
         self.validation_service = ValidationService()
+        self.speculative = settings.speculative_generation
+        self.fused = settings.fused_validation
+        # Counters for speculative generation (merit check and generation run in parallel)
+        self.speculation_stats: Dict[str, int] = {
+            "turns": 0,
+            "hits": 0,              # Guessed prompt variant was correct
+            "misses": 0,            # Guess was wrong
+            "rescued": 0,           # Wrong guess, but the other variant was already running
+            "regenerated": 0,       # Wrong guess, generation had to start over
+            "both_launched": 0,     # Score was near the threshold, both variants started
+            "cancelled": 0          # Losing branches cancelled
+        }
+        # Background audits comparing the fused verdict with the standalone semantic check
+        self.fused_audit_stats: Dict[str, int] = {
+            "audited": 0,
+            "agreed": 0,
+            "fused_missed": 0,      # Semantic check found treasure-giving, fused verdict did not
+            "fused_extra": 0,       # Fused verdict found treasure-giving, semantic check did not
+            "failed": 0
+        }
+        self._audit_tasks = set()
+        # Stages that ran over their slice of the turn deadline
+        self.deadline_stats: Dict[str, int] = {
+            "turns": 0,
+            "degraded_turns": 0,
+            "merit_check": 0,       # Heuristic fallback evaluation used
+            "generate_response": 0, # Canned reply used
+            "semantic_check": 0     # Decided from the regex checks alone
+        }
         self.graph = self._build_graph()
         
     def _build_graph(self) -> StateGraph:
@@ -49,16 +100,23 @@ class ConversationGraph:
         workflow = StateGraph(ConversationState)
         
         # Add nodes
-        workflow.add_node("merit_check", self._merit_check_node)
-        workflow.add_node("generate_response", self._generate_response_node)
+        if self.speculative:
+            # Merit check and generation run concurrently inside one node
+            workflow.add_node("generate_response", self._speculative_generate_node)
+        else:
+            workflow.add_node("merit_check", self._merit_check_node)
+            workflow.add_node("generate_response", self._generate_response_node)
         workflow.add_node("validate_response", self._validate_response_node)
         workflow.add_node("handle_blocked", self._handle_blocked_node)
         
         # Set entry point
-        workflow.set_entry_point("merit_check")
+        if self.speculative:
+            workflow.set_entry_point("generate_response")
+        else:
+            workflow.set_entry_point("merit_check")
+            workflow.add_edge("merit_check", "generate_response")
         
         # Add edges
-        workflow.add_edge("merit_check", "generate_response")
         workflow.add_conditional_edges(
             "generate_response",
             self._should_validate,
@@ -79,14 +137,40 @@ class ConversationGraph:
         
         return workflow.compile()
     
+    @timed_node("merit_check")
     async def _merit_check_node(self, state: ConversationState) -> ConversationState:
-        """Evaluate player deception/misguidance using LLM"""
-        evaluation = await self.merit_service.evaluate_merit(
-            conversation_history=state["conversation_history"],
-            difficulty=state["difficulty"],
-            strategies_attempted=state["strategies_attempted"],
-            player_personas=state["player_personas"]
-        )
+        """Evaluate player deception/misguidance using LLM (heuristic fallback if over its deadline slice)"""
+        budget = self._time_left(state)
+        if budget is not None:
+            budget *= settings.turn_merit_share
+        
+        if settings.incremental_merit:
+            outcome = await self._within_budget(state, "merit_check", budget, self.merit_service.evaluate_merit_incremental(
+                conversation_history=state["conversation_history"],
+                difficulty=state["difficulty"],
+                strategies_attempted=state["strategies_attempted"],
+                player_personas=state["player_personas"],
+                evaluator_state=state.get("merit_evaluator_state")
+            ))
+            evaluation = None
+            if outcome is not None:
+                evaluation, state["merit_evaluator_state"] = outcome
+        else:
+            evaluation = await self._within_budget(state, "merit_check", budget, self.merit_service.evaluate_merit(
+                conversation_history=state["conversation_history"],
+                difficulty=state["difficulty"],
+                strategies_attempted=state["strategies_attempted"],
+                player_personas=state["player_personas"]
+            ))
+        
+        if evaluation is None:
+            # Keep the incremental evaluator state - the next turn picks up from the last real evaluation
+            evaluation = self.merit_service.evaluate_merit_fallback(
+                conversation_history=state["conversation_history"],
+                difficulty=state["difficulty"],
+                strategies_attempted=state["strategies_attempted"],
+                player_personas=state["player_personas"]
+            )
         
         state["merit_score"] = evaluation.total_score
         state["merit_has_earned_it"] = evaluation.has_earned_it
@@ -105,8 +189,112 @@ class ConversationGraph:
         
         return state
     
+    @timed_node("generate_response")
     async def _generate_response_node(self, state: ConversationState) -> ConversationState:
         """Generate pirate response using LLM"""
+        raw_output = await self._within_budget(
+            state, "generate_response", self._generation_budget(state), self._generate_pirate_text(state)
+        )
+        return self._apply_generation(state, raw_output)
+    
+    async def _generate_pirate_text(self, state: ConversationState) -> str:
+        """Generate the pirate reply for the prompt variant selected by merit_has_earned_it"""
+        model, messages = self._build_generation_request(state, fused=self.fused)
+        
+        # Generate response (non-streaming; see stream_message for token streaming)
+        # Limit max_tokens to ensure short responses (max 2 sentences ~ 100-150 tokens)
+        return await self.llm_service.generate_response(
+            messages=messages,
+            model=model,
+            temperature=0.7,
+            max_tokens=200 if self.fused else 150,  # Limit to ~2 sentences (+ JSON wrapper when fused)
+            stream=False,
+            model_role="pirate"
+        )
+    
+    def _apply_generation(self, state: ConversationState, raw_output: Optional[str]) -> ConversationState:
+        """Store generated output as pirate_response (unwrapping the fused JSON payload if enabled)"""
+        if raw_output is None:
+            # Generation ran out of turn budget - answer with a canned refusal
+            state["pirate_response"] = self.validation_service._generate_alternative_response()
+            state["fused_verdict"] = None
+        elif self.fused:
+            reply, gives_treasure, confidence = self.validation_service.parse_fused_reply(raw_output)
+            state["pirate_response"] = reply
+            state["fused_verdict"] = None if gives_treasure is None else {
+                "gives_treasure": gives_treasure,
+                "confidence": confidence
+            }
+        else:
+            state["pirate_response"] = raw_output
+        return state
+    
+    async def _speculative_generate_node(self, state: ConversationState) -> ConversationState:
+        """Run the merit check and pirate generation concurrently
+        
+        The prompt variant (merit_high_prompt vs merit_low_prompt) is guessed from
+        the previous turn's score. When that score is within speculative_margin of
+        the threshold, both variants are started. Whichever variant the merit check
+        does not select is cancelled; if neither matches, generation starts over.
+        
+        The merit check records its own node duration; generate_response only
+        covers the wait for the selected generation after the merit check.
+        """
+        threshold = DIFFICULTY_LEVELS.get(state["difficulty"], DIFFICULTY_LEVELS["easy"]).get("merit_threshold", 40)
+        previous_score = state.get("previous_merit_score", 0)
+        guess = previous_score >= threshold
+        
+        variants = [guess]
+        if abs(previous_score - threshold) <= settings.speculative_margin:
+            variants.append(not guess)
+            self.speculation_stats["both_launched"] += 1
+        
+        # Started before _within_budget, so they get the generation deadline here
+        generation_budget = self._generation_budget(state)
+        with model_router.stage_deadline(None if generation_budget is None else time.monotonic() + generation_budget):
+            generations = {
+                earned: asyncio.create_task(
+                    self._generate_pirate_text({**state, "merit_has_earned_it": earned})
+                )
+                for earned in variants
+            }
+        
+        try:
+            state = await self._merit_check_node(state)
+            actual = state["merit_has_earned_it"]
+            
+            self.speculation_stats["turns"] += 1
+            if actual == guess:
+                self.speculation_stats["hits"] += 1
+            else:
+                self.speculation_stats["misses"] += 1
+                if actual in generations:
+                    self.speculation_stats["rescued"] += 1
+                else:
+                    self.speculation_stats["regenerated"] += 1
+            
+            if actual in generations:
+                generation = generations.pop(actual)
+            else:
+                generation = self._generate_pirate_text(state)
+            with metrics.node_seconds.time("generate_response"):
+                raw_output = await self._within_budget(
+                    state, "generate_response", self._generation_budget(state), generation
+                )
+            state = self._apply_generation(state, raw_output)
+        finally:
+            # Cancel the losing branch(es)
+            for task in generations.values():
+                if not task.done():
+                    task.cancel()
+                    self.speculation_stats["cancelled"] += 1
+            if generations:
+                await asyncio.gather(*generations.values(), return_exceptions=True)
+        
+        return state
+    
+    def _build_generation_request(self, state: ConversationState, fused: bool = False) -> tuple:
+        """Build (model, messages) for pirate response generation"""
         # Get difficulty config
         difficulty_config = DIFFICULTY_LEVELS.get(state["difficulty"], DIFFICULTY_LEVELS["easy"])
         model = difficulty_config["llm_model"]
@@ -117,6 +305,8 @@ class ConversationGraph:
             state["merit_has_earned_it"],
             state.get("pirate_name", "Kapitan")
         )
+        if fused:
+            system_prompt += FUSED_REPLY_INSTRUCTION
         
         # Build messages
         messages = [
@@ -144,26 +334,38 @@ class ConversationGraph:
                 "content": content
             })
         
-        # Generate response (non-streaming for now)
-        # Limit max_tokens to ensure short responses (max 2 sentences ~ 100-150 tokens)
-        response = await self.llm_service.generate_response(
-            messages=messages,
-            model=model,
-            temperature=0.7,
-            max_tokens=150,  # Limit to ~2 sentences
-            stream=False
-        )
-        
-        state["pirate_response"] = response
-        return state
+        return model, messages
     
+    @timed_node("validate_response")
     async def _validate_response_node(self, state: ConversationState) -> ConversationState:
         """Validate response for treasure phrase and check win condition using LLM semantic check"""
-        # Perform LLM semantic check first to detect similar treasure-giving phrases
-        similar_detected, confidence = await self.validation_service.detects_similar_treasure_phrase_llm(
-            state["pirate_response"],
-            self.llm_service
-        )
+        # Get threshold for current difficulty
+        threshold = DIFFICULTY_LEVELS.get(state["difficulty"], {}).get("merit_threshold", 40)
+        score_met_threshold = state["merit_score"] >= threshold
+        
+        fused_verdict = state.get("fused_verdict")
+        if fused_verdict is not None:
+            # Fused mode: trust the pirate's self-declared verdict (same 0.7 confidence bar),
+            # regex checks below remain the safety net
+            confidence = fused_verdict["confidence"]
+            similar_detected = fused_verdict["gives_treasure"] and confidence >= 0.7
+            self._maybe_audit_fused_verdict(state["pirate_response"], similar_detected)
+        else:
+            # Perform semantic check first to detect similar treasure-giving phrases
+            # (local classifier rules out clear negatives when enabled, the LLM decides the rest)
+            semantic_check = self.validation_service.detects_similar_treasure_phrase_tiered(
+                state["pirate_response"],
+                self.llm_service
+            )
+            if score_met_threshold:
+                # The check decides the win - cutting it off would silently turn a
+                # paraphrased hand-over into "not given", so it is not bounded
+                similar_detected, confidence = await semantic_check
+            else:
+                # It only decides the low-merit rewrite; out of turn budget the
+                # rewrite is skipped and the regex checks below decide alone
+                verdict = await self._within_budget(state, "semantic_check", self._time_left(state), semantic_check)
+                similar_detected, confidence = verdict if verdict is not None else (False, 0.0)
         
         state["similar_treasure_phrase_detected"] = similar_detected
         state["similarity_confidence"] = confidence
@@ -178,10 +380,6 @@ class ConversationGraph:
         
         state["is_blocked"] = not is_allowed
         
-        # Get threshold for current difficulty
-        threshold = DIFFICULTY_LEVELS.get(state["difficulty"], {}).get("merit_threshold", 40)
-        score_met_threshold = state["merit_score"] >= threshold
-        
         # Block if similar phrase detected but score is too low
         if similar_detected and not score_met_threshold:
             # Player hasn't earned it yet - block the response
@@ -218,6 +416,70 @@ class ConversationGraph:
         
         return state
     
+    def _time_left(self, state: ConversationState) -> Optional[float]:
+        """Seconds until the turn deadline (None when there is no deadline)"""
+        deadline = state.get("deadline")
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+    
+    def _generation_budget(self, state: ConversationState) -> Optional[float]:
+        """Time left for generation, keeping TURN_VALIDATION_RESERVE_SECONDS for validation"""
+        time_left = self._time_left(state)
+        if time_left is None:
+            return None
+        return max(0.0, time_left - settings.turn_validation_reserve_seconds)
+    
+    async def _within_budget(self, state: ConversationState, stage: str, budget: Optional[float], awaitable):
+        """
+        Await a stage, cancelling it once its budget is spent
+        
+        Returns:
+            The stage's result, or None if it ran out of time (recorded in degraded_stages)
+        """
+        if budget is None:
+            return await awaitable
+        try:
+            # LLM calls of the stage see its deadline (model router budgets, slow-call tracking)
+            with model_router.stage_deadline(time.monotonic() + budget):
+                return await asyncio.wait_for(awaitable, timeout=budget)
+        except asyncio.TimeoutError:
+            print(f"[Deadline] {stage} exceeded its {budget:.2f}s budget, degrading")
+            state["degraded_stages"].append(stage)
+            self.deadline_stats[stage] += 1
+            return None
+    
+    def _maybe_audit_fused_verdict(self, text: str, fused_detected: bool):
+        """Re-check a sample of fused verdicts with the standalone semantic check in the background"""
+        if random.random() >= settings.fused_audit_sample_rate:
+            return
+        task = asyncio.create_task(self._audit_fused_verdict(text, fused_detected))
+        self._audit_tasks.add(task)
+        task.add_done_callback(self._audit_tasks.discard)
+    
+    async def _audit_fused_verdict(self, text: str, fused_detected: bool):
+        """Compare a fused verdict with detects_similar_treasure_phrase_llm"""
+        try:
+            semantic_detected, _ = await self.validation_service.detects_similar_treasure_phrase_llm(
+                text,
+                self.llm_service
+            )
+        except Exception as e:
+            print(f"[Fused audit] Semantic check failed: {e}")
+            self.fused_audit_stats["failed"] += 1
+            return
+        
+        self.fused_audit_stats["audited"] += 1
+        if semantic_detected == fused_detected:
+            self.fused_audit_stats["agreed"] += 1
+            return
+        
+        if semantic_detected:
+            self.fused_audit_stats["fused_missed"] += 1
+        else:
+            self.fused_audit_stats["fused_extra"] += 1
+        print(f"[Fused audit] Verdict mismatch (fused={fused_detected}, semantic={semantic_detected}): {text[:80]}")
+    
     def _handle_blocked_node(self, state: ConversationState) -> ConversationState:
         """Handle blocked response - already handled in validate, just pass through"""
         return state
@@ -254,21 +516,28 @@ class ConversationGraph:
         
         return base_prompt
     
-    async def process_message(
+    def _initial_state(
         self,
         game_id: str,
         user_message: str,
         difficulty: str,
         conversation_history: list,
         strategies_attempted: list,
-        player_personas: list
-    ) -> dict:
-        """Process a user message through the graph"""
+        player_personas: list,
+        previous_merit_score: int = 0,
+        merit_evaluator_state: Optional[Dict[str, Any]] = None,
+        deadline_seconds: Optional[float] = None
+    ) -> ConversationState:
+        """Build the initial graph state for a turn"""
+        if deadline_seconds is None:
+            deadline_seconds = settings.turn_deadline_seconds
+        self.deadline_stats["turns"] += 1
+        
         # Convert difficulty enum to string if needed
         if hasattr(difficulty, 'value'):
             difficulty = difficulty.value
         
-        initial_state: ConversationState = {
+        return {
             "messages": [HumanMessage(content=user_message)],
             "game_id": game_id,
             "difficulty": str(difficulty),
@@ -276,6 +545,7 @@ class ConversationGraph:
             "strategies_attempted": strategies_attempted,
             "player_personas": player_personas,
             "merit_score": 0,
+            "previous_merit_score": previous_merit_score,
             "merit_has_earned_it": False,
             "pirate_response": "",
             "is_blocked": False,
@@ -283,15 +553,17 @@ class ConversationGraph:
             "is_lost": False,
             "similar_treasure_phrase_detected": False,
             "similarity_confidence": 0.0,
-            "negative_categories": None
+            "negative_categories": None,
+            "merit_evaluator_state": merit_evaluator_state,
+            "fused_verdict": None,
+            "deadline": time.monotonic() + deadline_seconds if deadline_seconds > 0 else None,
+            "degraded_stages": []
         }
-        
-        # Run graph
-        final_state = await self.graph.ainvoke(initial_state)
-        
-        # Get negative categories from state
-        negative_categories = final_state.get("negative_categories")
-        
+    
+    def _result_from_state(self, final_state: ConversationState) -> dict:
+        """Extract the turn result returned to PirateService"""
+        if final_state.get("degraded_stages"):
+            self.deadline_stats["degraded_turns"] += 1
         return {
             "pirate_response": final_state["pirate_response"],
             "merit_score": final_state["merit_score"],
@@ -301,6 +573,121 @@ class ConversationGraph:
             "is_blocked": final_state["is_blocked"],
             "similar_treasure_phrase_detected": final_state.get("similar_treasure_phrase_detected", False),
             "similarity_confidence": final_state.get("similarity_confidence", 0.0),
-            "negative_categories": negative_categories
+            "negative_categories": final_state.get("negative_categories"),
+            "merit_evaluator_state": final_state.get("merit_evaluator_state"),
+            "degraded_stages": list(final_state.get("degraded_stages", []))
         }
-
+    
+    async def process_message(
+        self,
+        game_id: str,
+        user_message: str,
+        difficulty: str,
+        conversation_history: list,
+        strategies_attempted: list,
+        player_personas: list,
+        previous_merit_score: int = 0,
+        merit_evaluator_state: Optional[Dict[str, Any]] = None,
+        deadline_seconds: Optional[float] = None
+    ) -> dict:
+        """
+        Process a user message through the graph
+        
+        Args:
+            deadline_seconds: Turn budget (default TURN_DEADLINE_SECONDS, 0 = none). Stages that
+                              overrun their slice fall back and are listed in degraded_stages.
+        """
+        initial_state = self._initial_state(
+            game_id,
+            user_message,
+            difficulty,
+            conversation_history,
+            strategies_attempted,
+            player_personas,
+            previous_merit_score,
+            merit_evaluator_state,
+            deadline_seconds
+        )
+        
+        # Run graph
+        final_state = await self.graph.ainvoke(initial_state)
+        
+        return self._result_from_state(final_state)
+    
+    async def stream_message(
+        self,
+        game_id: str,
+        user_message: str,
+        difficulty: str,
+        conversation_history: list,
+        strategies_attempted: list,
+        player_personas: list,
+        previous_merit_score: int = 0,
+        merit_evaluator_state: Optional[Dict[str, Any]] = None,
+        deadline_seconds: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a user message, streaming pirate tokens as they are generated
+        
+        Runs the same nodes as the graph (merit check -> generation -> validation),
+        but generation is streamed through a StreamingPhraseGuard so text that
+        would complete a blocked phrase is never forwarded. The turn deadline
+        bounds the merit check and validation; a reply that is already
+        streaming is not cut off.
+        
+        Yields:
+            {"type": "token", "text": ...} for every released piece of text,
+            {"type": "replace", "text": ...} if validation replaced the streamed reply,
+            {"type": "result", "result": ...} with the same dict as process_message
+        """
+        state = self._initial_state(
+            game_id,
+            user_message,
+            difficulty,
+            conversation_history,
+            strategies_attempted,
+            player_personas,
+            previous_merit_score,
+            merit_evaluator_state,
+            deadline_seconds
+        )
+        state = await self._merit_check_node(state)
+        
+        model, messages = self._build_generation_request(state)
+        guard = StreamingPhraseGuard(self.validation_service, state["merit_has_earned_it"])
+        streamed = ""
+        
+        generation_started = time.monotonic()
+        token_stream = await self.llm_service.generate_response(
+            messages=messages,
+            model=model,
+            temperature=0.7,
+            max_tokens=150,  # Limit to ~2 sentences
+            stream=True,
+            model_role="pirate"
+        )
+        try:
+            async for token in token_stream:
+                safe = guard.feed(token)
+                if safe:
+                    streamed += safe
+                    yield {"type": "token", "text": safe}
+                if guard.blocked:
+                    # Stop generating - the reply will be replaced anyway
+                    break
+        finally:
+            await token_stream.aclose()
+            metrics.node_seconds.observe(time.monotonic() - generation_started, "generate_response")
+        
+        tail = guard.flush()
+        if tail:
+            streamed += tail
+            yield {"type": "token", "text": tail}
+        
+        state["pirate_response"] = guard.text
+        state = await self._validate_response_node(state)
+        
+        if state["pirate_response"] != streamed:
+            yield {"type": "replace", "text": state["pirate_response"]}
+        
+        yield {"type": "result", "result": self._result_from_state(state)}
@@ -1,16 +1,38 @@
 """
 FastAPI main application
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.requests import HTTPConnection
 from backend.models.game import GameRequest, ConversationRequest, ConversationResponse, GameState, AudioStreamRequest
 from backend.services.pirate_service import PirateService
 from backend.services.speech_to_text_service import SpeechToTextService
 from backend.services.gpt_audio_service import GPTAudioService
+from backend.services.http_client import upstream_clients
+from backend.services.game_store import GameExpiredError
+from backend.services.idempotency import IdempotencyConflictError
+from backend.services.audio_warmup import AudioWarmup
+from backend.services.kie_task_poller import kie_task_poller
+from backend.services.tts_router import tts_router, AudioStream
+from backend.services.model_router import model_router
+from backend.services.metrics import metrics
+from backend.services.usage_ledger import usage_ledger
+from backend.services.admission import admission, AdmissionLease, AdmissionRejectedError
+from backend.services.disconnect import (
+    ClientDisconnectedError,
+    cancellation_stats,
+    run_until_disconnected,
+    stream_until_disconnected
+)
 from backend.config import settings
 import uvicorn
 import base64
+import json
+import asyncio
+import weakref
+import hmac
+from typing import Optional, AsyncIterator, Awaitable, Callable, Any
 
 app = FastAPI(
     title="Outwit the AI Pirate Game API",
@@ -32,6 +54,87 @@ app.add_middleware(
 pirate_service = PirateService()
 speech_to_text_service = SpeechToTextService()
 gpt_audio_service = GPTAudioService()
+audio_warmup = AudioWarmup(gpt_audio_service)
+_warmup_task = None
+
+
+@app.on_event("startup")
+async def startup():
+    """Open pooled upstream HTTP clients, start game store maintenance and audio warm-up"""
+    global _warmup_task
+    await upstream_clients.startup()
+    await pirate_service.store.start()
+    _warmup_task = asyncio.create_task(audio_warmup.run())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Cancel background TTS, close pooled upstream HTTP clients and the game store"""
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+    await pirate_service.turn_audio.close()
+    await kie_task_poller.close()
+    await upstream_clients.shutdown()
+    await pirate_service.store.close()
+
+
+def _admission_rejected(e: AdmissionRejectedError) -> HTTPException:
+    """429 (queue full) / 503 (queue wait timed out) with Retry-After"""
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _client_key(http_request: HTTPConnection, game_id: Optional[str] = None) -> str:
+    """Admission client key: the game (ADMISSION_CLIENT_KEY=game) or the caller's IP"""
+    if game_id and settings.admission_client_key == "game":
+        return f"game:{game_id}"
+    return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+
+
+async def _turn_weight(game_id: str) -> float:
+    """Fair-queuing weight of a turn, by the game's difficulty (1.0 if the game is unknown)"""
+    try:
+        game_state = await pirate_service.get_game_state(game_id)
+    except GameExpiredError:
+        return 1.0
+    return admission.weight(game_state.difficulty.value if game_state else None)
+
+
+async def _admitted(pool: str, work: Callable[[], Awaitable[Any]], client: str = "", weight: float = 1.0) -> Any:
+    """Run work while holding a slot in an admission pool"""
+    async with admission.admit(pool, client, weight):
+        return await work()
+
+
+def _require_admin(authorization: Optional[str] = Header(default=None)):
+    """Admin endpoints need "Authorization: Bearer <ADMIN_TOKEN>" (404 while no token is configured)"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Admin API is disabled (set ADMIN_TOKEN)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+def _release_lease(lease: Optional[AdmissionLease]):
+    """Give back a lease acquired for a request that went away"""
+    if lease is not None:
+        lease.release()
+
+
+def _release_when_done(stream: AsyncIterator[Any], lease: Optional[AdmissionLease]) -> AsyncIterator[Any]:
+    """Hold an admission slot until a response body finishes (or is dropped unstarted)"""
+    if lease is None:
+        return stream
+    
+    async def guarded():
+        try:
+            async for item in stream:
+                yield item
+        finally:
+            lease.release()
+    
+    body = guarded()
+    weakref.finalize(body, lease.release)
+    return body
 
 
 @app.get("/")
@@ -46,15 +149,23 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+    """Health check endpoint (includes audio warm-up progress)"""
+    return {"status": "healthy", "warmup": audio_warmup.progress()}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness check - 503 until canned audio lines are pre-rendered"""
+    if not audio_warmup.ready:
+        raise HTTPException(status_code=503, detail=audio_warmup.progress())
+    return {"status": "ready", "warmup": audio_warmup.progress()}
 
 
 @app.post("/api/game/start", response_model=GameState)
 async def start_game(request: GameRequest):
     """Start a new game"""
     try:
-        game_state = pirate_service.start_game(
+        game_state = await pirate_service.start_game(
             difficulty=request.difficulty.value,
             pirate_name=request.pirate_name or "Kapitan"
         )
@@ -64,42 +175,202 @@ async def start_game(request: GameRequest):
 
 
 @app.post("/api/game/conversation", response_model=ConversationResponse)
-async def send_message(request: ConversationRequest):
-    """Send a message in the conversation"""
+async def send_message(
+    request: ConversationRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255)
+):
+    """Send a message in the conversation (retries with the same Idempotency-Key share one turn)"""
     try:
-        response = await pirate_service.process_conversation(
+        turn = lambda: pirate_service.process_conversation(
             game_id=request.game_id,
             user_message=request.message,
-            include_audio=request.include_audio
+            include_audio=request.include_audio,
+            idempotency_key=idempotency_key,
+            pregenerate_audio=request.pregenerate_audio
+        )
+        if pirate_service.has_idempotent_result(request.game_id, idempotency_key):
+            # Replay of a finished turn - no LLM call, so no slot or rate-limit token
+            return await turn()
+        # The turn is cancelled if the player disconnects (also while queued for admission);
+        # the game is left as before the message
+        response = await run_until_disconnected(
+            http_request,
+            _admitted(
+                "llm",
+                turn,
+                client=_client_key(http_request, request.game_id),
+                weight=await _turn_weight(request.game_id)
+            ),
+            "turns"
         )
         return response
+    except AdmissionRejectedError as e:
+        raise _admission_rejected(e)
+    except ClientDisconnectedError as e:
+        # Nobody is listening - nginx-style "client closed request"
+        raise HTTPException(status_code=499, detail=str(e))
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except GameExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/game/conversation/stream")
+async def send_message_stream(request: ConversationRequest, http_request: Request):
+    """Send a message and stream the pirate's reply token by token (SSE)"""
+    try:
+        game_state = await pirate_service.get_game_state(request.game_id)
+    except GameExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    if not game_state:
+        raise HTTPException(status_code=404, detail=f"Game {request.game_id} not found")
+    try:
+        lease = await run_until_disconnected(
+            http_request,
+            admission.acquire(
+                "llm",
+                client=_client_key(http_request, request.game_id),
+                weight=admission.weight(game_state.difficulty.value)
+            ),
+            "stream_turns",
+            discard=_release_lease
+        )
+    except AdmissionRejectedError as e:
+        raise _admission_rejected(e)
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    
+    async def generate_conversation_stream():
+        try:
+            events = pirate_service.stream_conversation(
+                game_id=request.game_id,
+                user_message=request.message,
+                include_audio=request.include_audio,
+                pregenerate_audio=request.pregenerate_audio
+            )
+            async for event in stream_until_disconnected(http_request, events, "stream_turns"):
+                if event["type"] == "result":
+                    payload = {"type": "result", **event["response"].model_dump()}
+                else:
+                    payload = event
+                metrics.sse_chunks.inc("conversation")
+                yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)}, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        _release_when_done(generate_conversation_stream(), lease),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @app.get("/api/game/{game_id}", response_model=GameState)
 async def get_game_state(game_id: str):
     """Get current game state"""
-    game_state = pirate_service.get_game_state(game_id)
+    try:
+        game_state = await pirate_service.get_game_state(game_id)
+    except GameExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
     if not game_state:
         raise HTTPException(status_code=404, detail="Game not found")
     return game_state
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (graph node, upstream, STT/TTS latencies and game counters)"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/admin/usage", dependencies=[Depends(_require_admin)])
+async def usage_summary():
+    """Upstream tokens, characters and cost overall and per difficulty, model and stage"""
+    return usage_ledger.summary()
+
+
+@app.get("/api/admin/usage/games", dependencies=[Depends(_require_admin)])
+async def usage_games(limit: int = 50):
+    """Most recently active games with their usage totals"""
+    return {"games": usage_ledger.games(limit=max(1, min(limit, 1000)))}
+
+
+@app.get("/api/admin/usage/games/{game_id}", dependencies=[Depends(_require_admin)])
+async def usage_game(game_id: str):
+    """Usage of one game, per turn and stage, with the individual calls"""
+    usage = usage_ledger.game(game_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail=f"No usage recorded for game {game_id}")
+    return usage
+
+
+@app.get("/api/stats/idempotency")
+async def idempotency_stats():
+    """Idempotency-Key counters (duplicate submits coalesced or replayed)"""
+    return pirate_service.get_idempotency_stats()
+
+
+@app.get("/api/stats/game-store")
+async def game_store_stats():
+    """Stored game count, estimated memory use and eviction counters"""
+    return pirate_service.get_store_stats()
+
+
+@app.get("/api/stats/speculation")
+async def speculation_stats():
+    """Speculative generation counters (how often the prompt variant guess was wrong)"""
+    return pirate_service.get_speculation_stats()
+
+
+@app.get("/api/stats/deadlines")
+async def deadline_stats():
+    """Turns that hit the per-turn deadline and which stages fell back"""
+    return pirate_service.get_deadline_stats()
+
+
+@app.get("/api/stats/fused-audit")
+async def fused_audit_stats():
+    """Agreement between fused pirate verdicts and the standalone semantic check"""
+    return pirate_service.get_fused_audit_stats()
+
+
+@app.get("/api/stats/treasure-detector")
+async def treasure_detector_stats():
+    """Tiered treasure-giving detection counters (LLM calls avoided by the local classifier)"""
+    return pirate_service.get_treasure_detector_stats()
+
+
 @app.post("/api/speech-to-text")
 async def speech_to_text(
+    http_request: Request,
     audio: UploadFile = File(...),
-    format: str = Form(default="wav")
+    format: str = Form(default="wav"),
+    game_id: Optional[str] = Form(default=None)
 ):
     """Convert audio to text using Google Gemini 2.0 Flash Lite via OpenRouter"""
     try:
         audio_data = await audio.read()
-        transcribed_text = await speech_to_text_service.transcribe_audio(
-            audio_data=audio_data,
-            audio_format=format
-        )
+        async with admission.admit("stt", client=_client_key(http_request)):
+            with metrics.stt_seconds.time():
+                transcribed_text = await speech_to_text_service.transcribe_audio(
+                    audio_data=audio_data,
+                    audio_format=format,
+                    game_id=game_id
+                )
         
         if not transcribed_text:
             raise HTTPException(status_code=500, detail="Failed to transcribe audio")
@@ -109,47 +380,274 @@ async def speech_to_text(
             "text": transcribed_text,
             "error": None
         }
+    except AdmissionRejectedError as e:
+        raise _admission_rejected(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _wants_binary_audio(http_request: Request) -> bool:
+    """Whether the client asked for raw audio (Accept: audio/* or octet-stream) instead of SSE"""
+    accept = http_request.headers.get("accept", "").lower()
+    if "text/event-stream" in accept:
+        return False
+    return "audio/" in accept or "application/octet-stream" in accept
+
+
+async def _audio_response(
+    audio: AudioStream,
+    http_request: Request,
+    disconnect_kind: str = "audio_streams",
+    lease: Optional[AdmissionLease] = None
+) -> StreamingResponse:
+    """
+    Stream audio chunks in the transport the client negotiated
+    
+    Binary: chunked audio/mpeg (Kie.ai) or audio/L16 (GPT Audio PCM16, little-endian),
+    or the AUDIO_POSTPROCESS output format. With TTS_HEDGING either backend may
+    answer, so the stream is opened first and the winner's media type is sent.
+    Default: SSE with base64 chunks, kept for existing clients, preceded by an
+    "event: start" carrying the media type (ignored by plain onmessage handlers).
+    The stream (and its upstream TTS) is closed if the client disconnects.
+    An admission lease is released when the body finishes.
+    """
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    }
+    
+    if _wants_binary_audio(http_request):
+        try:
+            await run_until_disconnected(http_request, audio.open(), disconnect_kind)
+        except ClientDisconnectedError as e:
+            raise HTTPException(status_code=499, detail=str(e))
+        audio_chunks = stream_until_disconnected(
+            http_request,
+            gpt_audio_service.process_output(audio, audio.media_type),
+            disconnect_kind
+        )
+        
+        async def generate_binary_stream():
+            try:
+                async for audio_chunk in audio_chunks:
+                    yield audio_chunk
+            except Exception as e:
+                # Headers are already sent - aborting the body is the only error signal
+                print(f"[Audio] Binary stream failed: {e}")
+                raise
+        
+        media_type = gpt_audio_service.stream_media_type(audio.media_type)
+        if media_type.startswith("audio/L16"):
+            headers["X-Audio-Sample-Format"] = "s16le"
+        return StreamingResponse(_release_when_done(generate_binary_stream(), lease), media_type=media_type, headers=headers)
+    
+    # Stream audio chunks as Server-Sent Events
+    async def generate_audio_stream():
+        try:
+            await audio.open()
+            media_type = gpt_audio_service.stream_media_type(audio.media_type)
+            yield f"event: start\ndata: {json.dumps({'media_type': media_type})}\n\n"
+            audio_chunks = gpt_audio_service.process_output(audio, audio.media_type)
+            async for audio_chunk in stream_until_disconnected(http_request, audio_chunks, disconnect_kind):
+                # Encode chunk as base64 for SSE
+                chunk_base64 = base64.b64encode(audio_chunk).decode('utf-8')
+                metrics.sse_chunks.inc("audio")
+                yield f"data: {chunk_base64}\n\n"
+            yield "data: [DONE]\n\n"
+        except Exception as e:
+            error_msg = base64.b64encode(f"Error: {str(e)}".encode()).decode('utf-8')
+            yield f"data: ERROR:{error_msg}\n\n"
+    
+    headers["Connection"] = "keep-alive"
+    return StreamingResponse(_release_when_done(generate_audio_stream(), lease), media_type="text/event-stream", headers=headers)
+
+
 @app.post("/api/game/conversation/stream-audio")
-async def stream_audio(request: AudioStreamRequest):
-    """Stream audio for provided text using GPT Audio"""
+async def stream_audio(request: AudioStreamRequest, http_request: Request):
+    """Stream audio for provided text using GPT Audio (SSE, or binary via Accept)"""
     try:
         text = request.text.strip() if request.text else ""
         if not text:
             raise HTTPException(status_code=400, detail="Text is required for audio streaming")
         
-        # Stream audio chunks as Server-Sent Events
-        async def generate_audio_stream():
-            try:
-                async for audio_chunk in gpt_audio_service.generate_audio_stream(text):
-                    # Encode chunk as base64 for SSE
-                    chunk_base64 = base64.b64encode(audio_chunk).decode('utf-8')
-                    yield f"data: {chunk_base64}\n\n"
-                yield "data: [DONE]\n\n"
-            except Exception as e:
-                error_msg = base64.b64encode(f"Error: {str(e)}".encode()).decode('utf-8')
-                yield f"data: ERROR:{error_msg}\n\n"
-        
-        return StreamingResponse(
-            generate_audio_stream(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+        lease = await run_until_disconnected(
+            http_request,
+            admission.acquire("tts", client=_client_key(http_request)),
+            "audio_streams",
+            discard=_release_lease
         )
+        try:
+            # SSE clients predate hedging and expect the primary backend's format
+            audio = gpt_audio_service.generate_audio_stream(text, hedge=_wants_binary_audio(http_request))
+            return await _audio_response(audio, http_request, lease=lease)
+        except BaseException:
+            if lease is not None:
+                lease.release()
+            raise
+    except AdmissionRejectedError as e:
+        raise _admission_rejected(e)
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/game/{game_id}/turns/{turn_id}/audio")
+async def stream_turn_audio(game_id: str, turn_id: int, http_request: Request):
+    """Stream the audio pre-generated for a turn (SSE, or binary via Accept)"""
+    buffer = pirate_service.get_turn_audio(game_id, turn_id)
+    if buffer is not None:
+        # Disconnecting only stops this reader - synthesis continues for other readers of the turn
+        return await _audio_response(
+            buffer.stream(gpt_audio_service.backend_media_type()),
+            http_request,
+            disconnect_kind="turn_audio_readers"
+        )
+    
+    # The turn ran on another worker (or its buffer expired) - voice the stored reply
+    text = await pirate_service.get_turn_reply(game_id, turn_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail=f"No audio for turn {turn_id} of game {game_id}")
+    try:
+        lease = await run_until_disconnected(
+            http_request,
+            admission.acquire("tts", client=_client_key(http_request, game_id)),
+            "audio_streams",
+            discard=_release_lease
+        )
+    except AdmissionRejectedError as e:
+        raise _admission_rejected(e)
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    try:
+        audio = gpt_audio_service.generate_audio_stream(text, hedge=_wants_binary_audio(http_request))
+        return await _audio_response(audio, http_request, lease=lease)
+    except BaseException:
+        _release_lease(lease)
+        raise
+
+
+@app.websocket("/api/game/{game_id}/turns/{turn_id}/audio/ws")
+async def stream_turn_audio_ws(websocket: WebSocket, game_id: str, turn_id: int):
+    """
+    Stream the audio pre-generated for a turn over a WebSocket
+    
+    Sends a JSON "start" text frame with the media type, the audio as binary
+    frames, then a JSON "done" (or "error") text frame.
+    """
+    await websocket.accept()
+    lease = None
+    buffer = pirate_service.get_turn_audio(game_id, turn_id)
+    if buffer is None:
+        # The turn ran on another worker (or its buffer expired) - voice the stored reply
+        text = await pirate_service.get_turn_reply(game_id, turn_id)
+        if text is None:
+            await websocket.send_json({"type": "error", "detail": f"No audio for turn {turn_id} of game {game_id}"})
+            await websocket.close(code=4404)
+            return
+        try:
+            lease = await admission.acquire("tts", client=_client_key(websocket, game_id))
+        except AdmissionRejectedError as e:
+            await websocket.send_json({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+            await websocket.close(code=1013)
+            return
+        source = gpt_audio_service.generate_audio_stream(text)
+    else:
+        source = buffer.stream(gpt_audio_service.backend_media_type())
+    
+    try:
+        audio = await source.open()
+        await websocket.send_json({"type": "start", "media_type": gpt_audio_service.stream_media_type(audio.media_type)})
+        async for audio_chunk in gpt_audio_service.process_output(audio, audio.media_type):
+            await websocket.send_bytes(audio_chunk)
+        await websocket.send_json({"type": "done"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1011)
+    finally:
+        _release_lease(lease)
+
+
+@app.get("/api/stats/turn-audio")
+async def turn_audio_stats():
+    """Background per-turn TTS buffers (started, failed, in progress, bytes held)"""
+    return pirate_service.get_turn_audio_stats()
+
+
+@app.get("/api/audio/{key}")
+async def get_cached_audio(key: str):
+    """Serve a clip from the TTS cache (audio_url of cached ElevenLabs replies)"""
+    if len(key) != 64 or any(ch not in "0123456789abcdef" for ch in key):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    audio = await pirate_service.get_cached_audio(key)
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return Response(
+        content=audio,
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "public, max-age=86400, immutable"}
+    )
+
+
+@app.post("/api/kie/callback")
+async def kie_callback(request: Request, token: Optional[str] = None):
+    """Kie.ai task completion webhook (callBackUrl) - settles the waiting TTS request"""
+    if not settings.kie_callback_token or not hmac.compare_digest(token or "", settings.kie_callback_token):
+        raise HTTPException(status_code=403, detail="Invalid callback token")
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    return {"received": True, "settled": kie_task_poller.settle(payload)}
+
+
+@app.get("/api/stats/kie-poller")
+async def kie_poller_stats():
+    """Shared Kie.ai task poller counters (polls, callbacks, pending tasks)"""
+    return kie_task_poller.snapshot()
+
+
+@app.get("/api/stats/tts-router")
+async def tts_router_stats():
+    """Hedged TTS counters and per-backend first-byte latency histograms"""
+    return tts_router.snapshot()
+
+
+@app.get("/api/stats/admission")
+async def admission_stats():
+    """Per-upstream admission gauges (in flight, queue depth) and wait-time histograms (client keys hashed)"""
+    return admission.snapshot()
+
+
+@app.get("/api/stats/cancellations")
+async def cancellation_counters():
+    """Turns and audio streams cancelled because the client disconnected"""
+    return dict(cancellation_stats)
+
+
+@app.get("/api/stats/model-router")
+async def model_router_stats():
+    """Per-role fallback counters and per-model circuit breaker, error rate and latency"""
+    return model_router.snapshot()
+
+
+@app.get("/api/stats/tts-cache")
+async def tts_cache_stats():
+    """TTS cache hit/miss counters and memory/disk tier sizes"""
+    return pirate_service.get_tts_cache_stats()
+
+
 @app.post("/api/test/gpt-audio-stream")
 async def test_gpt_audio_stream(text: str):
     """Test endpoint for GPT Audio streaming"""
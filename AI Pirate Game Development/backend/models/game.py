@@ -27,6 +27,7 @@ class GameState(BaseModel):
     is_won: bool = Field(default=False, description="Whether player won by reaching deception threshold")
     is_lost: bool = Field(default=False, description="Whether player lost by falling below loss threshold")
     win_phrase_detected: bool = Field(default=False, description="Whether pirate said the treasure phrase")
+    merit_evaluator_state: Optional[Dict[str, Any]] = Field(default=None, description="Incremental merit evaluator state (previous scores + rolling summary)")
 
 
 class Message(BaseModel):
@@ -47,6 +48,10 @@ class ConversationRequest(BaseModel):
     game_id: str = Field(..., description="Game identifier")
     message: str = Field(..., description="User message")
     include_audio: bool = Field(default=False, description="Include TTS audio response")
+    pregenerate_audio: bool = Field(
+        default=False,
+        description="Start TTS in the background; only set if the client plays streaming_audio_endpoint"
+    )
 
 
 class AudioStreamRequest(BaseModel):
@@ -61,10 +66,12 @@ class ConversationResponse(BaseModel):
     merit_score: int = Field(..., description="Current deception/misguidance score (-100 to +100)")
     audio_url: Optional[str] = None
     streaming_audio_endpoint: Optional[str] = Field(default=None, description="Endpoint for streaming audio (SSE)")
+    turn_id: Optional[int] = Field(default=None, description="Turn number (addresses pre-generated turn audio)")
     is_won: bool = Field(default=False, description="Whether player won (high deception score or phrase detected)")
     is_lost: bool = Field(default=False, description="Whether player lost (score below loss threshold)")
     win_phrase_detected: bool = Field(default=False, description="Whether pirate said the treasure phrase")
     negative_categories: Optional[Dict[str, int]] = Field(default=None, description="Negative point categories breakdown")
+    degraded_stages: List[str] = Field(default_factory=list, description="Stages that ran over the turn deadline and used a fallback")
 
 
 class MeritEvaluation(BaseModel):
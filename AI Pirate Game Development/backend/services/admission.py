@@ -0,0 +1,345 @@
+"""
+Admission control - per-upstream concurrency limits with a bounded wait queue
+
+Requests beyond an upstream's concurrency wait in a queue for at most
+ADMISSION_MAX_QUEUE_SECONDS. When the queue is full they are rejected at
+once (429) and when the wait runs out they are rejected with 503, both with
+a Retry-After estimate, instead of piling onto OpenRouter / Kie.ai.
+
+The queue is shared fairly between clients (weighted fair queuing): each
+waiter gets a virtual finish tag of max(virtual time, client's last tag) +
+1 / weight, and the smallest tag is served first. A client flooding the
+queue only pushes its own tags further out, so other clients' requests
+overtake it. Per-client token buckets additionally cap how fast one client
+may submit requests at all.
+
+Client keys (IPs, game IDs) are never exposed as-is: stats list them under
+a keyed hash that is stable for the life of the process.
+"""
+import asyncio
+import hashlib
+import heapq
+import hmac
+import itertools
+import math
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from backend.config import settings
+from backend.services.tts_router import LatencyHistogram
+
+
+# Per-process key for hashing client keys in stats (an unkeyed hash of an IPv4 address is trivially reversed)
+_CLIENT_KEY_SECRET = secrets.token_bytes(16)
+
+
+def _public_client_key(key: str) -> str:
+    """Client key for public stats: the kind ("ip", "game") and a short keyed hash of the value"""
+    kind, _, value = key.partition(":")
+    digest = hmac.new(_CLIENT_KEY_SECRET, value.encode("utf-8"), hashlib.sha256).hexdigest()[:12]
+    return f"{kind}:{digest}" if value else digest
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request is not admitted (queue full or waited too long)"""
+
+    def __init__(self, pool: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"{pool} capacity exhausted ({reason}), retry in {retry_after}s")
+        self.pool = pool
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ClientState:
+    """Token bucket, fair-queuing tag and wait stats of one client in a pool"""
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.refilled_at = time.monotonic()
+        self.last_finish = 0.0
+        self.waiting = 0
+        self.in_flight = 0
+        self.wait_time = LatencyHistogram(window=50)
+        self.stats: Dict[str, int] = {"admitted": 0, "throttled": 0, "rejected": 0}
+
+    @property
+    def idle(self) -> bool:
+        return not self.waiting and not self.in_flight
+
+    def take_token(self, rate: float, burst: float) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.refilled_at) * rate)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.stats)
+        stats.update({
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "tokens": round(self.tokens, 2),
+            "wait_p50": self.wait_time.quantile(0.5),
+            "wait_p95": self.wait_time.quantile(0.95),
+            "wait_max": max(self.wait_time.recent, default=None)
+        })
+        return stats
+
+
+class AdmissionLease:
+    """One admitted request; release() is idempotent"""
+
+    def __init__(self, pool: "AdmissionPool", client: ClientState):
+        self.pool = pool
+        self.client = client
+        self.acquired_at = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.client.in_flight -= 1
+            self.pool._release(time.monotonic() - self.acquired_at)
+
+
+class AdmissionPool:
+    """
+    Concurrency slots and fair wait queue for one upstream
+
+    Args:
+        name: Pool name (in errors and stats)
+        max_concurrency: Requests running at once
+        max_queue: Requests waiting at once
+        max_queue_time: Longest wait before a 503
+        client_rate: Token bucket refill per client (requests/second, 0 = unlimited)
+        client_burst: Token bucket size per client
+        max_clients: Idle clients beyond this are forgotten (oldest first)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        max_queue_time: float,
+        client_rate: float = 0.0,
+        client_burst: float = 1.0,
+        max_clients: int = 1024
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_queue_time = max_queue_time
+        self.client_rate = max(0.0, client_rate)
+        self.client_burst = max(1.0, client_burst)
+        self.max_clients = max(1, max_clients)
+        self.in_flight = 0
+        # Heap of (finish tag, sequence, start tag, future)
+        self.waiters: List[Tuple[float, int, float, asyncio.Future]] = []
+        self.virtual_time = 0.0
+        self.max_finish = 0.0
+        self.clients: "OrderedDict[str, ClientState]" = OrderedDict()
+        self._sequence = itertools.count()
+        self.wait_time = LatencyHistogram()
+        self.avg_hold = 1.0  # EWMA of slot hold time, for Retry-After
+        self.peak_queue_depth = 0
+        self.stats: Dict[str, int] = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_throttled": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free for a new request"""
+        backlog = self.queue_depth + 1
+        return max(1, math.ceil(backlog * self.avg_hold / self.max_concurrency))
+
+    async def acquire(self, client: str = "", weight: float = 1.0) -> AdmissionLease:
+        """
+        Take a slot, waiting in the queue if needed
+
+        Args:
+            client: Client key (IP or game ID) for fair queuing and rate limiting
+            weight: Share of the queue relative to other clients (higher = served sooner)
+
+        Raises:
+            AdmissionRejectedError: 429 if the client is over its rate or the queue
+                is full, 503 if the wait timed out
+        """
+        state = self._client(client)
+        if self.client_rate:
+            refill = state.take_token(self.client_rate, self.client_burst)
+            if refill:
+                state.stats["throttled"] += 1
+                self.stats["rejected_throttled"] += 1
+                raise AdmissionRejectedError(self.name, 429, max(1, math.ceil(refill)), "client rate limit")
+        if self.in_flight < self.max_concurrency and not self.queue_depth:
+            return self._admit(state, 0.0)
+        if self.queue_depth >= self.max_queue:
+            state.stats["rejected"] += 1
+            self.stats["rejected_queue_full"] += 1
+            raise AdmissionRejectedError(self.name, 429, self.retry_after(), "queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        if not self.waiters:
+            # Queue was drained - earlier backlogs no longer count against anyone
+            self.virtual_time = self.max_finish
+        start_tag = max(self.virtual_time, state.last_finish)
+        state.last_finish = start_tag + 1.0 / max(weight, 0.01)
+        self.max_finish = max(self.max_finish, state.last_finish)
+        entry = (state.last_finish, next(self._sequence), start_tag, waiter)
+        heapq.heappush(self.waiters, entry)
+        state.waiting += 1
+        self.stats["queued"] += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_queue_time)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we gave up - pass the slot on
+                self.in_flight -= 1
+                self._grant_next()
+            else:
+                waiter.cancel()
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            state.waiting -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                state.stats["rejected"] += 1
+                self.stats["rejected_timeout"] += 1
+                state.wait_time.observe(time.monotonic() - start)
+                self.wait_time.observe(time.monotonic() - start)
+                raise AdmissionRejectedError(self.name, 503, self.retry_after(), "queue wait timed out")
+            raise
+        state.waiting -= 1
+        return self._admit(state, time.monotonic() - start, counted=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.stats)
+        stats.update({
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "max_queue": self.max_queue,
+            "avg_hold_seconds": round(self.avg_hold, 3),
+            "retry_after_seconds": self.retry_after(),
+            "wait_seconds": self.wait_time.snapshot(),
+            "client_rate": self.client_rate,
+            "client_burst": self.client_burst,
+            "clients": {_public_client_key(key): state.snapshot() for key, state in self.clients.items()}
+        })
+        return stats
+
+    def _client(self, key: str) -> ClientState:
+        """Client state by key (most recently used last), forgetting old idle clients"""
+        state = self.clients.get(key)
+        if state is None:
+            state = self.clients[key] = ClientState(self.client_burst)
+            while len(self.clients) > self.max_clients:
+                oldest = next((k for k, s in self.clients.items() if s.idle and k != key), None)
+                if oldest is None:
+                    break
+                del self.clients[oldest]
+        else:
+            self.clients.move_to_end(key)
+        return state
+
+    def _admit(self, client: ClientState, waited: float, counted: bool = False) -> AdmissionLease:
+        if not counted:
+            self.in_flight += 1
+        client.in_flight += 1
+        client.stats["admitted"] += 1
+        client.wait_time.observe(waited)
+        self.stats["admitted"] += 1
+        self.wait_time.observe(waited)
+        return AdmissionLease(self, client)
+
+    def _release(self, held: float):
+        self.in_flight -= 1
+        self.avg_hold = 0.8 * self.avg_hold + 0.2 * held
+        self._grant_next()
+
+    def _grant_next(self):
+        """Hand free slots to the waiters with the smallest finish tags"""
+        while self.waiters and self.in_flight < self.max_concurrency:
+            _, _, start_tag, waiter = heapq.heappop(self.waiters)
+            self.virtual_time = max(self.virtual_time, start_tag)
+            self.in_flight += 1
+            waiter.set_result(None)
+
+
+class AdmissionController:
+    """Admission pools per upstream: llm (conversation turns), stt and tts"""
+
+    def __init__(self):
+        self.enabled = settings.admission_control
+        queue_time = settings.admission_max_queue_seconds
+        max_clients = settings.admission_max_clients
+        self.pools: Dict[str, AdmissionPool] = {
+            "llm": AdmissionPool(
+                "llm",
+                settings.admission_llm_concurrency,
+                settings.admission_llm_queue,
+                queue_time,
+                client_rate=settings.admission_llm_client_rate,
+                client_burst=settings.admission_llm_client_burst,
+                max_clients=max_clients
+            ),
+            "stt": AdmissionPool(
+                "stt", settings.admission_stt_concurrency, settings.admission_stt_queue, queue_time, max_clients=max_clients
+            ),
+            "tts": AdmissionPool(
+                "tts", settings.admission_tts_concurrency, settings.admission_tts_queue, queue_time, max_clients=max_clients
+            )
+        }
+        self.difficulty_weights: Dict[str, float] = {
+            "easy": settings.admission_weight_easy,
+            "medium": settings.admission_weight_medium,
+            "hard": settings.admission_weight_hard
+        }
+
+    def weight(self, difficulty: Optional[str]) -> float:
+        """Fair-queuing weight of a difficulty's priority class"""
+        return self.difficulty_weights.get(difficulty or "", 1.0)
+
+    async def acquire(self, pool: str, client: str = "", weight: float = 1.0) -> Optional[AdmissionLease]:
+        """Take a slot in a pool (None when admission control is off)"""
+        if not self.enabled:
+            return None
+        return await self.pools[pool].acquire(client, weight)
+
+    @asynccontextmanager
+    async def admit(self, pool: str, client: str = "", weight: float = 1.0) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block"""
+        lease = await self.acquire(pool, client, weight)
+        try:
+            yield
+        finally:
+            if lease is not None:
+                lease.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Gauges (in flight, queue depth) and counters per pool and client"""
+        return {
+            "enabled": self.enabled,
+            "client_key": settings.admission_client_key,
+            "difficulty_weights": self.difficulty_weights,
+            "pools": {name: pool.snapshot() for name, pool in self.pools.items()}
+        }
+
+
+# Shared controller (limits are process-wide)
+admission = AdmissionController()
@@ -0,0 +1,177 @@
+"""
+Streaming post-processing for GPT Audio PCM16 - resampling, downmix, μ-law and WAV framing
+
+Works chunk by chunk: filter history, the resampler phase and any split
+sample are carried between chunks, so every input chunk produces output
+immediately and nothing is buffered.
+"""
+import struct
+from typing import Optional
+from backend.config import settings
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+# G.711 μ-law constants
+MULAW_BIAS = 0x84
+MULAW_CLIP = 32635
+
+
+def lowpass_taps(cutoff: float, num_taps: int) -> "np.ndarray":
+    """
+    Windowed-sinc low-pass FIR
+
+    Args:
+        cutoff: Cutoff as a fraction of the input Nyquist frequency (0-1)
+        num_taps: Filter length (odd)
+
+    Returns:
+        Normalised filter taps
+    """
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = cutoff * np.sinc(cutoff * n) * np.hamming(num_taps)
+    return taps / taps.sum()
+
+
+def mulaw_encode(samples: "np.ndarray") -> bytes:
+    """Encode int16 samples as 8-bit G.711 μ-law"""
+    x = samples.astype(np.int32)
+    sign = (x < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(x), MULAW_CLIP) + MULAW_BIAS
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    exponent = np.clip(exponent, 0, 7)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+def wav_stream_header(sample_rate: int, channels: int, codec: str) -> bytes:
+    """RIFF/WAVE header for a stream of unknown length (sizes set to the maximum)"""
+    if codec == "mulaw":
+        format_tag, bits = 7, 8
+    else:
+        format_tag, bits = 1, 16
+    block_align = channels * bits // 8
+    unknown = 0xFFFFFFFF
+    fmt = struct.pack("<HHIIHH", format_tag, channels, sample_rate, sample_rate * block_align, block_align, bits)
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", unknown)
+    )
+
+
+class PCM16StreamProcessor:
+    """Converts a little-endian PCM16 stream chunk by chunk"""
+
+    def __init__(
+        self,
+        input_rate: int,
+        output_rate: int,
+        input_channels: int = 1,
+        codec: str = "pcm16",
+        wav_header: bool = False,
+        num_taps: int = 31
+    ):
+        if not NUMPY_AVAILABLE:
+            raise ValueError("Audio post-processing requires numpy (pip install \".[audio]\")")
+        if codec not in ("pcm16", "mulaw"):
+            raise ValueError(f"Unsupported output codec: {codec}")
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.input_channels = max(1, input_channels)
+        self.codec = codec
+        self.wav_header = wav_header
+        self.step = input_rate / output_rate
+        # Anti-aliasing only needed when downsampling
+        self.taps = lowpass_taps(min(1.0, output_rate / input_rate) * 0.9, num_taps) if output_rate < input_rate else None
+        self._history = np.zeros(num_taps - 1 if self.taps is not None else 0, dtype=np.float64)
+        self._last = 0.0  # Last filtered input sample of the previous chunk
+        self._pos = 0.0  # Next output time, in input samples relative to the next chunk
+        self._remainder = b""  # Trailing bytes of a split frame
+        self._header_sent = False
+
+    @property
+    def media_type(self) -> str:
+        """Media type of the processed stream"""
+        if self.wav_header:
+            return "audio/wav"
+        if self.codec == "mulaw":
+            return f"audio/PCMU; rate={self.output_rate}; channels=1"
+        return f"audio/L16; rate={self.output_rate}; channels=1"
+
+    def process(self, chunk: bytes) -> bytes:
+        """Process one input chunk, returning whatever output it completes"""
+        out = b""
+        if self.wav_header and not self._header_sent:
+            out = wav_stream_header(self.output_rate, 1, self.codec)
+            self._header_sent = True
+
+        data = self._remainder + chunk
+        frame_bytes = 2 * self.input_channels
+        usable = len(data) - len(data) % frame_bytes
+        self._remainder = data[usable:]
+        if not usable:
+            return out
+
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float64)
+        if self.input_channels > 1:
+            samples = samples.reshape(-1, self.input_channels).mean(axis=1)
+
+        if self.input_rate != self.output_rate:
+            samples = self._resample(self._filter(samples))
+
+        pcm = np.clip(np.round(samples), -32768, 32767).astype("<i2")
+        if self.codec == "mulaw":
+            return out + mulaw_encode(pcm)
+        return out + pcm.tobytes()
+
+    def flush(self) -> bytes:
+        """Output for the end of the stream (header only, if nothing was ever sent)"""
+        if self.wav_header and not self._header_sent:
+            self._header_sent = True
+            return wav_stream_header(self.output_rate, 1, self.codec)
+        return b""
+
+    def _filter(self, samples: "np.ndarray") -> "np.ndarray":
+        """FIR low-pass with history carried across chunks"""
+        if self.taps is None:
+            return samples
+        extended = np.concatenate([self._history, samples])
+        self._history = extended[-len(self._history):] if len(self._history) else self._history
+        return np.convolve(extended, self.taps, mode="valid")
+
+    def _resample(self, samples: "np.ndarray") -> "np.ndarray":
+        """Linear-interpolation resampler with the phase carried across chunks"""
+        n = len(samples)
+        # extended[0] is the last sample of the previous chunk (time -1)
+        extended = np.concatenate([[self._last], samples])
+        count = int(np.floor((n - 1 - self._pos) / self.step)) + 1 if self._pos <= n - 1 else 0
+        if count > 0:
+            times = self._pos + np.arange(count) * self.step
+            index = np.floor(times).astype(np.int64) + 1
+            frac = times - np.floor(times)
+            result = extended[index] * (1.0 - frac) + extended[np.minimum(index + 1, n)] * frac
+            self._pos = times[-1] + self.step - n
+        else:
+            result = np.zeros(0, dtype=np.float64)
+            self._pos -= n
+        self._last = samples[-1]
+        return result
+
+
+def create_processor(input_rate: int) -> Optional[PCM16StreamProcessor]:
+    """Processor configured from settings, or None when post-processing is off"""
+    if not settings.audio_postprocess:
+        return None
+    return PCM16StreamProcessor(
+        input_rate=input_rate,
+        output_rate=settings.audio_output_sample_rate or input_rate,
+        input_channels=settings.audio_input_channels,
+        codec=settings.audio_output_codec,
+        wav_header=settings.audio_output_wav_header
+    )
@@ -0,0 +1,105 @@
+"""
+Startup pre-rendering of canned pirate lines into the TTS cache
+"""
+import asyncio
+import time
+from typing import Any, Dict, List
+from backend.config import settings, DIFFICULTY_LEVELS
+from backend.services.gpt_audio_service import GPTAudioService
+from backend.services.tts_cache import tts_cache
+from backend.services.validation import ALTERNATIVE_RESPONSES
+
+
+class AudioWarmup:
+    """
+    Synthesises the blocked-reply lines (and optionally greetings) at startup
+
+    Clips are pinned in the TTS cache, so the audio endpoints serve them
+    without a TTS call. Lines already on disk from a previous run are only
+    loaded, not re-synthesised.
+    """
+
+    def __init__(self, gpt_audio_service: GPTAudioService):
+        self.gpt_audio_service = gpt_audio_service
+        self.state = "pending"
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def lines(self) -> List[str]:
+        """Lines to pre-render, without duplicates"""
+        lines = list(ALTERNATIVE_RESPONSES)
+        if settings.prerender_greetings:
+            for level in DIFFICULTY_LEVELS.values():
+                lines.extend(level.get("greetings", []))
+        return list(dict.fromkeys(lines))
+
+    def progress(self) -> Dict[str, Any]:
+        """Warm-up progress for /health"""
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 1)
+        return {
+            "state": self.state,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "elapsed_seconds": elapsed
+        }
+
+    @property
+    def ready(self) -> bool:
+        """Whether traffic can be sent (warm-up finished, skipped or disabled)"""
+        return self.state in ("complete", "skipped", "disabled")
+
+    async def run(self):
+        """Pre-render every line with bounded concurrency"""
+        if not settings.audio_warmup or not tts_cache.enabled:
+            self.state = "disabled"
+            return
+        api_key = settings.openrouter_api_key if settings.use_gpt_audio and not settings.use_tts_only else settings.kie_ai_api_key
+        if not api_key:
+            print("[Warmup] No TTS API key configured, skipping audio pre-rendering")
+            self.state = "skipped"
+            return
+
+        lines = self.lines()
+        self.total = len(lines)
+        self.state = "running"
+        self.started_at = time.monotonic()
+        semaphore = asyncio.Semaphore(max(1, settings.audio_warmup_concurrency))
+
+        async def render(line: str):
+            async with semaphore:
+                try:
+                    await self._render(line)
+                    self.done += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"[Warmup] Failed to pre-render '{line[:40]}...': {e}")
+
+        await asyncio.gather(*(render(line) for line in lines))
+        self.finished_at = time.monotonic()
+        self.state = "complete"
+        print(f"[Warmup] Pre-rendered {self.done}/{self.total} lines ({self.failed} failed) in {self.finished_at - self.started_at:.1f}s")
+
+    async def _render(self, line: str):
+        """Synthesise one line (or load it from the disk tier) and pin it"""
+        if settings.use_gpt_audio:
+            key = self.gpt_audio_service.cache_key(line)
+        else:
+            key = self.gpt_audio_service.elevenlabs_service.cache_key(line)
+
+        audio = await tts_cache.get(key)
+        if audio is None:
+            if settings.use_gpt_audio:
+                chunks = [chunk async for chunk in self.gpt_audio_service.synthesize_stream(line)]
+                audio = b"".join(chunks)
+            else:
+                audio = await self.gpt_audio_service.generate_tts_audio(line)
+            if not audio:
+                raise ValueError("Empty audio")
+            await tts_cache.put(key, audio)
+        tts_cache.pin(key, audio)
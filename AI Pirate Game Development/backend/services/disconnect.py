@@ -0,0 +1,101 @@
+"""
+Client disconnect handling - cancel turns and upstream streams nobody is waiting for
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from starlette.requests import Request
+from backend.config import settings
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client went away before the work finished"""
+
+
+# Work cancelled because the client disconnected, by kind
+cancellation_stats: Dict[str, int] = {
+    "turns": 0,             # POST /api/game/conversation
+    "stream_turns": 0,      # POST /api/game/conversation/stream
+    "audio_streams": 0,     # TTS streams (stream-audio)
+    "turn_audio_readers": 0 # Readers of a pre-generated turn buffer (synthesis continues)
+}
+
+
+async def _wait_or_disconnect(request: Request, task: asyncio.Future):
+    """Wait for a task, polling the client connection; raises ClientDisconnectedError"""
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=settings.disconnect_poll_interval)
+        if done:
+            return
+        if await request.is_disconnected():
+            raise ClientDisconnectedError("Client disconnected")
+
+
+async def run_until_disconnected(
+    request: Request,
+    work: Awaitable[Any],
+    kind: str,
+    discard: Optional[Callable[[Any], None]] = None
+) -> Any:
+    """
+    Await work, cancelling it if the client disconnects first
+
+    Args:
+        request: Incoming request to watch
+        work: Coroutine to run
+        kind: cancellation_stats key to count a cancellation under
+        discard: Called with the result if the work finished but is abandoned
+            anyway (it completed while the disconnect was being detected), e.g.
+            to release an admission lease nobody will use
+
+    Raises:
+        ClientDisconnectedError: The client went away and the work was cancelled
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        await _wait_or_disconnect(request, task)
+    except BaseException as e:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if discard is not None and not task.cancelled() and task.exception() is None:
+            discard(task.result())
+        if isinstance(e, ClientDisconnectedError):
+            cancellation_stats[kind] += 1
+            print(f"[Disconnect] Client went away, cancelled work ({kind})")
+        raise
+    return task.result()
+
+
+async def stream_until_disconnected(request: Request, chunks: AsyncIterator[Any], kind: str) -> AsyncIterator[Any]:
+    """
+    Forward a stream, closing it (and its upstream work) if the client disconnects
+
+    The stream simply ends on disconnect; there is nobody left to report an error to.
+    Starlette may notice the disconnect first and cancel the response body; that
+    cancellation closes the stream the same way and is counted too.
+    """
+    iterator = chunks.__aiter__()
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(iterator.__anext__())
+            await _wait_or_disconnect(request, pending)
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield chunk
+    except ClientDisconnectedError:
+        cancellation_stats[kind] += 1
+        print(f"[Disconnect] Client went away, cancelled work ({kind})")
+    except asyncio.CancelledError:
+        cancellation_stats[kind] += 1
+        print(f"[Disconnect] Response cancelled, closing stream ({kind})")
+        raise
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
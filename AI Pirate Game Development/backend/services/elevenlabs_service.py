@@ -1,10 +1,13 @@
 """
 ElevenLabs TTS service via Kie.ai API
 """
-import httpx
-import asyncio
+import time
 from typing import Optional
 from backend.config import settings, ELEVENLABS_VOICES
+from backend.services.http_client import upstream_clients
+from backend.services.tts_cache import tts_cache_key
+from backend.services.kie_task_poller import kie_task_poller
+from backend.services.usage_ledger import usage_ledger
 
 
 class ElevenLabsService:
@@ -12,11 +15,21 @@ class ElevenLabsService:
     
     def __init__(self):
         self.api_key = settings.kie_ai_api_key
-        self.base_url = "https://api.kie.ai/api/v1"
+        self.base_url = settings.kie_ai_base_url
         self.model = settings.elevenlabs_model
         self.default_voice = settings.elevenlabs_voice
         self.language_code = settings.elevenlabs_language_code
         
+    def cache_key(self, text: str) -> str:
+        """TTS cache key for a clip in the default voice"""
+        return tts_cache_key(
+            text,
+            voice=self.default_voice,
+            model=self.model,
+            audio_format="mp3",
+            language=self.language_code
+        )
+    
     async def create_tts_task(
         self,
         text: str,
@@ -74,14 +87,15 @@ class ElevenLabsService:
             "Authorization": f"Bearer {self.api_key}"
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{self.base_url}/jobs/createTask",
-                json=payload,
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
+        client = upstream_clients.get(self.base_url)
+        response = await client.post(
+            f"{self.base_url}/jobs/createTask",
+            json=payload,
+            headers=headers,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json()
     
     async def get_task_status(self, task_id: str) -> dict:
         """
@@ -100,14 +114,15 @@ class ElevenLabsService:
             "Authorization": f"Bearer {self.api_key}"
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{self.base_url}/jobs/recordInfo",
-                params={"taskId": task_id},
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
+        client = upstream_clients.get(self.base_url)
+        response = await client.get(
+            f"{self.base_url}/jobs/recordInfo",
+            params={"taskId": task_id},
+            headers=headers,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json()
     
     async def generate_speech(
         self,
@@ -128,8 +143,13 @@ class ElevenLabsService:
         Returns:
             Audio URL if completed, None if async
         """
-        # Create task
-        task_response = await self.create_tts_task(text, voice=voice)
+        started = time.monotonic()
+        # Create task (Kie.ai calls our webhook on completion if one is configured)
+        task_response = await self.create_tts_task(
+            text,
+            voice=voice,
+            callback_url=kie_task_poller.callback_url()
+        )
         task_id = task_response.get("data", {}).get("taskId")
         
         if not task_id:
@@ -138,31 +158,10 @@ class ElevenLabsService:
         if not wait_for_completion:
             return None  # Return task_id for async processing
             
-        # Poll for completion
-        import time
-        start_time = time.time()
-        
-        while time.time() - start_time < max_wait_time:
-            status_response = await self.get_task_status(task_id)
-            data = status_response.get("data", {})
-            state = data.get("state")
-            
-            if state == "success":
-                result_json = data.get("resultJson", "{}")
-                import json
-                result = json.loads(result_json)
-                result_urls = result.get("resultUrls", [])
-                if result_urls:
-                    return result_urls[0]  # Return first audio URL
-                    
-            elif state == "failed":
-                fail_msg = data.get("failMsg", "Unknown error")
-                raise Exception(f"TTS task failed: {fail_msg}")
-                
-            # Wait before next poll
-            await asyncio.sleep(2)
-            
-        raise TimeoutError(f"TTS task did not complete within {max_wait_time} seconds")
+        # Wait for completion via the shared poller / webhook
+        audio_url = await kie_task_poller.wait(task_id, self.get_task_status, timeout=max_wait_time)
+        usage_ledger.record("tts", self.model, time.monotonic() - started, characters=len(text))
+        return audio_url
 
 
 
@@ -0,0 +1,588 @@
+"""
+Game state storage - pluggable backends so several uvicorn workers can share games
+"""
+import asyncio
+import inspect
+import json
+import sqlite3
+import sys
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, AsyncIterator, Callable, Any, Tuple
+from backend.config import settings
+from backend.models.game import GameState
+
+
+class GameExpiredError(Exception):
+    """Raised when a game existed but was evicted from the store"""
+
+
+class GameStore(ABC):
+    """Base class for game state storage
+
+    Backends implement get/put/delete plus the cross-process lease used by lock().
+    lock() gives atomic per-game read-modify-write: an in-process asyncio.Lock
+    serialises coroutines of this worker, the backend lease serialises workers.
+    Backends with a real lease set uses_lease; lock() then renews it every
+    third of game_lock_lease_seconds for as long as the block runs, so a slow
+    turn cannot outlive it and lose its write to another worker.
+    Backends that cannot expire games by themselves set needs_sweeper and
+    implement sweep(), which start() runs every game_sweep_interval_seconds
+    while game_idle_ttl_seconds > 0. Stores shared between workers also keep
+    finished turns by Idempotency-Key (get/put_turn_result), so a retry that
+    reaches another worker is replayed instead of run again.
+    """
+
+    needs_sweeper = False
+    uses_lease = False
+
+    def __init__(self):
+        self._local_locks: Dict[str, asyncio.Lock] = {}
+        self._local_lock_users: Dict[str, int] = {}
+        self.lease_seconds = settings.game_lock_lease_seconds
+        self.wait_seconds = settings.game_lock_wait_seconds
+        self.idle_ttl = settings.game_idle_ttl_seconds
+        self.sweep_interval = settings.game_sweep_interval_seconds
+        self._sweeper: Optional[asyncio.Task] = None
+        self.leases_lost = 0
+        self.turn_result_ttl = settings.idempotency_ttl_seconds
+
+    @abstractmethod
+    async def get(self, game_id: str) -> Optional[GameState]:
+        """Load a game (None if it doesn't exist)"""
+
+    @abstractmethod
+    async def put(self, game_state: GameState):
+        """Save a game"""
+
+    @abstractmethod
+    async def delete(self, game_id: str):
+        """Remove a game"""
+
+    async def get_turn_result(self, game_id: str, key: str) -> Optional[Tuple[str, bytes]]:
+        """(request fingerprint, response JSON) of a finished turn by Idempotency-Key (None if unknown)"""
+        return None
+
+    async def put_turn_result(self, game_id: str, key: str, fingerprint: str, data: bytes):
+        """Keep a finished turn's response for IDEMPOTENCY_TTL_SECONDS (shared stores; call under lock())"""
+
+    async def sweep(self):
+        """Drop games idle for longer than the TTL (backends with needs_sweeper)"""
+
+    async def start(self):
+        """Start the idle sweeper (if the backend needs one)"""
+        if self.needs_sweeper and self._sweeper is None and self.idle_ttl > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        """Stop the sweeper and release backend resources"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweep_loop(self):
+        """Background sweeper"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"[Store] Sweep failed: {e}")
+
+    async def was_evicted(self, game_id: str) -> bool:
+        """Whether the game existed but was evicted (410 instead of 404)"""
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Store counters for monitoring"""
+        return {"backend": type(self).__name__}
+
+    async def _acquire_lease(self, game_id: str, owner: str) -> bool:
+        """Try once to take the cross-process lease for a game"""
+        return True
+
+    async def _renew_lease(self, game_id: str, owner: str) -> bool:
+        """Extend a lease this owner holds (False if it was lost)"""
+        return True
+
+    async def _release_lease(self, game_id: str, owner: str):
+        """Give the cross-process lease back"""
+
+    async def _keep_lease(self, game_id: str, owner: str):
+        """Renew a held lease until cancelled"""
+        interval = self.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self._renew_lease(game_id, owner):
+                    self.leases_lost += 1
+                    print(f"[Store] Lost the lease on game {game_id} - another worker may write it")
+                    return
+            except Exception as e:
+                # Transient backend error - the lease still has two thirds left, try again
+                print(f"[Store] Lease renewal failed for game {game_id}: {e}")
+
+    @asynccontextmanager
+    async def lock(self, game_id: str) -> AsyncIterator[None]:
+        """
+        Hold exclusive access to a game for a read-modify-write
+
+        Usage:
+            async with store.lock(game_id):
+                game_state = await store.get(game_id)
+                ...
+                await store.put(game_state)
+        """
+        local_lock = self._local_locks.setdefault(game_id, asyncio.Lock())
+        self._local_lock_users[game_id] = self._local_lock_users.get(game_id, 0) + 1
+        try:
+            async with local_lock:
+                owner = uuid.uuid4().hex
+                deadline = time.monotonic() + self.wait_seconds
+                delay = 0.02
+                while not await self._acquire_lease(game_id, owner):
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Game {game_id} is locked by another worker")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.5)
+                keeper = asyncio.create_task(self._keep_lease(game_id, owner)) if self.uses_lease else None
+                try:
+                    yield
+                finally:
+                    if keeper is not None:
+                        keeper.cancel()
+                        await asyncio.gather(keeper, return_exceptions=True)
+                    await self._release_lease(game_id, owner)
+        finally:
+            # Drop the per-game lock once nobody in this worker uses it
+            self._local_lock_users[game_id] -= 1
+            if self._local_lock_users[game_id] == 0:
+                del self._local_lock_users[game_id]
+                self._local_locks.pop(game_id, None)
+
+    def _serialize(self, game_state: GameState) -> bytes:
+        """Serialise GameState to compact JSON (pydantic-core)"""
+        return game_state.model_dump_json().encode("utf-8")
+
+    def _deserialize(self, data: bytes) -> GameState:
+        """Rebuild GameState from stored JSON"""
+        return GameState.model_validate_json(data)
+
+
+class InMemoryGameStore(GameStore):
+    """Games kept in a process-local dict (single worker only)
+
+    Entries are evicted when idle longer than game_idle_ttl_seconds (by a
+    background sweeper) and in LRU order when the game count or the estimated
+    history size exceeds game_max_count / game_max_bytes. Evicted games are
+    passed to on_evict (e.g. for archiving) and remembered so lookups can
+    report them as expired.
+    """
+
+    needs_sweeper = True
+
+    def __init__(self, on_evict: Optional[Callable[[GameState, str], Any]] = None):
+        super().__init__()
+        self.games: "OrderedDict[str, GameState]" = OrderedDict()
+        self.last_access: Dict[str, float] = {}
+        self.sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.on_evict = on_evict
+        self.max_games = settings.game_max_count
+        self.max_bytes = settings.game_max_bytes
+        # Recently evicted game IDs (bounded) so get_game_state can answer 410
+        self.evicted_ids: "OrderedDict[str, None]" = OrderedDict()
+        self.evictions: Dict[str, int] = {"idle_ttl": 0, "max_games": 0, "byte_budget": 0}
+
+    async def get(self, game_id: str) -> Optional[GameState]:
+        game_state = self.games.get(game_id)
+        if game_state is not None:
+            self.games.move_to_end(game_id)
+            self.last_access[game_id] = time.monotonic()
+        return game_state
+
+    async def put(self, game_state: GameState):
+        game_id = game_state.game_id
+        self.games[game_id] = game_state
+        self.games.move_to_end(game_id)
+        self.last_access[game_id] = time.monotonic()
+        size = self._estimate_size(game_state)
+        self.total_bytes += size - self.sizes.get(game_id, 0)
+        self.sizes[game_id] = size
+        self.evicted_ids.pop(game_id, None)
+        await self._enforce_limits(keep=game_id)
+
+    async def delete(self, game_id: str):
+        self._remove(game_id)
+
+    async def was_evicted(self, game_id: str) -> bool:
+        return game_id in self.evicted_ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "games": len(self.games),
+            "estimated_bytes": self.total_bytes,
+            "max_games": self.max_games,
+            "max_bytes": self.max_bytes,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": dict(self.evictions)
+        }
+
+    async def sweep(self):
+        """Evict games idle for longer than the TTL"""
+        cutoff = time.monotonic() - self.idle_ttl
+        # OrderedDict is in LRU order, so idle games are at the front
+        for game_id in list(self.games):
+            if self.last_access.get(game_id, 0) > cutoff:
+                break
+            await self._evict(game_id, "idle_ttl")
+
+    async def _enforce_limits(self, keep: str):
+        """
+        Evict least recently used games while over the count or byte budget
+
+        The game being saved (keep) and games mid-turn are never evicted; if
+        only those are left the store stays over budget until they finish.
+        """
+        for game_id in list(self.games):
+            if game_id == keep or game_id in self._local_locks:
+                continue
+            if len(self.games) > self.max_games > 0:
+                await self._evict(game_id, "max_games")
+            elif self.total_bytes > self.max_bytes > 0 and len(self.games) > 1:
+                await self._evict(game_id, "byte_budget")
+            else:
+                break
+
+    async def _evict(self, game_id: str, reason: str):
+        """Remove a game, remember it as expired and hand it to on_evict"""
+        if game_id in self._local_locks:
+            # Mid-turn - it will be saved again when the turn finishes
+            return
+        game_state = self._remove(game_id)
+        if game_state is None:
+            return
+        self.evictions[reason] += 1
+        self.evicted_ids[game_id] = None
+        while len(self.evicted_ids) > settings.game_evicted_ids_max:
+            self.evicted_ids.popitem(last=False)
+        if self.on_evict is not None:
+            try:
+                result = self.on_evict(game_state, reason)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"[Store] on_evict hook failed for game {game_id}: {e}")
+
+    def _remove(self, game_id: str) -> Optional[GameState]:
+        """Drop a game and its bookkeeping"""
+        game_state = self.games.pop(game_id, None)
+        self.last_access.pop(game_id, None)
+        self.total_bytes -= self.sizes.pop(game_id, 0)
+        return game_state
+
+    def _estimate_size(self, game_state: GameState) -> int:
+        """Rough memory footprint of a game, dominated by conversation_history"""
+        size = 1024  # GameState object, lists, ids and timestamps
+        for message in game_state.conversation_history:
+            size += sys.getsizeof(message) + sum(sys.getsizeof(value) for value in message.values())
+        return size
+
+
+async def archive_game_jsonl(game_state: GameState, reason: str):
+    """on_evict hook: append the evicted game to GAME_ARCHIVE_PATH as JSONL (written off the event loop)"""
+    line = json.dumps({
+        "evicted_at": time.time(),
+        "reason": reason,
+        "game": json.loads(game_state.model_dump_json())
+    }, ensure_ascii=False) + "\n"
+    await asyncio.to_thread(_append_line, settings.game_archive_path, line)
+
+
+def _append_line(path: str, line: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+class SQLiteGameStore(GameStore):
+    """Games in a SQLite file (WAL mode) shared by all workers on one host
+
+    Games not saved for game_idle_ttl_seconds are deleted by the sweeper
+    (skipping games whose lease is held, i.e. mid-turn) and leave a tombstone
+    for game_tombstone_seconds so lookups can report them as expired.
+    """
+
+    needs_sweeper = True
+    uses_lease = True
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "game_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS games_updated_at ON games (updated_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS expired_games ("
+            "game_id TEXT PRIMARY KEY, expired_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS turn_results ("
+            "game_id TEXT NOT NULL, idempotency_key TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+            "data BLOB NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (game_id, idempotency_key))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS game_locks ("
+            "game_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # sqlite3 connections are not safe for concurrent use from several threads
+        self._db_lock = asyncio.Lock()
+        self.tombstone_seconds = settings.game_tombstone_seconds
+        self.expired = 0
+
+    def _execute(self, sql: str, params: tuple) -> tuple:
+        """Execute a statement and return (rows, rowcount)"""
+        cursor = self._conn.execute(sql, params)
+        return cursor.fetchall(), cursor.rowcount
+
+    def _execute_transaction(self, statements: list) -> list:
+        """Execute [(sql, params)] in one transaction and return each rowcount"""
+        rowcounts = []
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                rowcounts.append(self._conn.execute(sql, params).rowcount)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return rowcounts
+
+    async def _run(self, sql: str, params: tuple = ()) -> tuple:
+        """Execute a statement in a worker thread"""
+        async with self._db_lock:
+            return await asyncio.to_thread(self._execute, sql, params)
+
+    async def _run_transaction(self, statements: list) -> list:
+        """Execute statements atomically in a worker thread"""
+        async with self._db_lock:
+            return await asyncio.to_thread(self._execute_transaction, statements)
+
+    async def get(self, game_id: str) -> Optional[GameState]:
+        rows, _ = await self._run("SELECT data FROM games WHERE game_id = ?", (game_id,))
+        return self._deserialize(rows[0][0]) if rows else None
+
+    async def put(self, game_state: GameState):
+        await self._run(
+            "INSERT INTO games (game_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(game_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (game_state.game_id, self._serialize(game_state), time.time())
+        )
+
+    async def delete(self, game_id: str):
+        await self._run("DELETE FROM games WHERE game_id = ?", (game_id,))
+
+    async def was_evicted(self, game_id: str) -> bool:
+        rows, _ = await self._run("SELECT 1 FROM expired_games WHERE game_id = ?", (game_id,))
+        return bool(rows)
+
+    async def get_turn_result(self, game_id: str, key: str) -> Optional[Tuple[str, bytes]]:
+        rows, _ = await self._run(
+            "SELECT fingerprint, data FROM turn_results WHERE game_id = ? AND idempotency_key = ? AND expires_at >= ?",
+            (game_id, key, time.time())
+        )
+        return (rows[0][0], rows[0][1]) if rows else None
+
+    async def put_turn_result(self, game_id: str, key: str, fingerprint: str, data: bytes):
+        now = time.time()
+        # Expired results of this game go with it, so the table stays bounded without the sweeper
+        await self._run_transaction([
+            ("DELETE FROM turn_results WHERE game_id = ? AND expires_at < ?", (game_id, now)),
+            ("INSERT OR REPLACE INTO turn_results (game_id, idempotency_key, fingerprint, data, expires_at) "
+             "VALUES (?, ?, ?, ?, ?)", (game_id, key, fingerprint, data, now + self.turn_result_ttl))
+        ])
+
+    async def sweep(self):
+        """Delete games not saved within the TTL (leaving tombstones), expired leases and old tombstones"""
+        now = time.time()
+        idle = (
+            "FROM games WHERE updated_at < ? "
+            "AND game_id NOT IN (SELECT game_id FROM game_locks WHERE expires_at >= ?)"
+        )
+        _, deleted, _, _, _ = await self._run_transaction([
+            (f"INSERT OR REPLACE INTO expired_games (game_id, expired_at) SELECT game_id, ? {idle}",
+             (now, now - self.idle_ttl, now)),
+            (f"DELETE {idle}", (now - self.idle_ttl, now)),
+            ("DELETE FROM game_locks WHERE expires_at < ?", (now,)),
+            ("DELETE FROM expired_games WHERE expired_at < ?", (now - self.tombstone_seconds,)),
+            ("DELETE FROM turn_results WHERE expires_at < ?", (now,))
+        ])
+        self.expired += max(0, deleted)
+
+    async def close(self):
+        await super().close()
+        async with self._db_lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "idle_ttl_seconds": self.idle_ttl,
+            "expired": self.expired,
+            "leases_lost": self.leases_lost
+        }
+
+    async def _acquire_lease(self, game_id: str, owner: str) -> bool:
+        now = time.time()
+        _, rowcount = await self._run(
+            "INSERT INTO game_locks (game_id, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(game_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE game_locks.expires_at < ?",
+            (game_id, owner, now + self.lease_seconds, now)
+        )
+        return rowcount == 1
+
+    async def _renew_lease(self, game_id: str, owner: str) -> bool:
+        _, rowcount = await self._run(
+            "UPDATE game_locks SET expires_at = ? WHERE game_id = ? AND owner = ?",
+            (time.time() + self.lease_seconds, game_id, owner)
+        )
+        return rowcount == 1
+
+    async def _release_lease(self, game_id: str, owner: str):
+        await self._run("DELETE FROM game_locks WHERE game_id = ? AND owner = ?", (game_id, owner))
+
+
+class RedisGameStore(GameStore):
+    """Games in Redis (or any server speaking the Redis protocol)
+
+    Game keys expire game_idle_ttl_seconds after the last save. Each save also
+    refreshes a "seen" key that outlives the game by game_tombstone_seconds,
+    so a missing game with a live seen key is reported as expired.
+    """
+
+    uses_lease = True
+
+    # Compare-and-delete / compare-and-extend so a worker never touches a lease it no longer owns
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+    RENEW_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+
+    def __init__(self, url: str):
+        super().__init__()
+        try:
+            import redis.asyncio as redis_asyncio
+            from redis.exceptions import ResponseError
+        except ImportError:
+            raise ValueError("GAME_STORE=redis requires the 'redis' package (pip install redis)")
+        self.client = redis_asyncio.from_url(url)
+        self._response_error = ResponseError
+        self.prefix = settings.redis_key_prefix
+        self.tombstone_seconds = settings.game_tombstone_seconds
+
+    def _key(self, game_id: str) -> str:
+        return f"{self.prefix}game:{game_id}"
+
+    def _seen_key(self, game_id: str) -> str:
+        return f"{self.prefix}seen:{game_id}"
+
+    def _turn_key(self, game_id: str, key: str) -> str:
+        return f"{self.prefix}turn:{game_id}:{key}"
+
+    def _lock_key(self, game_id: str) -> str:
+        return f"{self.prefix}lock:{game_id}"
+
+    async def get(self, game_id: str) -> Optional[GameState]:
+        data = await self.client.get(self._key(game_id))
+        return self._deserialize(data) if data else None
+
+    async def put(self, game_state: GameState):
+        if self.idle_ttl <= 0:
+            await self.client.set(self._key(game_state.game_id), self._serialize(game_state))
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self._key(game_state.game_id), self._serialize(game_state), px=int(self.idle_ttl * 1000))
+            pipe.set(self._seen_key(game_state.game_id), b"1", px=int((self.idle_ttl + self.tombstone_seconds) * 1000))
+            await pipe.execute()
+
+    async def delete(self, game_id: str):
+        await self.client.delete(self._key(game_id), self._seen_key(game_id))
+
+    async def was_evicted(self, game_id: str) -> bool:
+        if self.idle_ttl <= 0:
+            return False
+        # Seen within the tombstone window but the game key itself has expired
+        return await self.client.exists(self._seen_key(game_id), self._key(game_id)) == 1
+
+    async def get_turn_result(self, game_id: str, key: str) -> Optional[Tuple[str, bytes]]:
+        value = await self.client.get(self._turn_key(game_id, key))
+        if not value:
+            return None
+        fingerprint, _, data = value.partition(b"\n")
+        return fingerprint.decode("utf-8"), data
+
+    async def put_turn_result(self, game_id: str, key: str, fingerprint: str, data: bytes):
+        await self.client.set(
+            self._turn_key(game_id, key),
+            fingerprint.encode("utf-8") + b"\n" + data,
+            px=max(1, int(self.turn_result_ttl * 1000))
+        )
+
+    async def close(self):
+        await super().close()
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "idle_ttl_seconds": self.idle_ttl, "leases_lost": self.leases_lost}
+
+    async def _acquire_lease(self, game_id: str, owner: str) -> bool:
+        acquired = await self.client.set(
+            self._lock_key(game_id),
+            owner,
+            nx=True,
+            px=int(self.lease_seconds * 1000)
+        )
+        return bool(acquired)
+
+    async def _renew_lease(self, game_id: str, owner: str) -> bool:
+        lock_key = self._lock_key(game_id)
+        lease_ms = int(self.lease_seconds * 1000)
+        try:
+            return bool(await self.client.eval(self.RENEW_SCRIPT, 1, lock_key, owner, lease_ms))
+        except self._response_error:
+            # Stand-in servers without Lua scripting: compare, then extend
+            if await self.client.get(lock_key) != owner.encode("utf-8"):
+                return False
+            return bool(await self.client.pexpire(lock_key, lease_ms))
+
+    async def _release_lease(self, game_id: str, owner: str):
+        lock_key = self._lock_key(game_id)
+        try:
+            await self.client.eval(self.RELEASE_SCRIPT, 1, lock_key, owner)
+        except self._response_error:
+            # Stand-in servers without Lua scripting: compare, then delete
+            if await self.client.get(lock_key) == owner.encode("utf-8"):
+                await self.client.delete(lock_key)
+
+
+def create_game_store() -> GameStore:
+    """Create the game store selected by GAME_STORE (memory, sqlite, redis)"""
+    backend = settings.game_store.lower()
+    if backend == "sqlite":
+        return SQLiteGameStore(settings.game_store_path)
+    if backend == "redis":
+        return RedisGameStore(settings.redis_url)
+    if backend != "memory":
+        raise ValueError(f"Unknown GAME_STORE '{settings.game_store}'. Must be 'memory', 'sqlite' or 'redis'")
+    return InMemoryGameStore(on_evict=archive_game_jsonl if settings.game_archive_path else None)
@@ -3,11 +3,51 @@ GPT Audio TTS service via OpenRouter API
 Supports streaming audio generation
 """
 import httpx
+import asyncio
 import base64
 import json
+import re
+import time
 from typing import Optional, AsyncIterator, Dict, Any, List
 from backend.config import settings
+from backend.services.http_client import upstream_clients
 from backend.services.elevenlabs_service import ElevenLabsService
+from backend.services.tts_cache import tts_cache, tts_cache_key
+from backend.services.audio_postprocess import create_processor, NUMPY_AVAILABLE
+from backend.services.tts_router import tts_router, AudioStream
+from backend.services.metrics import metrics
+from backend.services.usage_ledger import usage_ledger
+
+# TTS backends: Kie.ai ElevenLabs (MP3) and GPT Audio streaming (PCM16)
+KIE_BACKEND = "kie"
+GPT_AUDIO_BACKEND = "gpt_audio"
+
+
+def split_sentences(text: str, min_chars: int = 0) -> List[str]:
+    """
+    Split a reply on sentence boundaries for pipelined TTS
+    
+    Args:
+        text: Reply text
+        min_chars: Fragments shorter than this are merged into the next sentence
+        
+    Returns:
+        Sentences in order (a single item if the text can't be split)
+    """
+    parts = [part.strip() for part in re.split(r"(?<=[.!?…])\s+", text.strip()) if part.strip()]
+    sentences: List[str] = []
+    pending = ""
+    for part in parts:
+        pending = f"{pending} {part}".strip()
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
 
 
 class GPTAudioService:
@@ -23,11 +63,35 @@ class GPTAudioService:
         self.tts_voice = settings.tts_voice
         self.tts_format = settings.tts_format
         self.elevenlabs_service = ElevenLabsService()
+        self.sentence_pipeline = settings.tts_sentence_pipeline
+        self.primary_backend = KIE_BACKEND if self.use_tts_only else GPT_AUDIO_BACKEND
+        # Hedge with the other backend when the primary is slow to its first byte
+        self.hedge_backend = None
+        if settings.tts_hedging:
+            self.hedge_backend = GPT_AUDIO_BACKEND if self.use_tts_only else KIE_BACKEND
+        # Post-processing applies to raw PCM16 streams only (not Kie.ai MP3)
+        self.postprocess = settings.audio_postprocess
+        if self.postprocess and not NUMPY_AVAILABLE:
+            print("[GPT Audio] AUDIO_POSTPROCESS needs numpy (pip install \".[audio]\"), sending raw PCM16")
+            self.postprocess = False
 
     async def generate_tts_audio(self, text: str) -> bytes:
         """
         Generate complete TTS audio using Kie.ai (ElevenLabs).
         """
+        chunks = [chunk async for chunk in self.generate_tts_stream(text)]
+        return b"".join(chunks)
+
+    async def generate_tts_stream(self, text: str) -> AsyncIterator[bytes]:
+        """
+        Generate TTS audio using Kie.ai (ElevenLabs), forwarding the download as it arrives
+        
+        Args:
+            text: Text to convert to speech
+            
+        Yields:
+            Audio chunks straight from the response body (nothing is buffered)
+        """
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
 
@@ -38,43 +102,263 @@ class GPTAudioService:
         if not audio_url:
             raise ValueError("Kie.ai TTS error: No audio URL returned")
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            async with client.stream("GET", audio_url) as response:
-                response.raise_for_status()
-                audio_bytes = await response.aread()
-                if not audio_bytes:
-                    raise ValueError("Kie.ai TTS error: Empty audio content")
-                return audio_bytes
+        client = upstream_clients.get(audio_url)
+        async with client.stream("GET", audio_url, timeout=120.0) as response:
+            response.raise_for_status()
+            total_bytes = 0
+            async for chunk in response.aiter_bytes():
+                if chunk:
+                    total_bytes += len(chunk)
+                    yield chunk
+            if not total_bytes:
+                raise ValueError("Kie.ai TTS error: Empty audio content")
         
-    async def generate_audio_stream(
+    def backend_media_type(self, backend: Optional[str] = None) -> str:
+        """Media type a TTS backend produces"""
+        if (backend or self.primary_backend) == KIE_BACKEND:
+            return "audio/mpeg"
+        # Raw PCM16 mono from GPT Audio (little-endian)
+        return f"audio/L16; rate={settings.gpt_audio_sample_rate}; channels=1"
+    
+    def backend_model(self, backend: Optional[str] = None) -> str:
+        """Model a TTS backend synthesises with (metrics label)"""
+        if (backend or self.primary_backend) == KIE_BACKEND:
+            return self.elevenlabs_service.model
+        return self.model
+    
+    def stream_media_type(self, source_media_type: Optional[str] = None) -> str:
+        """
+        Media type of the bytes process_output yields
+        
+        Args:
+            source_media_type: Media type of the stream being processed (default: primary backend)
+        """
+        source_media_type = source_media_type or self.backend_media_type()
+        if self.postprocess and source_media_type.startswith("audio/L16"):
+            return create_processor(settings.gpt_audio_sample_rate).media_type
+        return source_media_type
+    
+    async def process_output(
+        self,
+        audio_chunks: AsyncIterator[bytes],
+        source_media_type: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Apply the optional PCM16 post-processing stage (resample/downmix/μ-law/WAV) to a stream
+        
+        Args:
+            audio_chunks: Stream from generate_audio_stream or a turn buffer
+            source_media_type: Media type of that stream (default: primary backend)
+            
+        Yields:
+            Processed chunks, one per input chunk (no extra buffering)
+        """
+        source_media_type = source_media_type or self.backend_media_type()
+        if not self.postprocess or not source_media_type.startswith("audio/L16"):
+            async for chunk in audio_chunks:
+                yield chunk
+            return
+        
+        processor = create_processor(settings.gpt_audio_sample_rate)
+        async for chunk in audio_chunks:
+            processed = processor.process(chunk)
+            if processed:
+                yield processed
+        tail = processor.flush()
+        if tail:
+            yield tail
+    
+    def cache_key(self, text: str, voice: Optional[str] = None, backend: Optional[str] = None) -> str:
+        """TTS cache key for a clip from a backend (default: primary)"""
+        if (backend or self.primary_backend) == KIE_BACKEND:
+            # Kie.ai path ignores the voice override
+            return self.elevenlabs_service.cache_key(text)
+        return tts_cache_key(
+            text,
+            voice=voice or settings.gpt_audio_voice or "alloy",
+            model=self.model,
+            audio_format="pcm16",
+            language=settings.primary_language
+        )
+    
+    def generate_audio_stream(
         self,
         text: str,
-        voice: Optional[str] = None
+        voice: Optional[str] = None,
+        hedge: bool = True
+    ) -> AudioStream:
+        """
+        Generate audio stream from text, served from the TTS cache when possible
+        
+        With TTS_SENTENCE_PIPELINE, multi-sentence replies are synthesised per
+        sentence in parallel and streamed in order. With TTS_HEDGING, the
+        other backend is started when the primary is slow to its first byte.
+        
+        Args:
+            text: Text to convert to speech
+            voice: Voice name (optional, if supported by model)
+            hedge: Allow TTS_HEDGING (off for clients that cannot tell which format won)
+            
+        Returns:
+            Async-iterable of audio chunks; its backend and media_type are set once opened
+        """
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        
+        def backend_stream(backend: str) -> AsyncIterator[bytes]:
+            return self._cached_stream(text, voice, allow_split=self.sentence_pipeline, backend=backend)
+        
+        async def open_stream():
+            started = time.monotonic()
+            primary = self.primary_backend
+            cached = await tts_cache.get(self.cache_key(text, voice, primary)) is not None
+            if self.hedge_backend is None or cached or not hedge:
+                backend, media_type, chunks = primary, self.backend_media_type(primary), backend_stream(primary)
+            else:
+                backend, media_type, chunks = await tts_router.open(
+                    [(primary, self.backend_media_type(primary)), (self.hedge_backend, self.backend_media_type(self.hedge_backend))],
+                    backend_stream
+                )
+            return backend, media_type, self._timed_stream(chunks, backend, "cache" if cached else "upstream", started)
+        
+        return AudioStream(open_stream)
+    
+    async def _timed_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        backend: str,
+        source: str,
+        started: float
+    ) -> AsyncIterator[bytes]:
+        """Record TTS time to first byte and to the last byte (completed streams only)"""
+        first = True
+        try:
+            async for chunk in chunks:
+                if first:
+                    metrics.tts_first_byte_seconds.observe(time.monotonic() - started, backend, source)
+                    first = False
+                yield chunk
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        metrics.tts_total_seconds.observe(time.monotonic() - started, backend, source)
+    
+    async def _cached_stream(
+        self,
+        text: str,
+        voice: Optional[str],
+        allow_split: bool,
+        backend: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """Serve a clip from the TTS cache, or synthesise it (per sentence if allowed) and cache it"""
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        
+        backend = backend or self.primary_backend
+        key = self.cache_key(text, voice, backend)
+        cached = await tts_cache.get(key)
+        if cached is not None:
+            chunk_size = 16384
+            for i in range(0, len(cached), chunk_size):
+                yield cached[i:i + chunk_size]
+            return
+        
+        if allow_split:
+            sentences = split_sentences(text, settings.tts_sentence_min_chars)
+            if len(sentences) > 1:
+                async for chunk in self._pipelined_stream(sentences, voice, backend):
+                    yield chunk
+                return
+        
+        # Miss - tee the synthesised stream into the cache once it completes.
+        # Clips larger than the cache entry limit are not kept, so memory per
+        # request stays bounded whatever the clip length.
+        chunks = []
+        size = 0
+        with metrics.upstream(backend, self.backend_model(backend)):
+            async for chunk in self.synthesize_stream(text, voice, backend):
+                if chunks is not None:
+                    size += len(chunk)
+                    if size <= tts_cache.max_entry_bytes:
+                        chunks.append(chunk)
+                    else:
+                        chunks = None
+                yield chunk
+        if chunks:
+            await tts_cache.put(key, b"".join(chunks))
+    
+    async def _pipelined_stream(
+        self,
+        sentences: List[str],
+        voice: Optional[str],
+        backend: Optional[str] = None
     ) -> AsyncIterator[bytes]:
         """
-        Generate audio stream from text using GPT Audio via OpenRouter
+        Synthesise sentences concurrently (bounded) and stream them in order
+        
+        Sentence 1 streams live while later sentences render into their own
+        queues, so playback starts after the first sentence's latency only.
+        Each sentence is cached on its own.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.tts_sentence_parallelism))
+        queues = [asyncio.Queue() for _ in sentences]
+        
+        async def render(sentence: str, queue: asyncio.Queue):
+            # Semaphore waiters are served in order, so earlier sentences start first
+            async with semaphore:
+                try:
+                    async for chunk in self._cached_stream(sentence, voice, allow_split=False, backend=backend):
+                        await queue.put(chunk)
+                    await queue.put(None)
+                except Exception as e:
+                    await queue.put(e)
+        
+        tasks = [asyncio.create_task(render(sentence, queue)) for sentence, queue in zip(sentences, queues)]
+        try:
+            for queue in queues:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let cancelled renders unwind (closing their upstream streams) before returning
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def synthesize_stream(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        backend: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Generate audio stream from text using GPT Audio via OpenRouter (bypasses the TTS cache)
         
         Args:
             text: Text to convert to speech
             voice: Voice name (optional, if supported by model)
+            backend: KIE_BACKEND or GPT_AUDIO_BACKEND (default: primary)
             
         Yields:
             Audio chunks as bytes (decoded from base64)
         """
-        if not self.api_key:
-            raise ValueError("OPENROUTER_API_KEY not set in environment")
-            
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
             
-        # If using TTS-only, generate audio via Kie.ai and stream chunks
-        if self.use_tts_only:
-            audio_bytes = await self.generate_tts_audio(text)
-            chunk_size = 16384
-            for i in range(0, len(audio_bytes), chunk_size):
-                yield audio_bytes[i:i + chunk_size]
+        # Kie.ai backend: pass the audio download through as it arrives
+        if (backend or self.primary_backend) == KIE_BACKEND:
+            async for chunk in self.generate_tts_stream(text):
+                yield chunk
             return
 
+        if not self.api_key:
+            raise ValueError("OPENROUTER_API_KEY not set in environment")
+
         # Build messages for GPT Audio
         # GPT Audio expects text in messages format
         messages = [
@@ -111,137 +395,145 @@ class GPTAudioService:
             print(f"[GPT Audio] Overriding audio.format '{payload['audio']['format']}' -> 'pcm16' for stream=true")
             payload["audio"]["format"] = "pcm16"
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            try:
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/chat/completions",
-                    json=payload,
-                    headers=headers
-                ) as response:
-                    if response.status_code != 200:
-                        error_bytes = await response.aread()
-                        error_text = error_bytes.decode("utf-8", errors="replace")[:1000]
-                        print(f"[GPT Audio] Non-200 response ({response.status_code}): {error_text}")
-                        raise ValueError(f"GPT Audio API error: HTTP {response.status_code}: {error_text}")
-                    
-                    response.raise_for_status()
-                    
-                    chunk_count = 0
-                    line_count = 0
-                    async for line in response.aiter_lines():
-                        line_count += 1
-                        if not line.strip():
-                            continue
+        if usage_ledger.enabled:
+            payload["usage"] = {"include": True}
+        
+        client = upstream_clients.get(self.base_url)
+        started = time.monotonic()
+        usage = None
+        try:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=120.0
+            ) as response:
+                if response.status_code != 200:
+                    error_bytes = await response.aread()
+                    error_text = error_bytes.decode("utf-8", errors="replace")[:1000]
+                    print(f"[GPT Audio] Non-200 response ({response.status_code}): {error_text}")
+                    raise ValueError(f"GPT Audio API error: HTTP {response.status_code}: {error_text}")
+                
+                response.raise_for_status()
+                
+                chunk_count = 0
+                line_count = 0
+                async for line in response.aiter_lines():
+                    line_count += 1
+                    if not line.strip():
+                        continue
+                        
+                    # Parse SSE format: "data: {...}"
+                    if line.startswith("data: "):
+                        data_str = line[6:]  # Remove "data: " prefix
+                        
+                        if data_str == "[DONE]":
+                            print(f"[GPT Audio] Stream completed. Total chunks: {chunk_count}, Total lines: {line_count}")
+                            break
                             
-                        # Parse SSE format: "data: {...}"
-                        if line.startswith("data: "):
-                            data_str = line[6:]  # Remove "data: " prefix
+                        try:
+                            data = json.loads(data_str)
+                            usage = data.get("usage") or usage
                             
-                            if data_str == "[DONE]":
-                                print(f"[GPT Audio] Stream completed. Total chunks: {chunk_count}, Total lines: {line_count}")
-                                break
-                                
-                            try:
-                                data = json.loads(data_str)
-                                
-                                # Debug: log full structure for first few chunks
-                                if chunk_count < 2:
-                                    print(f"[GPT Audio] Raw data keys: {list(data.keys())}")
+                            # Debug: log full structure for first few chunks
+                            if chunk_count < 2:
+                                print(f"[GPT Audio] Raw data keys: {list(data.keys())}")
+                            
+                            choices = data.get("choices", [])
+                            
+                            if choices:
+                                delta = choices[0].get("delta", {})
                                 
-                                choices = data.get("choices", [])
+                                # Debug: log delta structure
+                                if chunk_count < 3:  # Log first 3 chunks for debugging
+                                    print(f"[GPT Audio] Chunk {chunk_count} delta keys: {list(delta.keys())}")
+                                    if "audio" not in delta:
+                                        print(f"[GPT Audio] Chunk {chunk_count} full delta: {delta}")
                                 
-                                if choices:
-                                    delta = choices[0].get("delta", {})
-                                    
-                                    # Debug: log delta structure
-                                    if chunk_count < 3:  # Log first 3 chunks for debugging
-                                        print(f"[GPT Audio] Chunk {chunk_count} delta keys: {list(delta.keys())}")
-                                        if "audio" not in delta:
-                                            print(f"[GPT Audio] Chunk {chunk_count} full delta: {delta}")
-                                    
-                                    # Check for audio data - format: {"audio": {"id": "...", "data": "base64...", "transcript": "..."}}
-                                    audio_data = delta.get("audio")
-                                    if audio_data:
-                                        chunk_count += 1
-                                        # Audio should be a dict with "id", "data", "transcript"
-                                        if isinstance(audio_data, dict):
-                                            # Format: {"id": "...", "data": "base64...", "transcript": "..."}
-                                            audio_base64 = audio_data.get("data", "")
-                                            if audio_base64:
-                                                try:
-                                                    audio_bytes = base64.b64decode(audio_base64)
-                                                    print(f"[GPT Audio] ✅ Decoded audio chunk {chunk_count}, size: {len(audio_bytes)} bytes")
-                                                    yield audio_bytes
-                                                except Exception as e:
-                                                    print(f"[GPT Audio] ❌ Failed to decode base64 audio: {e}")
-                                                    continue
-                                            else:
-                                                print(f"[GPT Audio] ⚠️ Audio dict has no 'data' field. Keys: {list(audio_data.keys())}")
-                                        elif isinstance(audio_data, str):
-                                            # Direct base64 string (fallback)
+                                # Check for audio data - format: {"audio": {"id": "...", "data": "base64...", "transcript": "..."}}
+                                audio_data = delta.get("audio")
+                                if audio_data:
+                                    chunk_count += 1
+                                    # Audio should be a dict with "id", "data", "transcript"
+                                    if isinstance(audio_data, dict):
+                                        # Format: {"id": "...", "data": "base64...", "transcript": "..."}
+                                        audio_base64 = audio_data.get("data", "")
+                                        if audio_base64:
                                             try:
-                                                audio_bytes = base64.b64decode(audio_data)
-                                                print(f"[GPT Audio] ✅ Decoded audio chunk {chunk_count} (string format), size: {len(audio_bytes)} bytes")
+                                                audio_bytes = base64.b64decode(audio_base64)
+                                                print(f"[GPT Audio] ✅ Decoded audio chunk {chunk_count}, size: {len(audio_bytes)} bytes")
                                                 yield audio_bytes
                                             except Exception as e:
-                                                print(f"[GPT Audio] ❌ Failed to decode base64 audio string: {e}")
+                                                print(f"[GPT Audio] ❌ Failed to decode base64 audio: {e}")
                                                 continue
-                                    else:
-                                        # Check for other content types - might be text-only response
-                                        if "content" in delta:
-                                            if chunk_count < 3:
-                                                print(f"[GPT Audio] ⚠️ Chunk {chunk_count} has text content only, no audio. Delta keys: {list(delta.keys())}")
-                                        # Check if this is the first chunk with model info
-                                        if "role" in delta and chunk_count == 0:
-                                            print(f"[GPT Audio] First chunk - role: {delta.get('role')}")
-                                    
-                                    # Also check for transcript (optional)
-                                    transcript = delta.get("transcript", "")
-                                    if transcript:
+                                        else:
+                                            print(f"[GPT Audio] ⚠️ Audio dict has no 'data' field. Keys: {list(audio_data.keys())}")
+                                    elif isinstance(audio_data, str):
+                                        # Direct base64 string (fallback)
+                                        try:
+                                            audio_bytes = base64.b64decode(audio_data)
+                                            print(f"[GPT Audio] ✅ Decoded audio chunk {chunk_count} (string format), size: {len(audio_bytes)} bytes")
+                                            yield audio_bytes
+                                        except Exception as e:
+                                            print(f"[GPT Audio] ❌ Failed to decode base64 audio string: {e}")
+                                            continue
+                                else:
+                                    # Check for other content types - might be text-only response
+                                    if "content" in delta:
                                         if chunk_count < 3:
-                                            print(f"[GPT Audio] Transcript chunk: {transcript[:50]}")
-                                        
-                            except json.JSONDecodeError as e:
-                                print(f"[GPT Audio] Failed to parse JSON: {e}, line: {line[:200]}")
-                                continue
-                    
-                    if chunk_count == 0:
-                        print(f"[GPT Audio] WARNING: No audio chunks received!")
+                                            print(f"[GPT Audio] ⚠️ Chunk {chunk_count} has text content only, no audio. Delta keys: {list(delta.keys())}")
+                                    # Check if this is the first chunk with model info
+                                    if "role" in delta and chunk_count == 0:
+                                        print(f"[GPT Audio] First chunk - role: {delta.get('role')}")
                                 
-            except httpx.HTTPStatusError as e:
-                error_detail = f"HTTP {e.response.status_code}"
-                try:
-                    # Read error response if possible
-                    if hasattr(e.response, 'read'):
+                                # Also check for transcript (optional)
+                                transcript = delta.get("transcript", "")
+                                if transcript:
+                                    if chunk_count < 3:
+                                        print(f"[GPT Audio] Transcript chunk: {transcript[:50]}")
+                                    
+                        except json.JSONDecodeError as e:
+                            print(f"[GPT Audio] Failed to parse JSON: {e}, line: {line[:200]}")
+                            continue
+                
+                if chunk_count == 0:
+                    print(f"[GPT Audio] WARNING: No audio chunks received!")
+                usage_ledger.record("tts", self.model, time.monotonic() - started, usage=usage, characters=len(text.strip()))
+                            
+        except httpx.HTTPStatusError as e:
+            error_detail = f"HTTP {e.response.status_code}"
+            try:
+                # Read error response if possible
+                if hasattr(e.response, 'read'):
+                    try:
+                        error_text = e.response.read().decode('utf-8')[:500]
                         try:
-                            error_text = e.response.read().decode('utf-8')[:500]
-                            try:
-                                error_body = json.loads(error_text)
-                                if "error" in error_body:
-                                    error_detail = error_body["error"].get("message", str(error_body["error"]))
-                                elif "detail" in error_body:
-                                    error_detail = error_body["detail"]
-                                else:
-                                    error_detail = error_text
-                            except:
+                            error_body = json.loads(error_text)
+                            if "error" in error_body:
+                                error_detail = error_body["error"].get("message", str(error_body["error"]))
+                            elif "detail" in error_body:
+                                error_detail = error_body["detail"]
+                            else:
                                 error_detail = error_text
                         except:
-                            error_detail = str(e)
-                    else:
+                            error_detail = error_text
+                    except:
                         error_detail = str(e)
-                except Exception as read_error:
-                    print(f"[GPT Audio] Could not read error response: {read_error}")
-                    error_detail = f"HTTP {e.response.status_code}: {str(e)}"
-                raise ValueError(f"GPT Audio API error: {error_detail}")
-            except httpx.RequestError as e:
-                raise ValueError(f"Request to GPT Audio API failed: {str(e)}")
-            except Exception as e:
-                print(f"[GPT Audio] Unexpected error in generate_audio_stream: {e}")
-                import traceback
-                traceback.print_exc()
-                raise
-    
+                else:
+                    error_detail = str(e)
+            except Exception as read_error:
+                print(f"[GPT Audio] Could not read error response: {read_error}")
+                error_detail = f"HTTP {e.response.status_code}: {str(e)}"
+            raise ValueError(f"GPT Audio API error: {error_detail}")
+        except httpx.RequestError as e:
+            raise ValueError(f"Request to GPT Audio API failed: {str(e)}")
+        except Exception as e:
+            print(f"[GPT Audio] Unexpected error in generate_audio_stream: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
     async def generate_audio_complete(
         self,
         text: str,
@@ -0,0 +1,75 @@
+"""
+Shared pooled HTTP clients for upstream services (OpenRouter, Kie.ai, audio CDNs)
+"""
+import httpx
+from typing import Dict
+from urllib.parse import urlsplit
+from backend.config import settings
+
+try:
+    import h2  # noqa: F401 - only needed so httpx can negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class UpstreamClientRegistry:
+    """Process-wide registry of keep-alive httpx clients, one per upstream host"""
+
+    def __init__(self):
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.http2 = settings.upstream_http2 and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=settings.upstream_max_connections,
+            max_keepalive_connections=settings.upstream_max_keepalive_connections,
+            keepalive_expiry=settings.upstream_keepalive_expiry
+        )
+        self.default_timeout = httpx.Timeout(60.0, connect=settings.upstream_connect_timeout)
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        """
+        Get the pooled client for the host of the given URL
+
+        Args:
+            url: Any URL (or base URL) on the upstream host
+
+        Returns:
+            Shared httpx.AsyncClient with keep-alive pooling for that host
+        """
+        origin = self._origin(url)
+        client = self.clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.default_timeout
+            )
+            self.clients[origin] = client
+        return client
+
+    async def startup(self):
+        """Open clients for the well-known upstreams so the first turn doesn't pay for it"""
+        self.get(settings.openrouter_base_url)
+        self.get(settings.kie_ai_base_url)
+        print(f"[HTTP] Upstream client pool ready (http2={self.http2}, max_connections={settings.upstream_max_connections})")
+
+    async def shutdown(self):
+        """Close every pooled client"""
+        clients = list(self.clients.values())
+        self.clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"[HTTP] Failed to close upstream client: {e}")
+
+    def _origin(self, url: str) -> str:
+        """Reduce a URL to scheme://host[:port]"""
+        parts = urlsplit(url)
+        if not parts.netloc:
+            return url
+        return f"{parts.scheme}://{parts.netloc}"
+
+
+# Shared registry used by all upstream services
+upstream_clients = UpstreamClientRegistry()
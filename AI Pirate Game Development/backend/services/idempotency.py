@@ -0,0 +1,117 @@
+"""
+Idempotency-Key support - coalesces retried requests onto one in-flight turn
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from backend.config import settings
+
+
+class IdempotencyConflictError(Exception):
+    """Raised when an Idempotency-Key is reused with a different request"""
+
+
+class _Entry:
+    """In-flight or completed request for one key"""
+
+    def __init__(self, fingerprint: str, future: asyncio.Future):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.created_at = time.monotonic()
+
+
+class IdempotencyCache:
+    """
+    Maps (scope, Idempotency-Key) to the running or finished request
+
+    A retried request with the same key attaches to the in-flight future, or
+    gets the cached result within the TTL, instead of running the turn again.
+    Failed requests are not cached so the client can retry them. The cache is
+    per process; PirateService also keeps finished turns in the game store so
+    a retry reaching another worker is replayed from there.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = settings.idempotency_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.max_entries = settings.idempotency_max_entries if max_entries is None else max_entries
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # shared_replays: answered from the game store (finished on another worker or before a restart)
+        self.stats: Dict[str, int] = {"executed": 0, "coalesced": 0, "replayed": 0, "shared_replays": 0, "conflicts": 0}
+
+    @staticmethod
+    def fingerprint(payload: str) -> str:
+        """Identity of a request body, compared when a key is reused"""
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        payload: str,
+        func: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Run func once per (scope, key)
+
+        Args:
+            scope: Namespace for the key (e.g. game ID)
+            key: Client-supplied Idempotency-Key
+            payload: Request body identity; a different payload with the same key is a conflict
+            func: Coroutine factory doing the actual work
+
+        Returns:
+            Result of func (shared between duplicates)
+        """
+        self._expire()
+        cache_key = f"{scope}:{key}"
+        fingerprint = self.fingerprint(payload)
+
+        entry = self.entries.get(cache_key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                self.stats["conflicts"] += 1
+                raise IdempotencyConflictError(f"Idempotency-Key {key} was already used with a different request")
+            self.stats["replayed" if entry.future.done() else "coalesced"] += 1
+            # shield: a duplicate disconnecting must not cancel the original turn
+            try:
+                return await asyncio.shield(entry.future)
+            except asyncio.CancelledError:
+                if not entry.future.cancelled():
+                    raise
+                # The original request was cancelled (its client disconnected) - run the turn for this one
+                return await self.run(scope, key, payload, func)
+
+        future = asyncio.get_running_loop().create_future()
+        self.entries[cache_key] = _Entry(fingerprint, future)
+        self.stats["executed"] += 1
+        try:
+            result = await func()
+        except BaseException as e:
+            # Don't cache failures - a retry with the same key runs again
+            self.entries.pop(cache_key, None)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark retrieved so an un-awaited failure doesn't log a warning
+                future.exception()
+            raise
+        future.set_result(result)
+        return result
+
+    def completed(self, scope: str, key: str) -> bool:
+        """Whether (scope, key) has a finished result a retry would replay without running the turn"""
+        self._expire()
+        entry = self.entries.get(f"{scope}:{key}")
+        return entry is not None and entry.future.done() and not entry.future.cancelled() and entry.future.exception() is None
+
+    def _expire(self):
+        """Drop completed entries past the TTL and the oldest beyond max_entries"""
+        cutoff = time.monotonic() - self.ttl
+        for cache_key, entry in list(self.entries.items()):
+            if entry.created_at > cutoff and len(self.entries) <= self.max_entries:
+                break
+            if entry.future.done():
+                del self.entries[cache_key]
@@ -0,0 +1,224 @@
+"""
+Shared Kie.ai task poller - one background scheduler for every outstanding TTS task
+
+Waiters share a future per task ID; a task is tracked until it settles or its
+last waiter gives up. Tasks are polled with adaptive backoff (fast at first,
+slower the longer they run), all due tasks are polled in one tick, and a Kie.ai
+callback (webhook) settles a task immediately. Callbacks must carry
+KIE_CALLBACK_TOKEN, which is required whenever KIE_CALLBACK_BASE_URL is set.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+from backend.config import settings
+
+
+def parse_task_data(data: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Interpret the `data` block of recordInfo or a callback
+
+    Returns:
+        (state, value): ("success", audio_url), ("failed", message) or (None, None) while running
+    """
+    state = data.get("state")
+    if state == "success":
+        result_json = data.get("resultJson") or "{}"
+        result = json.loads(result_json) if isinstance(result_json, str) else result_json
+        result_urls = result.get("resultUrls", [])
+        if result_urls:
+            return "success", result_urls[0]
+        return None, None
+    if state == "failed":
+        return "failed", data.get("failMsg", "Unknown error")
+    return None, None
+
+
+class _PendingTask:
+    """Bookkeeping for one outstanding task"""
+
+    def __init__(self, future: asyncio.Future, fetch: Callable[[str], Awaitable[dict]], first_delay: float):
+        self.future = future
+        self.fetch = fetch
+        self.waiters = 0
+        self.created_at = time.monotonic()
+        self.interval = settings.kie_poll_initial_interval
+        self.next_poll_at = self.created_at + first_delay
+
+
+class KieTaskPoller:
+    """Tracks outstanding Kie.ai tasks and resolves their futures"""
+
+    def __init__(self):
+        if settings.kie_callback_base_url and not settings.kie_callback_token:
+            # Anyone reaching the webhook could otherwise settle tasks with their own audio URL
+            raise ValueError("KIE_CALLBACK_BASE_URL requires KIE_CALLBACK_TOKEN (shared secret for /api/kie/callback)")
+        self.tasks: Dict[str, _PendingTask] = {}
+        self.initial_interval = settings.kie_poll_initial_interval
+        self.max_interval = settings.kie_poll_max_interval
+        self.backoff = settings.kie_poll_backoff
+        self.max_concurrent_polls = settings.kie_poll_max_concurrency
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats: Dict[str, int] = {
+            "polls": 0,
+            "poll_errors": 0,
+            "settled_by_poll": 0,
+            "settled_by_callback": 0,
+            "failed": 0,
+            "timeouts": 0
+        }
+
+    def callback_url(self) -> Optional[str]:
+        """Webhook URL to pass as callBackUrl, if a public base URL is configured"""
+        if not settings.kie_callback_base_url:
+            return None
+        url = f"{settings.kie_callback_base_url.rstrip('/')}/api/kie/callback"
+        return url + "?" + urlencode({"token": settings.kie_callback_token})
+
+    async def wait(
+        self,
+        task_id: str,
+        fetch: Callable[[str], Awaitable[dict]],
+        timeout: float
+    ) -> str:
+        """
+        Wait for a task to finish
+
+        Args:
+            task_id: Kie.ai task ID
+            fetch: Coroutine returning the recordInfo response for a task ID
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Audio URL of the finished task
+        """
+        pending = self.tasks.get(task_id)
+        if pending is None:
+            # With a webhook configured polling is only a safety net, so start later
+            first_delay = settings.kie_poll_callback_delay if self.callback_url() else self.initial_interval
+            pending = _PendingTask(asyncio.get_running_loop().create_future(), fetch, first_delay)
+            self.tasks[task_id] = pending
+            self._ensure_running()
+        pending.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(pending.future), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise TimeoutError(f"TTS task did not complete within {timeout} seconds")
+        finally:
+            pending.waiters -= 1
+            # Stop tracking the task once nobody waits for it any more
+            if pending.waiters == 0 and self.tasks.get(task_id) is pending:
+                del self.tasks[task_id]
+
+    def settle(self, payload: Dict[str, Any]) -> bool:
+        """
+        Resolve a task from a Kie.ai callback payload
+
+        Returns:
+            True if the payload finished a task we were waiting for
+        """
+        data = payload.get("data") or {}
+        task_id = data.get("taskId")
+        if not task_id or task_id not in self.tasks:
+            return False
+        try:
+            state, value = parse_task_data(data)
+        except (ValueError, AttributeError) as e:
+            print(f"[Kie] Invalid callback for task {task_id}: {e}")
+            return False
+        if state is None:
+            return False
+        self._resolve(task_id, state, value)
+        self.stats["settled_by_callback"] += 1
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus the number of outstanding tasks"""
+        stats: Dict[str, Any] = dict(self.stats)
+        stats["pending"] = len(self.tasks)
+        stats["callback_enabled"] = self.callback_url() is not None
+        return stats
+
+    async def close(self):
+        """Stop the scheduler and fail outstanding waiters"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        for task_id in list(self.tasks):
+            self._resolve(task_id, "failed", "Poller shut down")
+
+    def _ensure_running(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._run())
+
+    def _resolve(self, task_id: str, state: str, value: Optional[str]):
+        pending = self.tasks.pop(task_id, None)
+        if pending is None or pending.future.done():
+            return
+        if state == "success":
+            pending.future.set_result(value)
+        else:
+            self.stats["failed"] += 1
+            pending.future.set_exception(Exception(f"TTS task failed: {value}"))
+            # Waiter may already have timed out - avoid "exception never retrieved"
+            pending.future.exception()
+
+    async def _poll(self, task_id: str, pending: _PendingTask, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                status_response = await pending.fetch(task_id)
+                self.stats["polls"] += 1
+                state, value = parse_task_data(status_response.get("data") or {})
+            except Exception as e:
+                self.stats["poll_errors"] += 1
+                print(f"[Kie] Poll failed for task {task_id}: {e}")
+                state, value = None, None
+        if task_id not in self.tasks:
+            return
+        if state is not None:
+            self._resolve(task_id, state, value)
+            if state == "success":
+                self.stats["settled_by_poll"] += 1
+            return
+        pending.interval = min(pending.interval * self.backoff, self.max_interval)
+        pending.next_poll_at = time.monotonic() + pending.interval
+        self._wakeup.set()
+
+    async def _run(self):
+        """Scheduler loop - launches polls for all due tasks, sleeps until the next one is due"""
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_polls))
+        in_flight = set()
+        try:
+            while self.tasks:
+                now = time.monotonic()
+                for task_id, pending in list(self.tasks.items()):
+                    if pending.next_poll_at <= now:
+                        # Not due again until this poll finishes
+                        pending.next_poll_at = float("inf")
+                        poll = asyncio.create_task(self._poll(task_id, pending, semaphore))
+                        in_flight.add(poll)
+                        poll.add_done_callback(in_flight.discard)
+                next_due = min((pending.next_poll_at for pending in self.tasks.values()), default=now)
+                delay = min(next_due - now, self.max_interval)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, delay))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for poll in in_flight:
+                poll.cancel()
+
+
+# Shared poller used by every ElevenLabsService instance
+kie_task_poller = KieTaskPoller()
@@ -1,21 +1,34 @@
 """
 Deception evaluation service - evaluates player deception and misguidance using LLM
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import json
 import asyncio
 from backend.models.game import MeritEvaluation
-from backend.config import DIFFICULTY_LEVELS
+from backend.config import DIFFICULTY_LEVELS, settings
 from backend.services.openrouter_service import OpenRouterService
 
 
+# Category keys returned by the evaluator (positive and negative)
+SCORE_KEYS = [
+    "strategy_variety", "conversation_depth", "creativity", "persistence",
+    "obvious_lies", "repetitive_strategy", "aggressive_behavior",
+    "direct_demands", "contradictions", "short_messages"
+]
+
+# Appended to the full evaluation prompt in incremental mode so the rolling summary is refreshed too
+SUMMARY_REQUEST = """
+
+Dodaj do JSON pole "summary": krótkie podsumowanie rozmowy (maksymalnie 3 zdania: kim gracz się podawał, jakie strategie stosował, co obiecywał)."""
+
+
 class MeritCheckService:
     """Service for evaluating player deception/misguidance using LLM"""
     
     def __init__(self):
         self.llm_service = OpenRouterService()
-        # Use Claude Sonnet 4.5 for evaluation (better at analysis and understanding)
-        self.evaluation_model = "anthropic/claude-sonnet-4.5"
+        # Claude Sonnet 4.5 by default (better at analysis and understanding)
+        self.evaluation_model = settings.evaluation_model
         
     async def evaluate_merit(
         self,
@@ -58,7 +71,8 @@ class MeritCheckService:
                 messages=messages,
                 model=self.evaluation_model,
                 temperature=0.3,  # Lower temperature for more consistent evaluation
-                max_tokens=500
+                max_tokens=500,
+                model_role="evaluator"
             )
             
             # Parse LLM response
@@ -73,6 +87,127 @@ class MeritCheckService:
                 player_personas
             )
         
+        return self._build_evaluation(evaluation, difficulty)
+    
+    def evaluate_merit_fallback(
+        self,
+        conversation_history: List[Dict[str, str]],
+        difficulty: str,
+        strategies_attempted: List[str],
+        player_personas: List[str]
+    ) -> MeritEvaluation:
+        """Heuristic evaluation without an LLM call (used when the turn deadline is hit)"""
+        evaluation = self._fallback_evaluation(
+            conversation_history,
+            strategies_attempted,
+            player_personas
+        )
+        return self._build_evaluation(evaluation, difficulty)
+    
+    async def evaluate_merit_incremental(
+        self,
+        conversation_history: List[Dict[str, str]],
+        difficulty: str,
+        strategies_attempted: List[str],
+        player_personas: List[str],
+        evaluator_state: Optional[Dict[str, Any]] = None
+    ) -> Tuple[MeritEvaluation, Dict[str, Any]]:
+        """
+        Evaluate player's deception incrementally from a compact per-game state
+        
+        Instead of resending the conversation, only the previous category scores,
+        a short rolling summary and the newest pirate/player exchange are sent, and
+        the model returns score deltas. Every merit_full_eval_interval turns (and on
+        the first turn, and after a failed call) a full evaluation runs instead to
+        correct drift.
+        
+        Args:
+            conversation_history: List of messages with 'role' and 'content'
+            difficulty: Difficulty level ('easy', 'medium', 'hard')
+            strategies_attempted: List of strategy types attempted
+            player_personas: List of personas/roles player claimed
+            evaluator_state: State returned by the previous call (None for a new game)
+            
+        Returns:
+            Tuple of (MeritEvaluation, new evaluator state)
+        """
+        previous_scores = (evaluator_state or {}).get("scores")
+        summary = (evaluator_state or {}).get("summary", "")
+        turn = (evaluator_state or {}).get("turn", 0) + 1
+        interval = max(1, settings.merit_full_eval_interval)
+        # A failed call last turn left the scores one exchange behind - re-anchor them
+        run_full = not previous_scores or turn % interval == 0 or (evaluator_state or {}).get("full_next", False)
+        
+        try:
+            if run_full:
+                prompt = self._build_evaluation_prompt(
+                    self._format_conversation(conversation_history),
+                    strategies_attempted,
+                    player_personas,
+                    difficulty
+                ) + SUMMARY_REQUEST
+            else:
+                prompt = self._build_incremental_prompt(
+                    previous_scores,
+                    summary,
+                    self._format_conversation(conversation_history[-2:]),
+                    strategies_attempted,
+                    player_personas
+                )
+            
+            messages = [
+                {"role": "system", "content": "Jesteś ekspertem w analizie konwersacji i wykrywaniu oszustw, manipulacji i wprowadzania w błąd. Odpowiadasz TYLKO w formacie JSON."},
+                {"role": "user", "content": prompt}
+            ]
+            
+            response = await self.llm_service.generate_response(
+                messages=messages,
+                model=self.evaluation_model,
+                temperature=0.3,  # Lower temperature for more consistent evaluation
+                max_tokens=500,
+                model_role="evaluator"
+            )
+            
+            data = self._extract_json(response)
+            if data is None:
+                raise ValueError(f"invalid JSON: {response[:200]}")
+            
+            if run_full:
+                evaluation = self._clamp_scores(data)
+            else:
+                deltas = data.get("deltas", {})
+                evaluation = self._clamp_scores({
+                    key: int(previous_scores.get(key, 0)) + int(deltas.get(key, 0))
+                    for key in SCORE_KEYS
+                })
+            summary = str(data.get("summary", summary))[:settings.merit_summary_max_chars]
+            
+        except Exception as e:
+            # Fallback to basic scoring if LLM fails - for this turn only: the heuristic
+            # scores must not become the baseline later deltas are applied to
+            print(f"Incremental LLM evaluation failed: {e}, using fallback scoring")
+            evaluation = self._fallback_evaluation(
+                conversation_history,
+                strategies_attempted,
+                player_personas
+            )
+            new_state = {
+                "scores": previous_scores,
+                "summary": summary,
+                "turn": turn,
+                "full_next": True
+            }
+            return self._build_evaluation(evaluation, difficulty), new_state
+        
+        new_state = {
+            "scores": evaluation,
+            "summary": summary,
+            "turn": turn
+        }
+        return self._build_evaluation(evaluation, difficulty), new_state
+    
+    def _build_evaluation(self, evaluation: Dict[str, int], difficulty: str) -> MeritEvaluation:
+        """Turn clamped category scores into a MeritEvaluation for the difficulty"""
         # Get thresholds for difficulty
         difficulty_config = DIFFICULTY_LEVELS.get(difficulty, DIFFICULTY_LEVELS["easy"])
         threshold = difficulty_config.get("merit_threshold", 40)
@@ -218,18 +353,7 @@ NEGATYWNE:
             # Try to find JSON object
             if response.startswith("{"):
                 data = json.loads(response)
-                return {
-                    "strategy_variety": min(30, max(0, int(data.get("strategy_variety", 0)))),
-                    "conversation_depth": min(25, max(0, int(data.get("conversation_depth", 0)))),
-                    "creativity": min(25, max(0, int(data.get("creativity", 0)))),
-                    "persistence": min(20, max(0, int(data.get("persistence", 0)))),
-                    "obvious_lies": max(-20, min(0, int(data.get("obvious_lies", 0)))),
-                    "repetitive_strategy": max(-15, min(0, int(data.get("repetitive_strategy", 0)))),
-                    "aggressive_behavior": max(-15, min(0, int(data.get("aggressive_behavior", 0)))),
-                    "direct_demands": max(-10, min(0, int(data.get("direct_demands", 0)))),
-                    "contradictions": max(-15, min(0, int(data.get("contradictions", 0)))),
-                    "short_messages": max(-10, min(0, int(data.get("short_messages", 0))))
-                }
+                return self._clamp_scores(data)
         except (json.JSONDecodeError, ValueError, KeyError) as e:
             print(f"Failed to parse LLM evaluation: {e}, response: {response[:200]}")
         
@@ -247,6 +371,81 @@ NEGATYWNE:
             "short_messages": 0
         }
     
+    def _clamp_scores(self, data: Dict[str, Any]) -> Dict[str, int]:
+        """Clamp category scores to their MeritEvaluation ranges"""
+        return {
+            "strategy_variety": min(30, max(0, int(data.get("strategy_variety", 0)))),
+            "conversation_depth": min(25, max(0, int(data.get("conversation_depth", 0)))),
+            "creativity": min(25, max(0, int(data.get("creativity", 0)))),
+            "persistence": min(20, max(0, int(data.get("persistence", 0)))),
+            "obvious_lies": max(-20, min(0, int(data.get("obvious_lies", 0)))),
+            "repetitive_strategy": max(-15, min(0, int(data.get("repetitive_strategy", 0)))),
+            "aggressive_behavior": max(-15, min(0, int(data.get("aggressive_behavior", 0)))),
+            "direct_demands": max(-10, min(0, int(data.get("direct_demands", 0)))),
+            "contradictions": max(-15, min(0, int(data.get("contradictions", 0)))),
+            "short_messages": max(-10, min(0, int(data.get("short_messages", 0))))
+        }
+    
+    def _extract_json(self, response: str) -> Optional[Dict[str, Any]]:
+        """Extract a JSON object from an LLM response (tolerates markdown code blocks)"""
+        response = (response or "").strip()
+        json_start = response.find("{")
+        json_end = response.rfind("}") + 1
+        if json_start < 0 or json_end <= json_start:
+            return None
+        try:
+            data = json.loads(response[json_start:json_end])
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, dict) else None
+    
+    def _build_incremental_prompt(
+        self,
+        previous_scores: Dict[str, int],
+        summary: str,
+        latest_exchange: str,
+        strategies_attempted: List[str],
+        player_personas: List[str]
+    ) -> str:
+        """Build prompt asking for score deltas for the newest exchange only"""
+        return f"""Oceniasz na bieżąco poziom oszustwa, wprowadzania w błąd i manipulacji gracza w rozmowie z piratem.
+
+Dotychczasowe podsumowanie rozmowy:
+{summary or 'brak'}
+
+Dotychczasowe oceny (JSON):
+{json.dumps(previous_scores, ensure_ascii=False)}
+
+Najnowsza wymiana:
+{latest_exchange}
+
+Zastosowane strategie: {', '.join(strategies_attempted) if strategies_attempted else 'brak'}
+Osoby, za które gracz się podawał: {', '.join(player_personas) if player_personas else 'brak'}
+
+Zakresy ocen: strategy_variety 0-30, conversation_depth 0-25, creativity 0-25, persistence 0-20,
+obvious_lies 0 do -20, repetitive_strategy 0 do -15, aggressive_behavior 0 do -15,
+direct_demands 0 do -10, contradictions 0 do -15, short_messages 0 do -10.
+
+Na podstawie TYLKO najnowszej wymiany określ, o ile zmieniają się oceny (zmiany dodatnie lub ujemne, 0 jeśli bez zmian),
+i zaktualizuj podsumowanie (maksymalnie 3 zdania: kim gracz się podawał, jakie strategie stosował, co obiecywał).
+
+Zwróć TYLKO poprawny JSON w formacie:
+{{
+    "deltas": {{
+        "strategy_variety": <zmiana>,
+        "conversation_depth": <zmiana>,
+        "creativity": <zmiana>,
+        "persistence": <zmiana>,
+        "obvious_lies": <zmiana>,
+        "repetitive_strategy": <zmiana>,
+        "aggressive_behavior": <zmiana>,
+        "direct_demands": <zmiana>,
+        "contradictions": <zmiana>,
+        "short_messages": <zmiana>
+    }},
+    "summary": "<zaktualizowane podsumowanie>"
+}}"""
+    
     def _fallback_evaluation(
         self,
         conversation_history: List[Dict[str, str]],
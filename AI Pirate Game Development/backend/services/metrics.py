@@ -0,0 +1,178 @@
+"""
+Prometheus metrics - counters and histograms rendered in the text exposition format
+
+Recording is a dict lookup plus a bisect into the bucket bounds (no locks,
+no label validation; the event loop is single-threaded), so it stays on in
+production. Rendering happens only when /metrics is scraped.
+"""
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+
+# Duration bucket upper bounds in seconds (graph nodes, upstream calls, TTS, STT)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Histogram with fixed buckets and optional labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *label_values: str) -> "Timer":
+        """Context manager observing the duration of its block"""
+        return Timer(self, label_values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {count}")
+        return lines
+
+
+class Timer:
+    """Observes elapsed wall time into a histogram when the block exits (also on errors)"""
+
+    def __init__(self, histogram: Histogram, label_values: Tuple[str, ...]):
+        self.histogram = histogram
+        self.label_values = label_values
+        self.start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.monotonic() - self.start, *self.label_values)
+
+
+class UpstreamCall:
+    """Times one upstream call; exceptions (not cancellation or an early close) count as errors"""
+
+    def __init__(self, metrics: "Metrics", service: str, model: str):
+        self.metrics = metrics
+        self.service = service
+        self.model = model
+        self.start = 0.0
+
+    def __enter__(self) -> "UpstreamCall":
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.upstream_seconds.observe(time.monotonic() - self.start, self.service, self.model)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.metrics.upstream_errors.inc(self.service, self.model)
+
+
+class Metrics:
+    """Process-wide metrics exposed at GET /metrics"""
+
+    def __init__(self):
+        self.node_seconds = Histogram(
+            "pirate_graph_node_seconds", "Conversation graph node duration", ("node",)
+        )
+        self.upstream_seconds = Histogram(
+            "pirate_upstream_request_seconds", "Upstream API call duration until the body is read", ("service", "model")
+        )
+        self.upstream_errors = Counter(
+            "pirate_upstream_errors_total", "Upstream API calls that failed", ("service", "model")
+        )
+        self.stt_seconds = Histogram("pirate_stt_seconds", "Speech-to-text request duration")
+        self.tts_first_byte_seconds = Histogram(
+            "pirate_tts_first_byte_seconds", "TTS time to first audio byte", ("backend", "source")
+        )
+        self.tts_total_seconds = Histogram(
+            "pirate_tts_total_seconds", "TTS time to the last audio byte", ("backend", "source")
+        )
+        self.sse_chunks = Counter("pirate_sse_chunks_total", "Server-sent events sent", ("stream",))
+        self.games_started = Counter("pirate_games_started_total", "Games started", ("difficulty",))
+        self.games_won = Counter("pirate_games_won_total", "Games won", ("difficulty",))
+        self.games_lost = Counter("pirate_games_lost_total", "Games lost", ("difficulty",))
+        self.responses_blocked = Counter(
+            "pirate_responses_blocked_total", "Pirate replies blocked by validation", ("difficulty",)
+        )
+        self.families = [
+            self.node_seconds,
+            self.upstream_seconds,
+            self.upstream_errors,
+            self.stt_seconds,
+            self.tts_first_byte_seconds,
+            self.tts_total_seconds,
+            self.sse_chunks,
+            self.games_started,
+            self.games_won,
+            self.games_lost,
+            self.responses_blocked
+        ]
+
+    def upstream(self, service: str, model: str) -> UpstreamCall:
+        """Context manager timing an upstream call (e.g. service="openrouter", model=<model id>)"""
+        return UpstreamCall(self, service, model or "")
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format (version 0.0.4)"""
+        lines: List[str] = []
+        for family in self.families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+# Shared metrics (process-wide; each worker is scraped separately)
+metrics = Metrics()
@@ -0,0 +1,302 @@
+"""
+OpenRouter model routing - per-model circuit breakers, rolling stats and fallback chains per role
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+from backend.config import settings
+from backend.services.tts_router import LatencyHistogram
+
+
+# Roles whose model can fall back (pirate reply, merit evaluator, semantic validator)
+ROLES = ("pirate", "evaluator", "validator")
+
+# time.monotonic() by which the current turn stage must finish (set by the conversation graph)
+_stage_deadline: ContextVar[Optional[float]] = ContextVar("llm_stage_deadline", default=None)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after repeated failures -> half-open probe after a cooldown
+
+    Opens on LLM_BREAKER_FAILURES consecutive failures, or when the error
+    rate over the rolling window reaches LLM_BREAKER_ERROR_RATE (once there
+    are LLM_BREAKER_MIN_SAMPLES outcomes).
+    While half-open a single probe request is let through.
+    """
+
+    def __init__(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Whether a request may be sent to the model now"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= settings.llm_breaker_cooldown_seconds:
+            self.state = "half_open"
+            self.probing = False
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.probing = False
+
+    def record_failure(self, error_rate: Optional[float]):
+        self.consecutive_failures += 1
+        self.probing = False
+        if (
+            self.state == "half_open"
+            or self.consecutive_failures >= settings.llm_breaker_failures
+            or (error_rate is not None and error_rate >= settings.llm_breaker_error_rate)
+        ):
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a half-open probe slot without an outcome (request cancelled)"""
+        self.probing = False
+
+
+class ModelStats:
+    """Rolling latency and error stats of one model"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram(window=settings.llm_stats_window)
+        self.outcomes = deque(maxlen=settings.llm_stats_window)
+        self.breaker = CircuitBreaker()
+        self.counts: Dict[str, int] = {"requests": 0, "errors": 0, "budget_exceeded": 0, "rejected": 0}
+
+    def error_rate(self) -> Optional[float]:
+        """Failure share over the rolling window (None until enough samples)"""
+        if len(self.outcomes) < settings.llm_breaker_min_samples:
+            return None
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.counts)
+        stats["state"] = self.breaker.state
+        stats["times_opened"] = self.breaker.times_opened
+        stats["consecutive_failures"] = self.breaker.consecutive_failures
+        stats["error_rate"] = None if not self.outcomes else round(self.outcomes.count(False) / len(self.outcomes), 3)
+        stats["latency_seconds"] = self.latency.snapshot()
+        return stats
+
+
+async def _prepend(first: Optional[str], rest: AsyncIterator[str]) -> AsyncIterator[str]:
+    try:
+        if first:
+            yield first
+        async for chunk in rest:
+            yield chunk
+    finally:
+        await rest.aclose()
+
+
+class ModelRouter:
+    """
+    Tries the models of a role in order, skipping open circuits
+
+    Every candidate except the last healthy one gets the role's latency
+    budget, capped by LLM_BUDGET_DEADLINE_SHARE of the time left before the
+    stage deadline (the rest is kept for the fallback); if it fails or runs
+    over, the next model in the chain is tried. The last candidate
+    keeps the full HTTP timeout so a slow answer still beats no answer.
+    A call cancelled by the stage deadline counts as over budget, so slow
+    models are still tracked when the turn deadline is tighter than the
+    role budgets.
+    """
+
+    def __init__(self):
+        self.models: Dict[str, ModelStats] = {}
+        self.stats: Dict[str, Dict[str, int]] = {
+            role: {"requests": 0, "fallbacks": 0, "failed": 0} for role in ROLES
+        }
+
+    def model(self, name: str) -> ModelStats:
+        if name not in self.models:
+            self.models[name] = ModelStats()
+        return self.models[name]
+
+    @contextmanager
+    def stage_deadline(self, deadline: Optional[float]) -> Iterator[None]:
+        """Calls made in this block (and tasks it starts) must finish by `deadline` (time.monotonic())"""
+        token = _stage_deadline.set(deadline)
+        try:
+            yield
+        finally:
+            _stage_deadline.reset(token)
+
+    def chain(self, role: str, model: str) -> List[str]:
+        """Requested model first, then the role's configured fallbacks"""
+        fallbacks = {
+            "pirate": settings.llm_fallbacks_pirate,
+            "evaluator": settings.llm_fallbacks_evaluator,
+            "validator": settings.llm_fallbacks_validator
+        }.get(role, "")
+        models = [model] + [m.strip() for m in fallbacks.split(",") if m.strip()]
+        return list(dict.fromkeys(models))
+
+    def budget(self, role: str) -> float:
+        """Latency budget (seconds) before falling back to the next model"""
+        return {
+            "pirate": settings.llm_budget_pirate_seconds,
+            "evaluator": settings.llm_budget_evaluator_seconds,
+            "validator": settings.llm_budget_validator_seconds
+        }.get(role, settings.llm_budget_pirate_seconds)
+
+    async def complete(self, role: str, model: str, call: Callable[[str], Awaitable[str]]) -> str:
+        """
+        Run a non-streaming completion through the role's fallback chain
+
+        Args:
+            role: "pirate", "evaluator" or "validator"
+            model: Requested (primary) model
+            call: Sends the request to a given model
+
+        Returns:
+            The first successful response
+        """
+        return await self._route(role, model, call, self._attempt_complete)
+
+    async def open_stream(self, role: str, model: str, call: Callable[[str], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Open a streaming completion through the fallback chain
+
+        The budget applies to the first token; once a model has started
+        streaming it is kept.
+
+        Returns:
+            Token stream of the first model that produced a token
+        """
+        return await self._route(role, model, call, self._attempt_stream)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-role counters, chains and per-model breaker/latency state"""
+        return {
+            "enabled": settings.llm_routing,
+            "roles": {
+                role: {
+                    **counts,
+                    "fallbacks_configured": self.chain(role, "")[1:],
+                    "budget_seconds": self.budget(role)
+                }
+                for role, counts in self.stats.items()
+            },
+            "models": {name: stats.snapshot() for name, stats in self.models.items()}
+        }
+
+    async def _route(self, role: str, model: str, call, attempt):
+        role_stats = self.stats.setdefault(role, {"requests": 0, "fallbacks": 0, "failed": 0})
+        role_stats["requests"] += 1
+        candidates = self.chain(role, model)
+        errors: List[str] = []
+        for index, name in enumerate(candidates):
+            stats = self.model(name)
+            if not stats.breaker.allow():
+                stats.counts["rejected"] += 1
+                errors.append(f"{name}: circuit open")
+                continue
+            deadline = _stage_deadline.get()
+            time_left = None if deadline is None else deadline - time.monotonic()
+            if time_left is not None and time_left <= 0:
+                stats.breaker.release()
+                errors.append(f"{name}: stage deadline passed")
+                break
+            # Budget only applies while a healthy alternative is left
+            has_next = any(self.model(m).breaker.state != "open" for m in candidates[index + 1:])
+            budget = None
+            if has_next:
+                budget = self.budget(role)
+                if time_left is not None:
+                    budget = min(budget, time_left * settings.llm_budget_deadline_share)
+            if index > 0:
+                role_stats["fallbacks"] += 1
+            try:
+                return await attempt(name, stats, call, budget)
+            except asyncio.CancelledError:
+                stats.breaker.release()
+                raise
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                if has_next:
+                    print(f"[Model Router] {role} model {name} failed ({e}), falling back")
+        role_stats["failed"] += 1
+        raise ValueError(f"All {role} models failed: {'; '.join(errors)}")
+
+    async def _attempt_complete(self, name: str, stats: ModelStats, call, budget: Optional[float]) -> str:
+        stats.counts["requests"] += 1
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(call(name), budget)
+        except asyncio.TimeoutError:
+            self._failure(name, stats, start, budget_exceeded=True)
+            raise ValueError(f"no response within {budget:.1f}s budget")
+        except asyncio.CancelledError:
+            self._cancelled(name, stats, start)
+            raise
+        except Exception:
+            self._failure(name, stats, start)
+            raise
+        self._success(stats, start)
+        return result
+
+    async def _attempt_stream(self, name: str, stats: ModelStats, call, budget: Optional[float]) -> AsyncIterator[str]:
+        stats.counts["requests"] += 1
+        start = time.monotonic()
+        stream = call(name).__aiter__()
+        try:
+            first = await asyncio.wait_for(stream.__anext__(), budget)
+        except StopAsyncIteration:
+            self._success(stats, start)
+            return _prepend(None, stream)
+        except asyncio.TimeoutError:
+            await stream.aclose()
+            self._failure(name, stats, start, budget_exceeded=True)
+            raise ValueError(f"no first token within {budget:.1f}s budget")
+        except asyncio.CancelledError:
+            self._cancelled(name, stats, start)
+            await stream.aclose()
+            raise
+        except Exception:
+            await stream.aclose()
+            self._failure(name, stats, start)
+            raise
+        self._success(stats, start)
+        return _prepend(first, stream)
+
+    def _cancelled(self, name: str, stats: ModelStats, start: float):
+        """Record a call cancelled by the stage deadline as over budget (other cancellations have no outcome)"""
+        deadline = _stage_deadline.get()
+        if deadline is not None and time.monotonic() >= deadline:
+            self._failure(name, stats, start, budget_exceeded=True)
+
+    def _success(self, stats: ModelStats, start: float):
+        stats.latency.observe(time.monotonic() - start)
+        stats.outcomes.append(True)
+        stats.breaker.record_success()
+
+    def _failure(self, name: str, stats: ModelStats, start: float, budget_exceeded: bool = False):
+        stats.latency.observe(time.monotonic() - start)
+        stats.outcomes.append(False)
+        stats.counts["budget_exceeded" if budget_exceeded else "errors"] += 1
+        was_open = stats.breaker.state == "open"
+        stats.breaker.record_failure(stats.error_rate())
+        if stats.breaker.state == "open" and not was_open:
+            print(f"[Model Router] Circuit opened for {name} ({stats.breaker.consecutive_failures} consecutive failures)")
+
+
+# Shared router (breaker state is process-wide)
+model_router = ModelRouter()
@@ -2,8 +2,13 @@
 OpenRouter LLM service
 """
 import httpx
+import time
 from typing import Optional, AsyncIterator, Dict, Any, List
 from backend.config import settings
+from backend.services.http_client import upstream_clients
+from backend.services.model_router import model_router
+from backend.services.metrics import metrics
+from backend.services.usage_ledger import usage_ledger, ROLE_STAGES
 
 
 class OpenRouterService:
@@ -19,7 +24,8 @@ class OpenRouterService:
         model: str,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
-        stream: bool = False
+        stream: bool = False,
+        model_role: Optional[str] = None
     ) -> AsyncIterator[str] | str:
         """
         Generate LLM response via OpenRouter
@@ -30,6 +36,9 @@ class OpenRouterService:
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens to generate
             stream: Whether to stream the response
+            model_role: "pirate", "evaluator" or "validator" to route through the
+                        model router (circuit breakers, latency budget, fallback models);
+                        also the usage ledger stage and the token budget's cheaper model
             
         Returns:
             If stream=True: AsyncIterator of text chunks
@@ -70,6 +79,10 @@ class OpenRouterService:
         
         if not model or not model.strip():
             raise ValueError("Model name cannot be empty")
+        
+        # Game over its token budget - use the role's cheaper model
+        model = usage_ledger.budget_model(model_role, model.strip())
+        stage = ROLE_STAGES.get(model_role or "", model_role or "llm")
             
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -89,80 +102,106 @@ class OpenRouterService:
             
         if stream:
             payload["stream"] = True
-            return self._stream_response(headers, payload)
+        
+        if usage_ledger.enabled:
+            # Ask OpenRouter to report the cost alongside token counts
+            payload["usage"] = {"include": True}
+        
+        if model_role and settings.llm_routing:
+            if stream:
+                return await model_router.open_stream(
+                    model_role, payload["model"], lambda m: self._stream_response(headers, {**payload, "model": m}, stage)
+                )
+            return await model_router.complete(
+                model_role, payload["model"], lambda m: self._get_complete_response(headers, {**payload, "model": m}, stage)
+            )
+        
+        if stream:
+            return self._stream_response(headers, payload, stage)
         else:
-            return await self._get_complete_response(headers, payload)
+            return await self._get_complete_response(headers, payload, stage)
     
     async def _get_complete_response(
         self,
         headers: Dict[str, str],
-        payload: Dict[str, Any]
+        payload: Dict[str, Any],
+        stage: str = "llm"
     ) -> str:
-        """Get complete non-streaming response"""
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
+        """Get complete non-streaming response (usage is recorded in the ledger)"""
+        client = upstream_clients.get(self.base_url)
+        started = time.monotonic()
+        try:
+            with metrics.upstream("openrouter", payload["model"]):
                 response = await client.post(
                     f"{self.base_url}/chat/completions",
                     json=payload,
-                    headers=headers
+                    headers=headers,
+                    timeout=60.0
                 )
                 response.raise_for_status()
                 result = response.json()
-                
-                # Extract text from response
-                choices = result.get("choices", [])
-                if choices:
-                    return choices[0].get("message", {}).get("content", "")
-                return ""
-            except httpx.HTTPStatusError as e:
-                # Get detailed error message from response
-                error_detail = f"HTTP {e.response.status_code}"
-                try:
-                    error_body = e.response.json()
-                    if "error" in error_body:
-                        error_detail = error_body["error"].get("message", str(error_body["error"]))
-                    elif "detail" in error_body:
-                        error_detail = error_body["detail"]
-                except:
-                    error_detail = e.response.text[:500] if e.response.text else str(e)
-                raise ValueError(f"OpenRouter API error: {error_detail}")
-            except httpx.RequestError as e:
-                raise ValueError(f"Request to OpenRouter failed: {str(e)}")
+            usage_ledger.record(stage, result.get("model") or payload["model"], time.monotonic() - started, usage=result.get("usage"))
+            
+            # Extract text from response
+            choices = result.get("choices", [])
+            if choices:
+                return choices[0].get("message", {}).get("content", "")
+            return ""
+        except httpx.HTTPStatusError as e:
+            # Get detailed error message from response
+            error_detail = f"HTTP {e.response.status_code}"
+            try:
+                error_body = e.response.json()
+                if "error" in error_body:
+                    error_detail = error_body["error"].get("message", str(error_body["error"]))
+                elif "detail" in error_body:
+                    error_detail = error_body["detail"]
+            except:
+                error_detail = e.response.text[:500] if e.response.text else str(e)
+            raise ValueError(f"OpenRouter API error: {error_detail}")
+        except httpx.RequestError as e:
+            raise ValueError(f"Request to OpenRouter failed: {str(e)}")
     
     async def _stream_response(
         self,
         headers: Dict[str, str],
-        payload: Dict[str, Any]
+        payload: Dict[str, Any],
+        stage: str = "llm"
     ) -> AsyncIterator[str]:
-        """Stream response chunks"""
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            async with client.stream(
-                "POST",
-                f"{self.base_url}/chat/completions",
-                json=payload,
-                headers=headers
-            ) as response:
-                response.raise_for_status()
-                
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]  # Remove "data: " prefix
-                        if data_str == "[DONE]":
-                            break
-                            
-                        try:
-                            import json
-                            data = json.loads(data_str)
-                            choices = data.get("choices", [])
-                            if choices:
-                                delta = choices[0].get("delta", {})
-                                content = delta.get("content", "")
-                                if content:
-                                    yield content
-                        except json.JSONDecodeError:
-                            continue
-
-
-
-
-
+        """Stream response chunks (usage, from the final chunk, is recorded in the ledger)"""
+        client = upstream_clients.get(self.base_url)
+        started = time.monotonic()
+        usage = None
+        try:
+            with metrics.upstream("openrouter", payload["model"]):
+                async with client.stream(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    headers=headers,
+                    timeout=60.0
+                ) as response:
+                    response.raise_for_status()
+                    usage = {}  # Answered - record the call even if it ends without a usage chunk
+                    
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            data_str = line[6:]  # Remove "data: " prefix
+                            if data_str == "[DONE]":
+                                break
+                                
+                            try:
+                                import json
+                                data = json.loads(data_str)
+                                usage = data.get("usage") or usage
+                                choices = data.get("choices", [])
+                                if choices:
+                                    delta = choices[0].get("delta", {})
+                                    content = delta.get("content", "")
+                                    if content:
+                                        yield content
+                            except json.JSONDecodeError:
+                                continue
+        finally:
+            if usage is not None:
+                usage_ledger.record(stage, payload["model"], time.monotonic() - started, usage=usage)
@@ -1,13 +1,21 @@
 """
 Pirate service - orchestrates conversation flow
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, Tuple
 from backend.graph.conversation import ConversationGraph
 from backend.services.elevenlabs_service import ElevenLabsService
 from backend.services.gpt_audio_service import GPTAudioService
 from backend.models.game import GameState, ConversationResponse
 from backend.config import FORBIDDEN_PHRASE, settings
 from backend.services.validation import ValidationService
+from backend.services.game_store import create_game_store, GameExpiredError
+from backend.services.idempotency import IdempotencyCache, IdempotencyConflictError
+from backend.services.turn_audio import TurnAudioRegistry
+from backend.services.tts_cache import tts_cache
+from backend.services.http_client import upstream_clients
+from backend.services.metrics import metrics
+from backend.services.usage_ledger import usage_ledger
+import asyncio
 import uuid
 import re
 
@@ -20,9 +28,12 @@ class PirateService:
         self.elevenlabs_service = ElevenLabsService()
         self.gpt_audio_service = GPTAudioService()
         self.validation_service = ValidationService()
-        self.games: Dict[str, GameState] = {}
+        self.store = create_game_store()
+        self.idempotency = IdempotencyCache()
+        self.turn_audio = TurnAudioRegistry()
+        self._background_tasks = set()
         
-    def start_game(
+    async def start_game(
         self,
         difficulty: str = "easy",
         pirate_name: str = "Kapitan"
@@ -36,20 +47,150 @@ class PirateService:
             pirate_name=pirate_name
         )
         
-        self.games[game_id] = game_state
+        await self.store.put(game_state)
+        metrics.games_started.inc(game_state.difficulty.value)
         return game_state
     
     async def process_conversation(
         self,
         game_id: str,
         user_message: str,
-        include_audio: bool = False
+        include_audio: bool = False,
+        idempotency_key: Optional[str] = None,
+        pregenerate_audio: bool = False
     ) -> ConversationResponse:
-        """Process a conversation message"""
-        game_state = self.games.get(game_id)
-        if not game_state:
-            raise ValueError(f"Game {game_id} not found")
+        """
+        Process a conversation message
+        
+        Args:
+            game_id: Game identifier
+            user_message: Player message
+            include_audio: Whether to prepare TTS for the reply
+            idempotency_key: Optional client key; retries with the same key share one turn
+            pregenerate_audio: Start turn TTS in the background (client plays streaming_audio_endpoint)
+        """
+        if idempotency_key:
+            payload = f"{user_message}\0{include_audio}\0{pregenerate_audio}"
+            idempotency = (idempotency_key, IdempotencyCache.fingerprint(payload))
+            return await self.idempotency.run(
+                scope=game_id,
+                key=idempotency_key,
+                payload=payload,
+                func=lambda: self._run_turn(game_id, user_message, include_audio, pregenerate_audio, idempotency)
+            )
+        return await self._run_turn(game_id, user_message, include_audio, pregenerate_audio)
+    
+    async def _run_turn(
+        self,
+        game_id: str,
+        user_message: str,
+        include_audio: bool,
+        pregenerate_audio: bool = False,
+        idempotency: Optional[Tuple[str, str]] = None
+    ) -> ConversationResponse:
+        """Run one conversation turn (idempotency: (Idempotency-Key, request fingerprint))"""
+        # Atomic read-modify-write of the game for the whole turn
+        async with self.store.lock(game_id):
+            if idempotency is not None:
+                # The turn may already have run on another worker (shared stores)
+                replay = await self._stored_turn(game_id, *idempotency)
+                if replay is not None:
+                    return replay
+            # Work on a copy: the stored game only changes when the turn completes,
+            # so a failed or cancelled (client disconnected) turn leaves no half-appended message
+            game_state = (await self._load_game(game_id)).model_copy(deep=True)
+            turn_id = self._next_turn_id(game_state)
+            
+            self._record_user_message(game_state, user_message)
+            
+            # Upstream usage of the turn (including its background TTS) is billed to it
+            with usage_ledger.attributed(game_id, turn_id, game_state.difficulty.value):
+                # Process through LangGraph
+                result = await self.conversation_graph.process_message(
+                    game_id=game_id,
+                    user_message=user_message,
+                    difficulty=game_state.difficulty,
+                    conversation_history=game_state.conversation_history,
+                    strategies_attempted=game_state.strategies_attempted,
+                    player_personas=game_state.player_personas,
+                    previous_merit_score=game_state.merit_score,
+                    merit_evaluator_state=game_state.merit_evaluator_state
+                )
+                
+                response = await self._complete_turn(
+                    game_id, game_state, result, include_audio, pregenerate_audio
+                )
+            await self.store.put(game_state)
+            if idempotency is not None:
+                await self.store.put_turn_result(
+                    game_id, idempotency[0], idempotency[1], response.model_dump_json().encode("utf-8")
+                )
+            return response
+    
+    async def _stored_turn(self, game_id: str, key: str, fingerprint: str) -> Optional[ConversationResponse]:
+        """Response of a turn the game store already finished under this Idempotency-Key"""
+        stored = await self.store.get_turn_result(game_id, key)
+        if stored is None:
+            return None
+        if stored[0] != fingerprint:
+            self.idempotency.stats["conflicts"] += 1
+            raise IdempotencyConflictError(f"Idempotency-Key {key} was already used with a different request")
+        self.idempotency.stats["shared_replays"] += 1
+        return ConversationResponse.model_validate_json(stored[1])
+    
+    async def stream_conversation(
+        self,
+        game_id: str,
+        user_message: str,
+        include_audio: bool = False,
+        pregenerate_audio: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a conversation message, streaming pirate tokens as they arrive
         
+        Yields:
+            "token" / "replace" events from ConversationGraph.stream_message, then
+            {"type": "result", "response": ConversationResponse}
+        """
+        async with self.store.lock(game_id):
+            # Work on a copy: the stored game only changes when the turn completes,
+            # so a failed or cancelled (client disconnected) turn leaves no half-appended message
+            game_state = (await self._load_game(game_id)).model_copy(deep=True)
+            turn_id = self._next_turn_id(game_state)
+            difficulty = game_state.difficulty.value
+            
+            self._record_user_message(game_state, user_message)
+            
+            result = None
+            events = self.conversation_graph.stream_message(
+                game_id=game_id,
+                user_message=user_message,
+                difficulty=game_state.difficulty,
+                conversation_history=game_state.conversation_history,
+                strategies_attempted=game_state.strategies_attempted,
+                player_personas=game_state.player_personas,
+                previous_merit_score=game_state.merit_score,
+                merit_evaluator_state=game_state.merit_evaluator_state
+            )
+            async for event in usage_ledger.attribute_stream(events, game_id, turn_id, difficulty):
+                if event["type"] == "result":
+                    result = event["result"]
+                else:
+                    yield event
+            
+            with usage_ledger.attributed(game_id, turn_id, difficulty):
+                response = await self._complete_turn(
+                    game_id, game_state, result, include_audio, pregenerate_audio
+                )
+            await self.store.put(game_state)
+        yield {"type": "result", "response": response}
+    
+    def _next_turn_id(self, game_state: GameState) -> int:
+        """Turn number the next pirate reply will get (matches _complete_turn)"""
+        return sum(1 for message in game_state.conversation_history if message.get("role") == "pirate") + 1
+    
+    def _record_user_message(self, game_state: GameState, user_message: str):
+        """Track persona/strategy and append the user message to history"""
         # Detect player persona/strategy from message
         persona = self._detect_persona(user_message)
         strategy = self._detect_strategy(user_message)
@@ -64,32 +205,42 @@ class PirateService:
             "role": "user",
             "content": user_message
         })
-        
-        # Process through LangGraph
-        result = await self.conversation_graph.process_message(
-            game_id=game_id,
-            user_message=user_message,
-            difficulty=game_state.difficulty,
-            conversation_history=game_state.conversation_history,
-            strategies_attempted=game_state.strategies_attempted,
-            player_personas=game_state.player_personas
-        )
-        
+    
+    async def _complete_turn(
+        self,
+        game_id: str,
+        game_state: GameState,
+        result: Dict[str, Any],
+        include_audio: bool = False,
+        pregenerate_audio: bool = False
+    ) -> ConversationResponse:
+        """Apply a graph result to the game state, prepare audio and build the response"""
         # Update game state
         game_state.merit_score = result["merit_score"]
+        if result.get("merit_evaluator_state") is not None:
+            game_state.merit_evaluator_state = result["merit_evaluator_state"]
         game_state.conversation_history.append({
             "role": "pirate",
             "content": result["pirate_response"]
         })
+        turn_id = sum(1 for message in game_state.conversation_history if message.get("role") == "pirate")
+        
+        difficulty = game_state.difficulty.value
+        if result.get("is_blocked"):
+            metrics.responses_blocked.inc(difficulty)
         
         # Check for loss condition (score below loss threshold)
         is_lost = result.get("is_lost", False)
         if is_lost:
+            if not game_state.is_lost:
+                metrics.games_lost.inc(difficulty)
             game_state.is_lost = True
         
         # Check for win condition (deception score-based or phrase detection)
         is_won = result["is_won"]
         if is_won:
+            if not game_state.is_won:
+                metrics.games_won.inc(difficulty)
             game_state.is_won = True
             # Check if win was via phrase or just high deception score
             win_phrase_detected = self.validation_service.contains_forbidden_phrase(result["pirate_response"])
@@ -106,7 +257,18 @@ class PirateService:
         pirate_response = result.get("pirate_response", "")
         
         if pirate_response and pirate_response.strip():
-            if settings.use_gpt_audio:
+            if settings.use_gpt_audio and include_audio and pregenerate_audio and settings.audio_pregeneration:
+                # Reply is final and the client will fetch turn audio - start TTS now
+                # so it is ready by the time the client asks
+                self.turn_audio.start(
+                    game_id=game_id,
+                    turn_id=turn_id,
+                    text=pirate_response.strip(),
+                    source_factory=self.gpt_audio_service.generate_audio_stream
+                )
+                streaming_audio_endpoint = f"/api/game/{game_id}/turns/{turn_id}/audio"
+                print(f"[Audio] Background TTS started for turn {turn_id}: {streaming_audio_endpoint}")
+            elif settings.use_gpt_audio:
                 # Use GPT Audio with streaming
                 try:
                     print(f"[Audio] Using GPT Audio streaming for response (length: {len(pirate_response)}): {pirate_response[:50]}...")
@@ -120,10 +282,7 @@ class PirateService:
                     # Fallback to ElevenLabs if GPT Audio fails
                     try:
                         print(f"[Audio] Falling back to ElevenLabs...")
-                        audio_url = await self.elevenlabs_service.generate_speech(
-                            text=pirate_response,
-                            wait_for_completion=True
-                        )
+                        audio_url = await self._generate_elevenlabs_audio(pirate_response)
                         print(f"[Audio] ElevenLabs audio generated successfully: {audio_url}")
                     except Exception as e2:
                         print(f"[Audio] ElevenLabs fallback also failed: {e2}")
@@ -131,10 +290,7 @@ class PirateService:
                 # Use ElevenLabs (legacy)
                 try:
                     print(f"[Audio] Generating audio with ElevenLabs (length: {len(pirate_response)}): {pirate_response[:50]}...")
-                    audio_url = await self.elevenlabs_service.generate_speech(
-                        text=pirate_response,
-                        wait_for_completion=True
-                    )
+                    audio_url = await self._generate_elevenlabs_audio(pirate_response)
                     print(f"[Audio] Audio generated successfully: {audio_url}")
                 except Exception as e:
                     print(f"[Audio] Audio generation failed: {e}")
@@ -150,15 +306,152 @@ class PirateService:
             merit_score=result["merit_score"],
             audio_url=audio_url,
             streaming_audio_endpoint=streaming_audio_endpoint,
+            turn_id=turn_id,
             is_won=is_won,
             is_lost=is_lost,
             win_phrase_detected=game_state.win_phrase_detected if is_won else False,
-            negative_categories=negative_categories
+            negative_categories=negative_categories,
+            degraded_stages=result.get("degraded_stages", [])
         )
     
-    def get_game_state(self, game_id: str) -> Optional[GameState]:
-        """Get game state"""
-        return self.games.get(game_id)
+    async def _generate_elevenlabs_audio(self, text: str) -> Optional[str]:
+        """
+        Get an audio URL for a reply, serving cached clips locally
+        
+        Returns:
+            /api/audio/{key} on a cache hit, otherwise the Kie.ai result URL
+            (downloaded into the cache in the background)
+        """
+        key = self.elevenlabs_service.cache_key(text)
+        if await tts_cache.get(key) is not None:
+            print(f"[Audio] TTS cache hit: {key[:12]}")
+            return f"/api/audio/{key}"
+        
+        audio_url = await self.elevenlabs_service.generate_speech(
+            text=text,
+            wait_for_completion=True
+        )
+        if audio_url:
+            task = asyncio.create_task(self._cache_remote_audio(key, audio_url))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        return audio_url
+    
+    async def _cache_remote_audio(self, key: str, audio_url: str):
+        """Download a finished Kie.ai clip into the TTS cache"""
+        try:
+            chunks = []
+            size = 0
+            client = upstream_clients.get(audio_url)
+            async with client.stream("GET", audio_url, timeout=120.0) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > tts_cache.max_entry_bytes:
+                        return
+                    chunks.append(chunk)
+            await tts_cache.put(key, b"".join(chunks))
+        except Exception as e:
+            print(f"[Audio] Failed to cache {audio_url}: {e}")
+    
+    async def get_cached_audio(self, key: str) -> Optional[bytes]:
+        """Get a cached clip by key (served by /api/audio/{key})"""
+        return await tts_cache.get(key)
+    
+    def get_tts_cache_stats(self) -> Dict[str, Any]:
+        """Get TTS cache hit/miss counters and tier sizes"""
+        return tts_cache.snapshot()
+    
+    async def _load_game(self, game_id: str) -> GameState:
+        """Load a game, distinguishing evicted games from unknown ones"""
+        game_state = await self.store.get(game_id)
+        if not game_state:
+            if await self.store.was_evicted(game_id):
+                raise GameExpiredError(f"Game {game_id} has expired")
+            raise ValueError(f"Game {game_id} not found")
+        return game_state
+    
+    async def get_game_state(self, game_id: str) -> Optional[GameState]:
+        """Get game state (raises GameExpiredError for evicted games)"""
+        game_state = await self.store.get(game_id)
+        if not game_state and await self.store.was_evicted(game_id):
+            raise GameExpiredError(f"Game {game_id} has expired")
+        return game_state
+    
+    def get_turn_audio(self, game_id: str, turn_id: int):
+        """Get the background TTS buffer of a turn (None if not pre-generated or expired)"""
+        return self.turn_audio.get(game_id, turn_id)
+    
+    async def get_turn_reply(self, game_id: str, turn_id: int) -> Optional[str]:
+        """
+        Pirate reply of a turn, read from the game store
+        
+        Used when the turn's audio buffer lives in another worker (or was
+        evicted): voicing the same text hits the shared TTS cache once that
+        worker has finished the clip, and synthesises it otherwise.
+        
+        Returns:
+            The reply text (None if the game or turn doesn't exist)
+        """
+        game_state = await self.store.get(game_id)
+        if game_state is None:
+            return None
+        replies = [message for message in game_state.conversation_history if message.get("role") == "pirate"]
+        if not 1 <= turn_id <= len(replies):
+            return None
+        text = (replies[turn_id - 1].get("content") or "").strip()
+        if not text:
+            return None
+        self.turn_audio.stats["fallbacks"] += 1
+        return text
+    
+    def get_turn_audio_stats(self) -> Dict[str, Any]:
+        """Get background TTS buffer counters"""
+        return self.turn_audio.snapshot()
+    
+    def has_idempotent_result(self, game_id: str, idempotency_key: Optional[str]) -> bool:
+        """Whether a retry with this Idempotency-Key would be answered from the cache"""
+        return bool(idempotency_key) and self.idempotency.completed(game_id, idempotency_key)
+    
+    def get_idempotency_stats(self) -> Dict[str, Any]:
+        """Get Idempotency-Key coalescing counters"""
+        stats = dict(self.idempotency.stats)
+        stats["entries"] = len(self.idempotency.entries)
+        return stats
+    
+    def get_store_stats(self) -> Dict[str, Any]:
+        """Get game store size and eviction counters"""
+        return self.store.stats()
+    
+    def get_speculation_stats(self) -> Dict[str, Any]:
+        """Get speculative generation counters"""
+        stats = dict(self.conversation_graph.speculation_stats)
+        stats["enabled"] = self.conversation_graph.speculative
+        stats["miss_rate"] = round(stats["misses"] / stats["turns"], 3) if stats["turns"] else 0.0
+        return stats
+    
+    def get_deadline_stats(self) -> Dict[str, Any]:
+        """Get per-turn deadline counters (stages that degraded to a fallback)"""
+        stats = dict(self.conversation_graph.deadline_stats)
+        stats["deadline_seconds"] = settings.turn_deadline_seconds
+        stats["degraded_rate"] = round(stats["degraded_turns"] / stats["turns"], 3) if stats["turns"] else 0.0
+        return stats
+    
+    def get_fused_audit_stats(self) -> Dict[str, Any]:
+        """Get fused-vs-semantic verdict audit counters"""
+        stats = dict(self.conversation_graph.fused_audit_stats)
+        stats["enabled"] = self.conversation_graph.fused
+        stats["agreement_rate"] = round(stats["agreed"] / stats["audited"], 3) if stats["audited"] else None
+        return stats
+    
+    def get_treasure_detector_stats(self) -> Dict[str, Any]:
+        """Get tiered treasure-giving detection counters"""
+        validation_service = self.conversation_graph.validation_service
+        stats = dict(validation_service.tier_stats)
+        total = stats["local_negative"] + stats["llm_checked"]
+        stats["enabled"] = validation_service.local_classifier is not None
+        stats["llm_calls_avoided_rate"] = round((total - stats["llm_checked"]) / total, 3) if total else 0.0
+        return stats
     
     def _detect_persona(self, message: str) -> Optional[str]:
         """Detect player persona from message (may be false/deceptive)"""
@@ -4,8 +4,12 @@ Based on image_stand implementation
 """
 import httpx
 import base64
+import time
 from typing import Optional
 from backend.config import settings
+from backend.services.http_client import upstream_clients
+from backend.services.metrics import metrics
+from backend.services.usage_ledger import usage_ledger
 
 
 class SpeechToTextService:
@@ -19,7 +23,8 @@ class SpeechToTextService:
     async def transcribe_audio(
         self,
         audio_data: bytes,
-        audio_format: str = "wav"
+        audio_format: str = "wav",
+        game_id: Optional[str] = None
     ) -> Optional[str]:
         """
         Transcribe audio to text using Gemini 2.0 Flash Lite via OpenRouter
@@ -28,6 +33,7 @@ class SpeechToTextService:
             audio_data: Raw audio bytes
             audio_format: Audio format (wav, webm, mp3, ogg, m4a)
                           Default is 'wav' as used by Streamlit audio_input
+            game_id: Game the recording belongs to (usage ledger attribution)
             
         Returns:
             Transcribed text or None if failed
@@ -82,13 +88,18 @@ class SpeechToTextService:
             "temperature": 0.1,  # Lower temperature for more accurate transcription
             "max_tokens": 1000
         }
+        if usage_ledger.enabled:
+            payload["usage"] = {"include": True}
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
+            client = upstream_clients.get(self.base_url)
+            started = time.monotonic()
+            with metrics.upstream("stt", self.model):
                 response = await client.post(
                     f"{self.base_url}/chat/completions",
                     json=payload,
-                    headers=headers
+                    headers=headers,
+                    timeout=60.0
                 )
                 
                 if response.status_code != 200:
@@ -105,14 +116,15 @@ class SpeechToTextService:
                     )
                 
                 result = response.json()
-                
-                # Extract text from response (OpenRouter returns OpenAI-compatible format)
-                if "choices" in result and len(result["choices"]) > 0:
-                    message = result["choices"][0].get("message", {})
-                    content = message.get("content", "")
-                    if content:
-                        return content.strip()
-                return None
+            usage_ledger.record("stt", self.model, time.monotonic() - started, usage=result.get("usage"), game_id=game_id)
+            
+            # Extract text from response (OpenRouter returns OpenAI-compatible format)
+            if "choices" in result and len(result["choices"]) > 0:
+                message = result["choices"][0].get("message", {})
+                content = message.get("content", "")
+                if content:
+                    return content.strip()
+            return None
         except httpx.HTTPStatusError as e:
             error_detail = f"HTTP {e.response.status_code}"
             try:
@@ -0,0 +1,112 @@
+"""
+Local treasure-giving detector - lemma prefilter + hashed char n-gram linear model
+
+Runs in front of the LLM semantic check and may only rule replies out. The
+model is trained offline with scripts/train_treasure_classifier.py on logged
+LLM verdicts and loaded from a small JSON weights file, so no model server is
+needed. Weights without a held-out evaluation are not loaded.
+"""
+import json
+import math
+import os
+import re
+import unicodedata
+import zlib
+from typing import Dict, Optional
+
+
+# Diacritic-free stems that any treasure-giving reply must contain at least one of
+TREASURE_STEMS = (
+    "skarb", "zlot", "kuf", "skrzyn",
+    "wez", "bierz", "zabierz", "zabra", "wzia",
+    "twoj", "twoi",
+    "oddaj", "oddam", "oddac", "daj", "dam ", "daje", "dac ",
+    "nalez", "zgod", "przekaz", "podaruj", "nagrod"
+)
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "treasure_classifier.json")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip Polish diacritics and collapse whitespace"""
+    text = (text or "").lower().replace("ł", "l")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^a-z0-9\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def passes_prefilter(normalized: str) -> bool:
+    """Whether a normalized reply mentions anything treasure-giving related"""
+    padded = f" {normalized} "
+    return any(stem in padded for stem in TREASURE_STEMS)
+
+
+def extract_features(normalized: str, n_buckets: int, ngram_min: int, ngram_max: int) -> Dict[int, float]:
+    """Hashed char n-gram counts (crc32, stable across processes), L2-normalised"""
+    padded = f" {normalized} "
+    counts: Dict[int, float] = {}
+    for n in range(ngram_min, ngram_max + 1):
+        for i in range(len(padded) - n + 1):
+            bucket = zlib.crc32(padded[i:i + n].encode("utf-8")) % n_buckets
+            counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+
+class TreasureClassifier:
+    """Scores how likely a pirate reply means handing over the treasure (0.0-1.0)"""
+
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        self.n_buckets = 1 << 14
+        self.ngram_min = 2
+        self.ngram_max = 4
+        self.bias = 0.0
+        self.weights: Dict[int, float] = {}
+        self.holdout: Dict[str, float] = {}
+        self.loaded = self._load()
+
+    def _load(self) -> bool:
+        """Load weights from JSON; without them only the prefilter is used"""
+        if not os.path.exists(self.model_path):
+            print(f"[Classifier] No model at {self.model_path}, using prefilter only")
+            return False
+        try:
+            with open(self.model_path, "r", encoding="utf-8") as f:
+                model = json.load(f)
+            if not model.get("holdout"):
+                print(f"[Classifier] Model {self.model_path} has no held-out evaluation, using prefilter only")
+                return False
+            self.holdout = model["holdout"]
+            self.n_buckets = int(model["n_buckets"])
+            self.ngram_min = int(model["ngram_min"])
+            self.ngram_max = int(model["ngram_max"])
+            self.bias = float(model["bias"])
+            self.weights = {int(k): float(v) for k, v in model["weights"].items()}
+            print(f"[Classifier] Loaded {self.model_path} (held-out: {self.holdout})")
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[Classifier] Failed to load model {self.model_path}: {e}, using prefilter only")
+            return False
+
+    def score(self, text: str) -> float:
+        """
+        Score a pirate reply
+
+        Args:
+            text: Pirate reply
+
+        Returns:
+            Probability that the reply gives the treasure away. 0.0 when the
+            prefilter finds no related stem; 0.5 (uncertain) when no model is loaded.
+        """
+        normalized = normalize_text(text)
+        if not normalized or not passes_prefilter(normalized):
+            return 0.0
+        if not self.loaded:
+            return 0.5
+
+        features = extract_features(normalized, self.n_buckets, self.ngram_min, self.ngram_max)
+        z = self.bias + sum(self.weights.get(k, 0.0) * v for k, v in features.items())
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
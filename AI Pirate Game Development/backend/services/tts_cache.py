@@ -0,0 +1,249 @@
+"""
+Content-addressed TTS audio cache - in-memory LRU in front of an on-disk LRU
+
+Entries are keyed by a hash of (normalised text, voice, model, format,
+language), so the same line in the same voice is synthesised only once. Disk
+entries are written atomically, so several workers can share one cache
+directory. All disk access (reads, writes, the startup directory scan) runs in
+worker threads; the LRU bookkeeping stays on the event loop.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+from backend.config import settings
+
+
+def normalize_tts_text(text: str) -> str:
+    """Normalise text the way it affects synthesis (Unicode form and whitespace only)"""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def tts_cache_key(text: str, voice: str, model: str, audio_format: str, language: str) -> str:
+    """
+    Build the cache key for a synthesised clip
+
+    Args:
+        text: Text to speak
+        voice: Voice name
+        model: TTS model
+        audio_format: Output format (mp3, pcm16, ...)
+        language: Language code
+
+    Returns:
+        Hex SHA-256 of the normalised parameters
+    """
+    parts = [normalize_tts_text(text), voice or "", model or "", audio_format or "", language or ""]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """Two-tier LRU cache of synthesised audio, bounded by bytes per tier"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        memory_bytes: Optional[int] = None,
+        disk_bytes: Optional[int] = None
+    ):
+        self.enabled = settings.tts_cache_enabled
+        self.cache_dir = settings.tts_cache_dir if cache_dir is None else cache_dir
+        self.memory_budget = settings.tts_cache_memory_bytes if memory_bytes is None else memory_bytes
+        self.disk_budget = settings.tts_cache_disk_bytes if disk_bytes is None else disk_bytes
+        self.max_entry_bytes = settings.tts_cache_max_entry_bytes
+        # Pre-rendered clips, never evicted
+        self.pinned: Dict[str, bytes] = {}
+        self.memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_size = 0
+        # key -> file size, in LRU order; rebuilt from the directory on first use
+        self.disk: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_size = 0
+        self._disk_loaded = False
+        self._disk_index_lock = asyncio.Lock()
+        self.stats: Dict[str, int] = {
+            "pinned_hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0
+        }
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up a clip, promoting disk hits into memory
+
+        Returns:
+            Audio bytes, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        data = self.pinned.get(key)
+        if data is not None:
+            self.stats["pinned_hits"] += 1
+            return data
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return data
+
+        data = await self._read_disk(key)
+        if data is not None:
+            self.stats["disk_hits"] += 1
+            self._put_memory(key, data)
+            return data
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, data: bytes):
+        """Store a complete clip in both tiers"""
+        if not self.enabled or not data or len(data) > self.max_entry_bytes:
+            return
+        self._put_memory(key, data)
+        self.stats["stores"] += 1
+        if self.cache_dir and self.disk_budget > 0:
+            await self._ensure_disk_index()
+            try:
+                await asyncio.to_thread(self._write_file, self._path(key), data)
+            except OSError as e:
+                print(f"[TTS Cache] Failed to write {key[:12]}: {e}")
+                return
+            if key in self.disk:
+                self.disk_size -= self.disk.pop(key)
+            self.disk[key] = len(data)
+            self.disk_size += len(data)
+            await self._evict_disk()
+
+    def pin(self, key: str, data: bytes):
+        """Keep a pre-rendered clip in memory permanently (outside the LRU budget)"""
+        if data:
+            self.pinned[key] = data
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus tier sizes and hit rate"""
+        stats: Dict[str, Any] = dict(self.stats)
+        hits = stats["pinned_hits"] + stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else None
+        stats["pinned_entries"] = len(self.pinned)
+        stats["pinned_bytes"] = sum(len(data) for data in self.pinned.values())
+        stats["memory_entries"] = len(self.memory)
+        stats["memory_bytes"] = self.memory_size
+        stats["disk_entries"] = len(self.disk)
+        stats["disk_bytes"] = self.disk_size
+        stats["enabled"] = self.enabled
+        return stats
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_budget:
+            return
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.memory_size -= len(previous)
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.memory_budget:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+            self.stats["memory_evictions"] += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    async def _ensure_disk_index(self):
+        """Rebuild the disk LRU from the cache directory on first use (oldest mtime first)"""
+        if self._disk_loaded:
+            return
+        async with self._disk_index_lock:
+            if self._disk_loaded:
+                return
+            entries = await asyncio.to_thread(self._scan_disk)
+            for _, key, size in sorted(entries):
+                self.disk[key] = size
+                self.disk_size += size
+            self._disk_loaded = True
+            await self._evict_disk()
+
+    def _scan_disk(self) -> list:
+        """(mtime, key, size) of every cached file (runs in a worker thread)"""
+        entries = []
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".bin"):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        return entries
+
+    async def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir or self.disk_budget <= 0:
+            return None
+        await self._ensure_disk_index()
+        data = await asyncio.to_thread(self._read_file, self._path(key))
+        if data is None:
+            # Missing, evicted by another worker, or empty
+            if key in self.disk:
+                self.disk_size -= self.disk.pop(key)
+            return None
+        if key not in self.disk:
+            # Written by another worker
+            self.disk[key] = len(data)
+            self.disk_size += len(data)
+        self.disk.move_to_end(key)
+        return data
+
+    def _read_file(self, path: str) -> Optional[bytes]:
+        """Read a cached clip and bump its mtime for the LRU (runs in a worker thread)"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _write_file(self, path: str, data: bytes):
+        """Atomic write (runs in a worker thread, touches no shared state)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def _evict_disk(self):
+        paths = []
+        while self.disk_size > self.disk_budget and self.disk:
+            key, size = self.disk.popitem(last=False)
+            self.disk_size -= size
+            self.stats["disk_evictions"] += 1
+            paths.append(self._path(key))
+        if paths:
+            await asyncio.to_thread(self._remove_files, paths)
+
+    def _remove_files(self, paths: list):
+        """Delete evicted clips (runs in a worker thread)"""
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Shared cache used by all TTS paths
+tts_cache = TTSAudioCache()
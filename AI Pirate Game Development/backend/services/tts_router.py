@@ -0,0 +1,236 @@
+"""
+Hedged TTS routing - start a secondary backend when the primary is slow, first byte wins
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from backend.config import settings
+
+
+# First-byte latency bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0)
+
+
+class LatencyHistogram:
+    """Cumulative-bucket histogram plus a rolling window for quantiles"""
+
+    def __init__(self, window: int = 200):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile over the rolling window (None when empty)"""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], self.buckets):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": buckets
+        }
+
+
+class AudioStream:
+    """
+    Async-iterable audio whose backend and media type are known once opened
+
+    Iterating opens it implicitly; callers that need the media type before
+    the first chunk (e.g. to set response headers) await open() first.
+    """
+
+    def __init__(self, opener: Callable[[], Awaitable[Tuple[str, str, AsyncIterator[bytes]]]]):
+        self._opener = opener
+        self._chunks: Optional[AsyncIterator[bytes]] = None
+        self.backend: Optional[str] = None
+        self.media_type: Optional[str] = None
+
+    async def open(self) -> "AudioStream":
+        if self._chunks is None:
+            self.backend, self.media_type, self._chunks = await self._opener()
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self.open()
+        try:
+            async for chunk in self._chunks:
+                yield chunk
+        finally:
+            # A consumer stopping early must close the upstream stream, not leave it to the GC
+            aclose = getattr(self._chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+async def _prepend(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    try:
+        yield first
+        async for chunk in rest:
+            yield chunk
+    finally:
+        await rest.aclose()
+
+
+class TTSRouter:
+    """
+    Races TTS backends on time to first byte
+
+    The primary backend starts immediately. If it has not produced a byte
+    within the hedge delay (p95 of its recent first-byte latencies, clamped),
+    or it fails, the secondary starts too. Whichever yields first is streamed
+    and the other is cancelled. First-byte times are measured from each
+    backend's own launch, so the secondary's do not include the hedge delay.
+    """
+
+    def __init__(self):
+        self.first_byte: Dict[str, LatencyHistogram] = {}
+        self._closing = set()
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "hedged": 0,
+            "primary_wins": 0,
+            "secondary_wins": 0,
+            "failed": 0
+        }
+
+    def histogram(self, backend: str) -> LatencyHistogram:
+        if backend not in self.first_byte:
+            self.first_byte[backend] = LatencyHistogram()
+        return self.first_byte[backend]
+
+    def hedge_delay(self, backend: str) -> float:
+        """Seconds to wait for the primary's first byte before starting the secondary"""
+        histogram = self.histogram(backend)
+        if len(histogram.recent) < settings.tts_hedge_min_samples:
+            return settings.tts_hedge_initial_delay
+        p95 = histogram.quantile(settings.tts_hedge_quantile)
+        return max(settings.tts_hedge_min_delay, min(settings.tts_hedge_max_delay, p95))
+
+    async def open(
+        self,
+        backends: List[Tuple[str, str]],
+        stream_factory: Callable[[str], AsyncIterator[bytes]]
+    ) -> Tuple[str, str, AsyncIterator[bytes]]:
+        """
+        Open the fastest backend
+
+        Args:
+            backends: [(name, media_type)] - primary first, then the hedge
+            stream_factory: Returns the audio stream of a backend by name
+
+        Returns:
+            (backend name, media type, chunks starting with the first byte)
+        """
+        self.stats["requests"] += 1
+        start = time.monotonic()
+        media_types = dict(backends)
+        streams: Dict[str, AsyncIterator[bytes]] = {}
+        launched: Dict[str, float] = {}
+        attempts: Dict[asyncio.Task, str] = {}
+
+        def launch(name: str):
+            launched[name] = time.monotonic()
+            streams[name] = stream_factory(name).__aiter__()
+            attempts[asyncio.create_task(streams[name].__anext__())] = name
+
+        launch(backends[0][0])
+        remaining = [name for name, _ in backends[1:]]
+        errors: List[str] = []
+        try:
+            while attempts:
+                timeout = self.hedge_delay(backends[0][0]) - (time.monotonic() - start) if remaining else None
+                done, _ = await asyncio.wait(
+                    list(attempts),
+                    timeout=max(0.0, timeout) if timeout is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary too slow - hedge
+                    self.stats["hedged"] += 1
+                    print(f"[TTS Router] No first byte from {backends[0][0]} after {time.monotonic() - start:.2f}s, starting {remaining[0]}")
+                    launch(remaining.pop(0))
+                    continue
+                for task in done:
+                    name = attempts.pop(task)
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        errors.append(f"{name}: empty audio")
+                        continue
+                    except Exception as e:
+                        errors.append(f"{name}: {e}")
+                        continue
+                    self.histogram(name).observe(time.monotonic() - launched[name])
+                    self.stats["primary_wins" if name == backends[0][0] else "secondary_wins"] += 1
+                    self._discard(attempts, streams, launched)
+                    return name, media_types[name], _prepend(first, streams[name])
+                if not attempts and remaining:
+                    # Failed before the hedge delay - fail over right away
+                    launch(remaining.pop(0))
+        except BaseException:
+            self._discard(attempts, streams, launched)
+            raise
+        self.stats["failed"] += 1
+        raise ValueError(f"All TTS backends failed: {'; '.join(errors)}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.stats)
+        stats["first_byte_seconds"] = {name: histogram.snapshot() for name, histogram in self.first_byte.items()}
+        stats["hedge_delay_seconds"] = {name: round(self.hedge_delay(name), 3) for name in self.first_byte}
+        return stats
+
+    def _discard(
+        self,
+        attempts: Dict[asyncio.Task, str],
+        streams: Dict[str, AsyncIterator[bytes]],
+        launched: Dict[str, float]
+    ):
+        """Cancel losing attempts and close their streams"""
+        for task, name in list(attempts.items()):
+            # The loser took at least this long - record it so the hedge delay doesn't drift low
+            self.histogram(name).observe(time.monotonic() - launched[name])
+            task.cancel()
+            closer = asyncio.create_task(self._close(task, streams[name]))
+            self._closing.add(closer)
+            closer.add_done_callback(self._closing.discard)
+        attempts.clear()
+
+    async def _close(self, task: asyncio.Task, stream: AsyncIterator[bytes]):
+        try:
+            await task
+        except BaseException:
+            pass
+        try:
+            await stream.aclose()
+        except BaseException:
+            pass
+
+
+# Shared router (latency histograms are process-wide)
+tts_router = TTSRouter()
@@ -0,0 +1,179 @@
+"""
+Per-turn audio buffers - TTS started in the background as soon as a reply is final
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Any
+from backend.config import settings
+from backend.services.tts_router import AudioStream
+
+
+class TurnAudioBuffer:
+    """
+    Audio of one pirate reply, filled by a background task
+
+    Readers replay the buffer from the first byte and then follow the producer,
+    so a client joining mid-synthesis gets the whole clip without a second
+    TTS call.
+    """
+
+    def __init__(self, text: str, max_bytes: int):
+        self.text = text
+        self.max_bytes = max_bytes
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.media_type: Optional[str] = None
+        self.done = False
+        self.error: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def fill(self, source: AsyncIterator[bytes]):
+        """Consume an audio stream into the buffer"""
+        try:
+            if isinstance(source, AudioStream):
+                # A hedged stream only knows its format once a backend has won
+                await source.open()
+                self.media_type = source.media_type
+            async for chunk in source:
+                if not chunk:
+                    continue
+                if self.size + len(chunk) > self.max_bytes:
+                    raise ValueError(f"Turn audio exceeds buffer limit ({self.max_bytes} bytes)")
+                self.chunks.append(chunk)
+                self.size += len(chunk)
+                async with self._changed:
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self.error = "Audio generation cancelled"
+            raise
+        except Exception as e:
+            print(f"[Audio] Background TTS failed: {e}")
+            self.error = str(e)
+        finally:
+            self.done = True
+            self.finished_at = time.monotonic()
+            async with self._changed:
+                self._changed.notify_all()
+
+    def stream(self, default_media_type: str) -> AudioStream:
+        """
+        The clip as an AudioStream, opened once its format is known
+
+        Args:
+            default_media_type: Used when synthesis failed before a backend won
+        """
+        async def open_buffer():
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or self.media_type is not None)
+            return "buffer", self.media_type or default_media_type, self.read()
+
+        return AudioStream(open_buffer)
+
+    async def read(self) -> AsyncIterator[bytes]:
+        """
+        Stream the clip from the first byte, waiting for chunks still being synthesised
+
+        Raises:
+            ValueError: If synthesis failed
+        """
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error:
+                    raise ValueError(self.error)
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or index < len(self.chunks))
+
+
+class TurnAudioRegistry:
+    """Bounded set of TurnAudioBuffers addressed by (game_id, turn_id)"""
+
+    def __init__(self):
+        self.buffers: "OrderedDict[Tuple[str, int], TurnAudioBuffer]" = OrderedDict()
+        self.max_turns = settings.turn_audio_max_turns
+        self.max_bytes = settings.turn_audio_max_bytes
+        self.ttl = settings.turn_audio_ttl_seconds
+        # fallbacks: turns requested here without a buffer (ran on another worker), re-voiced from the game store
+        self.stats: Dict[str, int] = {"started": 0, "failed": 0, "served": 0, "evicted": 0, "fallbacks": 0}
+
+    def start(
+        self,
+        game_id: str,
+        turn_id: int,
+        text: str,
+        source_factory: Callable[[str], AsyncIterator[bytes]]
+    ) -> TurnAudioBuffer:
+        """
+        Start synthesising a reply in the background
+
+        Args:
+            game_id: Game identifier
+            turn_id: Turn number within the game
+            text: Final pirate reply
+            source_factory: Returns the audio stream for a text (e.g. generate_audio_stream)
+
+        Returns:
+            The buffer being filled
+        """
+        self._expire()
+        key = (game_id, turn_id)
+        existing = self.buffers.get(key)
+        if existing is not None and existing.text == text:
+            return existing
+        if existing is not None:
+            self._drop(key)
+
+        buffer = TurnAudioBuffer(text, self.max_bytes)
+        buffer.task = asyncio.create_task(self._run(buffer, source_factory(text)))
+        self.buffers[key] = buffer
+        self.stats["started"] += 1
+        while len(self.buffers) > self.max_turns:
+            self._drop(next(iter(self.buffers)))
+            self.stats["evicted"] += 1
+        return buffer
+
+    def get(self, game_id: str, turn_id: int) -> Optional[TurnAudioBuffer]:
+        """Get the buffer for a turn (None if never started or already evicted)"""
+        self._expire()
+        buffer = self.buffers.get((game_id, turn_id))
+        if buffer is not None:
+            self.stats["served"] += 1
+        return buffer
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus current buffer usage"""
+        stats: Dict[str, Any] = dict(self.stats)
+        stats["buffers"] = len(self.buffers)
+        stats["in_progress"] = sum(1 for b in self.buffers.values() if not b.done)
+        stats["buffered_bytes"] = sum(b.size for b in self.buffers.values())
+        return stats
+
+    async def close(self):
+        """Cancel all running synthesis tasks"""
+        for key in list(self.buffers):
+            self._drop(key)
+
+    async def _run(self, buffer: TurnAudioBuffer, source: AsyncIterator[bytes]):
+        await buffer.fill(source)
+        if buffer.error:
+            self.stats["failed"] += 1
+
+    def _drop(self, key: Tuple[str, int]):
+        buffer = self.buffers.pop(key, None)
+        if buffer is not None and buffer.task is not None and not buffer.task.done():
+            buffer.task.cancel()
+
+    def _expire(self):
+        """Drop finished buffers older than the TTL"""
+        cutoff = time.monotonic() - self.ttl
+        for key, buffer in list(self.buffers.items()):
+            if buffer.done and buffer.finished_at is not None and buffer.finished_at < cutoff:
+                self._drop(key)
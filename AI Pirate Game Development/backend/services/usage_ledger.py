@@ -0,0 +1,278 @@
+"""
+Usage ledger - tokens, characters, cost and latency of every upstream call
+
+Each call is attributed to a game, turn and stage (merit, pirate, validator,
+stt, tts) and appended to a bounded ring of immutable entries. Totals per
+difficulty, model, stage and game are kept incrementally, so they survive
+entries rotating out of the ring.
+
+Attribution travels in a context variable set for the duration of a turn;
+tasks started during the turn (speculative generations, background TTS)
+inherit it. Calls outside a turn (on-demand TTS, speech-to-text without a
+game) are recorded unattributed.
+"""
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, NamedTuple, Optional
+from backend.config import settings
+
+
+# Model roles (OpenRouterService model_role) -> ledger stage
+ROLE_STAGES = {"pirate": "pirate", "evaluator": "merit", "validator": "validator"}
+
+
+class Attribution(NamedTuple):
+    game_id: str
+    turn_id: Optional[int]
+    difficulty: Optional[str]
+
+
+class UsageEntry(NamedTuple):
+    timestamp: float
+    game_id: Optional[str]
+    turn_id: Optional[int]
+    difficulty: Optional[str]
+    stage: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    characters: int  # TTS input characters (Kie.ai bills per character)
+    cost: float  # USD as reported by OpenRouter (0 when not reported)
+    latency: float
+
+
+class UsageTotals:
+    """Running totals for one aggregation key"""
+
+    __slots__ = ("calls", "prompt_tokens", "completion_tokens", "characters", "cost", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.characters = 0
+        self.cost = 0.0
+        self.latency = 0.0
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, entry: UsageEntry):
+        self.calls += 1
+        self.prompt_tokens += entry.prompt_tokens
+        self.completion_tokens += entry.completion_tokens
+        self.characters += entry.characters
+        self.cost += entry.cost
+        self.latency += entry.latency
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.tokens,
+            "characters": self.characters,
+            "cost_usd": round(self.cost, 6),
+            "avg_latency_seconds": round(self.latency / self.calls, 3) if self.calls else None
+        }
+
+
+_attribution: ContextVar[Optional[Attribution]] = ContextVar("usage_attribution", default=None)
+
+
+class UsageLedger:
+    """Append-only usage ledger with per-difficulty/model/stage/game totals"""
+
+    def __init__(self):
+        self.enabled = settings.usage_ledger
+        self.entries: Deque[UsageEntry] = deque(maxlen=max(1, settings.usage_ledger_max_entries))
+        self.total = UsageTotals()
+        self.by_difficulty: Dict[str, UsageTotals] = {}
+        self.by_model: Dict[str, UsageTotals] = {}
+        self.by_stage: Dict[str, UsageTotals] = {}
+        self.by_game: "OrderedDict[str, UsageTotals]" = OrderedDict()
+        self.max_games = max(1, settings.usage_ledger_max_games)
+        self.budget_switches = 0
+
+    @contextmanager
+    def attributed(self, game_id: str, turn_id: int, difficulty: str) -> Iterator[None]:
+        """Attribute calls made in this block (and tasks it starts) to a game turn"""
+        token = _attribution.set(Attribution(game_id, turn_id, difficulty))
+        try:
+            yield
+        finally:
+            _attribution.reset(token)
+
+    async def attribute_stream(
+        self,
+        stream: AsyncIterator[Any],
+        game_id: str,
+        turn_id: int,
+        difficulty: str
+    ) -> AsyncIterator[Any]:
+        """
+        Attribute calls made while advancing a stream to a game turn
+
+        Stream consumers may advance each step in a fresh task (see
+        stream_until_disconnected), so the attribution is set again before
+        every step instead of once around the whole stream.
+        """
+        attribution = Attribution(game_id, turn_id, difficulty)
+        iterator = stream.__aiter__()
+        try:
+            while True:
+                _attribution.set(attribution)
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        latency: float,
+        usage: Optional[Dict[str, Any]] = None,
+        characters: int = 0,
+        game_id: Optional[str] = None
+    ):
+        """
+        Append one upstream call
+
+        Args:
+            stage: "merit", "pirate", "validator", "stt" or "tts"
+            model: Model the call was served by
+            latency: Seconds until the response was complete
+            usage: OpenRouter usage block (prompt_tokens, completion_tokens, cost)
+            characters: Synthesised characters (TTS)
+            game_id: Game to attribute to when called outside a turn
+        """
+        if not self.enabled:
+            return
+        usage = usage or {}
+        attribution = _attribution.get()
+        if attribution is None and game_id:
+            attribution = Attribution(game_id, None, None)
+        entry = UsageEntry(
+            timestamp=time.time(),
+            game_id=attribution.game_id if attribution else None,
+            turn_id=attribution.turn_id if attribution else None,
+            difficulty=attribution.difficulty if attribution else None,
+            stage=stage,
+            model=model or "",
+            prompt_tokens=int(usage.get("prompt_tokens") or 0),
+            completion_tokens=int(usage.get("completion_tokens") or 0),
+            characters=characters,
+            cost=float(usage.get("cost") or 0.0),
+            latency=latency
+        )
+        self.entries.append(entry)
+        self.total.add(entry)
+        self._totals(self.by_stage, entry.stage).add(entry)
+        self._totals(self.by_model, entry.model).add(entry)
+        if entry.difficulty:
+            self._totals(self.by_difficulty, entry.difficulty).add(entry)
+        if entry.game_id:
+            self._game(entry.game_id).add(entry)
+
+    def game_budget(self, difficulty: Optional[str]) -> int:
+        """Token budget per game of a difficulty (0 = unlimited)"""
+        return {
+            "easy": settings.token_budget_easy,
+            "medium": settings.token_budget_medium,
+            "hard": settings.token_budget_hard
+        }.get(difficulty or "", 0)
+
+    def budget_model(self, role: Optional[str], model: str) -> str:
+        """
+        Model to use for a call of the current turn
+
+        Once the game has spent its token budget, roles with a configured
+        budget model (TOKEN_BUDGET_*_MODEL) switch to it.
+        """
+        attribution = _attribution.get()
+        if not self.enabled or attribution is None or not role:
+            return model
+        budget = self.game_budget(attribution.difficulty)
+        totals = self.by_game.get(attribution.game_id)
+        if not budget or totals is None or totals.tokens < budget:
+            return model
+        cheaper = {
+            "pirate": settings.token_budget_pirate_model,
+            "evaluator": settings.token_budget_evaluator_model,
+            "validator": settings.token_budget_validator_model
+        }.get(role, "")
+        if not cheaper or cheaper == model:
+            return model
+        self.budget_switches += 1
+        return cheaper
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals overall and per difficulty, model and stage"""
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "games": len(self.by_game),
+            "budget_switches": self.budget_switches,
+            "budgets": {difficulty: self.game_budget(difficulty) for difficulty in ("easy", "medium", "hard")},
+            "total": self.total.snapshot(),
+            "by_difficulty": {key: totals.snapshot() for key, totals in self.by_difficulty.items()},
+            "by_model": {key: totals.snapshot() for key, totals in self.by_model.items()},
+            "by_stage": {key: totals.snapshot() for key, totals in self.by_stage.items()}
+        }
+
+    def games(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently active games with their totals"""
+        recent = list(self.by_game.items())[-limit:]
+        return [{"game_id": game_id, **totals.snapshot()} for game_id, totals in reversed(recent)]
+
+    def game(self, game_id: str) -> Optional[Dict[str, Any]]:
+        """Totals, per-turn/stage breakdown and entries of one game (None if unknown)"""
+        totals = self.by_game.get(game_id)
+        if totals is None:
+            return None
+        entries = [entry for entry in self.entries if entry.game_id == game_id]
+        by_turn: Dict[str, UsageTotals] = {}
+        by_stage: Dict[str, UsageTotals] = {}
+        for entry in entries:
+            self._totals(by_turn, str(entry.turn_id)).add(entry)
+            self._totals(by_stage, entry.stage).add(entry)
+        difficulty = next((entry.difficulty for entry in entries if entry.difficulty), None)
+        return {
+            "game_id": game_id,
+            "difficulty": difficulty,
+            "budget_tokens": self.game_budget(difficulty),
+            "total": totals.snapshot(),
+            "by_turn": {key: value.snapshot() for key, value in by_turn.items()},
+            "by_stage": {key: value.snapshot() for key, value in by_stage.items()},
+            "entries": [entry._asdict() for entry in entries]
+        }
+
+    def _totals(self, table: Dict[str, UsageTotals], key: str) -> UsageTotals:
+        totals = table.get(key)
+        if totals is None:
+            totals = table[key] = UsageTotals()
+        return totals
+
+    def _game(self, game_id: str) -> UsageTotals:
+        """Game totals (most recently used last), forgetting the oldest beyond the limit"""
+        totals = self.by_game.get(game_id)
+        if totals is None:
+            totals = self.by_game[game_id] = UsageTotals()
+            while len(self.by_game) > self.max_games:
+                self.by_game.popitem(last=False)
+        else:
+            self.by_game.move_to_end(game_id)
+        return totals
+
+
+# Shared ledger (process-wide; each worker keeps its own)
+usage_ledger = UsageLedger()
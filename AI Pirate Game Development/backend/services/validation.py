@@ -3,8 +3,30 @@ Validation service for blocking treasure phrase unless deception score is high e
 """
 import re
 import json
+import asyncio
 from typing import Optional, Tuple
-from backend.config import FORBIDDEN_PHRASE
+from backend.config import FORBIDDEN_PHRASE, settings
+from backend.services.treasure_classifier import TreasureClassifier
+
+
+# Appended to the pirate system prompt in fused validation mode
+FUSED_REPLY_INSTRUCTION = """
+
+FORMAT ODPOWIEDZI: Odpowiadasz TYLKO w formacie JSON, bez żadnych dodatkowych komentarzy:
+{"reply": "<twoja odpowiedź jako pirat>", "gives_treasure": true/false, "confidence": 0.0-1.0}
+"gives_treasure" ustaw na true tylko jeśli twoja odpowiedź oznacza, że oddajesz skarb graczowi (skarb jest teraz jego, może go wziąć).
+"confidence" to twoja pewność tej oceny."""
+
+# Canned replies used when a treasure-giving reply is blocked (pre-rendered to audio at startup)
+ALTERNATIVE_RESPONSES = [
+    "Haha, nie dam ci mojego skarbu tak łatwo! Musisz być bardziej kreatywny w oszukiwaniu, przyjacielu!",
+    "To nie wystarczy! Spróbuj bardziej przekonująco mnie oszukać!",
+    "Nie, nie dam ci skarbu. Musisz być bardziej pomysłowy w wprowadzaniu mnie w błąd!",
+    "Hmm, to brzmi podejrzanie... Nie dam ci skarbu tak łatwo. Spróbuj lepiej!",
+    "Musisz się bardziej postarać w oszukiwaniu, jeśli chcesz mój skarb!",
+    "Widzę przez twoje sztuczki! Nie dam ci skarbu bez lepszego oszustwa!",
+    "Nie jestem tak naiwny! Spróbuj bardziej kreatywnie mnie oszukać!"
+]
 
 
 class ValidationService:
@@ -17,6 +39,13 @@ class ValidationService:
             re.escape(self.forbidden_phrase),
             re.IGNORECASE
         )
+        # Local detector in front of the LLM semantic check (tiered mode)
+        self.local_classifier = TreasureClassifier() if settings.treasure_classifier_enabled else None
+        self.tier_stats = {
+            "local_negative": 0,    # Decided locally: not giving treasure (LLM call avoided)
+            "llm_checked": 0,       # Local score at or above the low threshold
+            "band_agreed": 0        # LLM-checked cases where the local 0.5 cut agreed with the LLM
+        }
         
     def contains_forbidden_phrase(self, text: str) -> bool:
         """
@@ -173,12 +202,13 @@ Odpowiedź pirata do przeanalizowania:
                 }
             ]
             
-            # Use Claude Sonnet 4.5 for semantic check (better semantic understanding)
+            # Claude Sonnet 4.5 by default for semantic check (better semantic understanding)
             response = await llm_service.generate_response(
                 messages=messages,
-                model="anthropic/claude-sonnet-4.5",  # Claude Sonnet 4.5 via OpenRouter for better semantic analysis
+                model=settings.validator_model,
                 temperature=0.1,  # Low temperature for consistent analysis
-                max_tokens=200
+                max_tokens=200,
+                model_role="validator"
             )
             
             # Parse JSON response
@@ -216,17 +246,144 @@ Odpowiedź pirata do przeanalizowania:
             print(f"Error in LLM semantic check: {e}, defaulting to False")
             return False, 0.0
     
+    async def detects_similar_treasure_phrase_tiered(
+        self,
+        text: str,
+        llm_service
+    ) -> Tuple[bool, float]:
+        """
+        Rule out clear non-treasure replies locally, asking the LLM for the rest
+        
+        The local classifier may only short-circuit negatives: a high local
+        score still goes to the LLM, so a false positive costs an LLM call
+        instead of handing the player a win.
+        
+        Args:
+            text: Text to analyze
+            llm_service: OpenRouterService instance for LLM calls
+            
+        Returns:
+            Tuple of (is_similar, confidence_score), same as detects_similar_treasure_phrase_llm
+        """
+        score = None
+        if self.local_classifier is not None:
+            score = self.local_classifier.score(text)
+            if score < settings.treasure_classifier_low:
+                self.tier_stats["local_negative"] += 1
+                return False, 1.0 - score
+            self.tier_stats["llm_checked"] += 1
+        
+        is_similar, confidence = await self.detects_similar_treasure_phrase_llm(text, llm_service)
+        if score is not None and (score >= 0.5) == is_similar:
+            self.tier_stats["band_agreed"] += 1
+        if settings.treasure_check_log_path:
+            # Logged with the classifier off too, so training data can be collected before enabling it
+            await asyncio.to_thread(self._log_treasure_check, text, score, is_similar, confidence)
+        return is_similar, confidence
+    
+    def _log_treasure_check(self, text: str, local_score: Optional[float], is_similar: bool, confidence: float):
+        """Append an LLM-checked reply to the training log (scripts/train_treasure_classifier.py)"""
+        try:
+            with open(settings.treasure_check_log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "text": text,
+                    "local_score": None if local_score is None else round(local_score, 4),
+                    "llm_is_similar": is_similar,
+                    "llm_confidence": confidence
+                }, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Failed to log treasure check: {e}")
+    
+    def parse_fused_reply(self, raw: str) -> Tuple[str, Optional[bool], float]:
+        """
+        Parse the structured pirate payload used in fused validation mode
+        
+        Args:
+            raw: Raw LLM output, expected {"reply": ..., "gives_treasure": ..., "confidence": ...}
+            
+        Returns:
+            Tuple of (reply_text, gives_treasure, confidence). gives_treasure is None
+            when the payload could not be parsed - the raw text is then used as the
+            reply and the standalone semantic check should decide.
+        """
+        text = (raw or "").strip()
+        json_start = text.find("{")
+        json_end = text.rfind("}") + 1
+        if json_start >= 0 and json_end > json_start:
+            try:
+                result = json.loads(text[json_start:json_end])
+                reply = str(result.get("reply", "")).strip()
+                if reply:
+                    confidence = max(0.0, min(1.0, float(result.get("confidence", 0.0))))
+                    return reply, bool(result.get("gives_treasure", False)), confidence
+            except (json.JSONDecodeError, AttributeError, ValueError, TypeError) as e:
+                print(f"Fused reply parse failed: {e}, using raw text")
+        return text, None, 0.0
+    
     def _generate_alternative_response(self) -> str:
         """Generate alternative response when treasure phrase is blocked"""
-        alternatives = [
-            "Haha, nie dam ci mojego skarbu tak łatwo! Musisz być bardziej kreatywny w oszukiwaniu, przyjacielu!",
-            "To nie wystarczy! Spróbuj bardziej przekonująco mnie oszukać!",
-            "Nie, nie dam ci skarbu. Musisz być bardziej pomysłowy w wprowadzaniu mnie w błąd!",
-            "Hmm, to brzmi podejrzanie... Nie dam ci skarbu tak łatwo. Spróbuj lepiej!",
-            "Musisz się bardziej postarać w oszukiwaniu, jeśli chcesz mój skarb!",
-            "Widzę przez twoje sztuczki! Nie dam ci skarbu bez lepszego oszustwa!",
-            "Nie jestem tak naiwny! Spróbuj bardziej kreatywnie mnie oszukać!"
-        ]
         import random
-        return random.choice(alternatives)
+        return random.choice(ALTERNATIVE_RESPONSES)
+
+
+class StreamingPhraseGuard:
+    """Hold-back buffer for streamed pirate replies
+
+    Text is released only once it lies more than `holdback_chars` behind the
+    newest token, so a forbidden phrase or treasure agreement is always still
+    in the buffer (and never sent to the client) when the regex checks fire.
+    """
+
+    def __init__(
+        self,
+        validation_service: ValidationService,
+        merit_has_earned_it: bool = False,
+        holdback_chars: Optional[int] = None
+    ):
+        self.validation_service = validation_service
+        self.merit_has_earned_it = merit_has_earned_it
+        self.holdback_chars = holdback_chars or max(
+            settings.stream_holdback_chars,
+            len(validation_service.forbidden_phrase)
+        )
+        self.text = ""
+        self.released = 0
+        self.blocked = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a streamed chunk and return the part that is safe to forward
+
+        Args:
+            chunk: Newly received text
+
+        Returns:
+            Text that can be sent to the client now ("" once blocked)
+        """
+        if self.blocked or not chunk:
+            return ""
+
+        self.text += chunk
+
+        if not self.merit_has_earned_it and (
+            self.validation_service.contains_forbidden_phrase(self.text) or
+            self.validation_service.detects_treasure_agreement(self.text)
+        ):
+            self.blocked = True
+            return ""
+
+        safe_end = len(self.text) - self.holdback_chars
+        if safe_end <= self.released:
+            return ""
+        safe = self.text[self.released:safe_end]
+        self.released = safe_end
+        return safe
+
+    def flush(self) -> str:
+        """Release the held-back tail at the end of the stream ("" if blocked)"""
+        if self.blocked:
+            return ""
+        tail = self.text[self.released:]
+        self.released = len(self.text)
+        return tail
 
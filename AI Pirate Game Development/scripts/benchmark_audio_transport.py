@@ -0,0 +1,124 @@
+"""
+Compare audio transports: base64 SSE vs chunked binary HTTP vs WebSocket frames
+
+Offline mode encodes a synthetic PCM16 stream (or an audio file) the way each
+endpoint frames it and reports bytes on the wire and per-chunk CPU cost.
+With --base-url it also fetches /api/game/conversation/stream-audio from a
+running backend with both Accept headers and reports bytes received and
+time to first chunk.
+
+Usage:
+    python scripts/benchmark_audio_transport.py --seconds 5 --chunk-ms 100
+    python scripts/benchmark_audio_transport.py --file reply.mp3 --chunk-bytes 16384
+    python scripts/benchmark_audio_transport.py --base-url http://localhost:8000 --text "Arr, witaj!"
+"""
+import argparse
+import base64
+import math
+import struct
+import sys
+import time
+
+
+def synthetic_pcm16(seconds: float, sample_rate: int) -> bytes:
+    """Mono 440 Hz sine as little-endian PCM16"""
+    n = int(seconds * sample_rate)
+    return b"".join(struct.pack("<h", int(12000 * math.sin(2 * math.pi * 440 * i / sample_rate))) for i in range(n))
+
+
+def sse_frame(chunk: bytes) -> bytes:
+    """Framing used by the SSE audio endpoints"""
+    return f"data: {base64.b64encode(chunk).decode('utf-8')}\n\n".encode("utf-8")
+
+
+def http_chunk_frame(chunk: bytes) -> bytes:
+    """HTTP/1.1 chunked transfer-encoding framing"""
+    return f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n"
+
+
+def websocket_frame(chunk: bytes) -> bytes:
+    """Unmasked server-to-client binary frame header + payload"""
+    length = len(chunk)
+    if length < 126:
+        header = struct.pack("!BB", 0x82, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x82, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x82, 127, length)
+    return header + chunk
+
+
+def measure(name, frame, chunks, payload_bytes, repeats):
+    """Bytes on the wire and mean CPU time per chunk for one framing"""
+    wire = sum(len(frame(chunk)) for chunk in chunks)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for chunk in chunks:
+            frame(chunk)
+    per_chunk_us = (time.perf_counter() - start) / (repeats * len(chunks)) * 1e6
+    overhead = (wire - payload_bytes) / payload_bytes * 100
+    print(f"{name:<22} {wire:>12,} B  {overhead:>+7.1f}%  {per_chunk_us:>8.2f} us/chunk")
+
+
+def run_offline(args):
+    if args.file:
+        with open(args.file, "rb") as f:
+            audio = f.read()
+        chunk_bytes = args.chunk_bytes
+    else:
+        audio = synthetic_pcm16(args.seconds, args.sample_rate)
+        chunk_bytes = int(args.sample_rate * args.chunk_ms / 1000) * 2
+    chunks = [audio[i:i + chunk_bytes] for i in range(0, len(audio), chunk_bytes)]
+
+    print(f"Payload: {len(audio):,} bytes in {len(chunks)} chunks of {chunk_bytes} bytes")
+    print(f"{'transport':<22} {'wire':>14}  {'overhead':>8}  {'cpu':>16}")
+    measure("SSE base64", sse_frame, chunks, len(audio), args.repeats)
+    measure("HTTP chunked binary", http_chunk_frame, chunks, len(audio), args.repeats)
+    measure("WebSocket binary", websocket_frame, chunks, len(audio), args.repeats)
+
+
+def run_live(args):
+    import httpx
+
+    url = f"{args.base_url.rstrip('/')}/api/game/conversation/stream-audio"
+    print(f"{'transport':<22} {'received':>12}  {'first chunk':>12}  {'total':>8}")
+    for name, accept in (("SSE base64", "text/event-stream"), ("HTTP chunked binary", "audio/*")):
+        start = time.perf_counter()
+        first = None
+        received = 0
+        with httpx.Client(timeout=120.0) as client:
+            with client.stream("POST", url, json={"text": args.text}, headers={"Accept": accept}) as response:
+                response.raise_for_status()
+                for chunk in response.iter_raw():
+                    if first is None:
+                        first = time.perf_counter() - start
+                    received += len(chunk)
+        total = time.perf_counter() - start
+        print(f"{name:<22} {received:>12,}  {first or 0:>11.3f}s  {total:>7.3f}s")
+    print("(run twice - the second pass of the same text is served from the TTS cache)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="Audio file to chunk instead of synthetic PCM16")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Length of synthetic PCM16 audio")
+    parser.add_argument("--sample-rate", type=int, default=24000, help="Synthetic PCM16 sample rate")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Synthetic chunk length in milliseconds")
+    parser.add_argument("--chunk-bytes", type=int, default=16384, help="Chunk size for --file")
+    parser.add_argument("--repeats", type=int, default=50, help="Timing repetitions")
+    parser.add_argument("--base-url", help="Also measure a running backend")
+    parser.add_argument("--text", default="Arr, witaj na moim statku, szczurze lądowy!", help="Text for the live test")
+    args = parser.parse_args()
+
+    run_offline(args)
+    if args.base_url:
+        print()
+        try:
+            run_live(args)
+        except Exception as e:
+            print(f"Live measurement failed: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the tiered treasure-giving detection against LLM verdicts
+
+Replays replies from JSONL (the TREASURE_CHECK_LOG written by the semantic
+check) through the local classifier and reports how many upstream LLM calls
+ruling out scores below --low would avoid, and how many treasure-giving
+replies that would miss. Only meaningful on replies the model was not trained
+on (a log collected after training); train_treasure_classifier.py reports the
+same numbers on its held-out split.
+
+Usage:
+    python scripts/benchmark_treasure_classifier.py logs/treasure_checks.new.jsonl --low 0.1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.treasure_classifier import TreasureClassifier  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="JSONL files with replies and LLM verdicts")
+    parser.add_argument("--model", default=None, help="Classifier weights (default: backend/data/treasure_classifier.json)")
+    parser.add_argument("--low", type=float, default=0.1, help="Below this score the reply is decided 'not giving' locally")
+    args = parser.parse_args()
+
+    classifier = TreasureClassifier(args.model)
+
+    rows = []
+    for path in args.inputs:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if "llm_is_similar" in row:
+                    rows.append((row["text"], bool(row["llm_is_similar"])))
+
+    if not rows:
+        print("No replies with verdicts found")
+        return
+
+    local_negative = false_negatives = 0
+    overall_agreed = 0
+    prefilter_rejected = 0
+
+    start = time.perf_counter()
+    scores = [classifier.score(text) for text, _ in rows]
+    elapsed = time.perf_counter() - start
+
+    for (text, verdict), score in zip(rows, scores):
+        if score == 0.0:
+            prefilter_rejected += 1
+        if (score >= 0.5) == verdict:
+            overall_agreed += 1
+        if score < args.low:
+            local_negative += 1
+            if verdict:
+                false_negatives += 1
+                print(f"  missed (score={score:.2f}, llm=True): {text[:80]}")
+
+    total = len(rows)
+    positives = sum(1 for _, verdict in rows if verdict)
+    print(f"Replies:                   {total}")
+    print(f"Model loaded:              {classifier.loaded}")
+    print(f"Rejected by prefilter:     {prefilter_rejected} ({prefilter_rejected / total:.1%})")
+    print(f"Ruled out locally:         {local_negative} ({local_negative / total:.1%})")
+    print(f"Upstream LLM calls needed: {total - local_negative} ({(total - local_negative) / total:.1%}), avoided {local_negative}")
+    print(f"Treasure-giving missed:    {false_negatives}/{positives}")
+    print(f"Agreement at 0.5 cut:      {overall_agreed}/{total} ({overall_agreed / total:.1%}) on all replies")
+    print(f"Local scoring cost:        {elapsed / total * 1e6:.1f} us/reply")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Train the local treasure-giving classifier offline
+
+Reads pirate replies logged by the semantic check (TREASURE_CHECK_LOG,
+{"text": ..., "llm_is_similar": true/false, ...}) and writes the weights used
+by backend.services.treasure_classifier.TreasureClassifier, with the LLM
+verdict as the label. Hand-labelled {"text": ..., "label": 0/1} lines (e.g.
+backend/data/treasure_replies_seed.jsonl) are only added to the training side.
+
+A share of the logged replies (--holdout, split by text so repeated replies
+never straddle it) is kept out of training. The model is evaluated on it at
+--low: the replies the classifier would rule out locally, and how many of them
+the LLM judged treasure-giving (false negatives, the only error the tiered
+check can make). The evaluation is stored with the weights; the service does
+not load weights without it. Choose --low so held-out false negatives are zero.
+
+Usage:
+    python scripts/train_treasure_classifier.py logs/treasure_checks.jsonl --low 0.1
+    python scripts/train_treasure_classifier.py logs/treasure_checks.jsonl --extra backend/data/treasure_replies_seed.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.treasure_classifier import (  # noqa: E402
+    DEFAULT_MODEL_PATH,
+    extract_features,
+    normalize_text,
+    passes_prefilter
+)
+
+
+def load_examples(paths, key):
+    """Load (text, label) pairs from JSONL files, reading the label from `key`"""
+    examples = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if key in row:
+                    examples.append((row["text"], int(bool(row[key]))))
+    return examples
+
+
+def split_holdout(examples, share):
+    """Deterministic split by normalized text, so duplicates land on the same side"""
+    train_part, holdout = [], []
+    for text, label in examples:
+        bucket = zlib.crc32(normalize_text(text).encode("utf-8")) % 1000
+        (holdout if bucket < share * 1000 else train_part).append((text, label))
+    return train_part, holdout
+
+
+def score(features, bias, weights):
+    z = bias + sum(weights.get(k, 0.0) * v for k, v in features.items())
+    return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+
+def evaluate(examples, bias, weights, n_buckets, ngram_min, ngram_max, low):
+    """Held-out evaluation of ruling out replies scored below `low`"""
+    ruled_out = false_negatives = positives = 0
+    for text, label in examples:
+        positives += label
+        normalized = normalize_text(text)
+        if not normalized or not passes_prefilter(normalized):
+            p = 0.0
+        else:
+            p = score(extract_features(normalized, n_buckets, ngram_min, ngram_max), bias, weights)
+        if p < low:
+            ruled_out += 1
+            if label:
+                false_negatives += 1
+                print(f"  held-out false negative (score={p:.3f}): {text[:80]}")
+    return {
+        "examples": len(examples),
+        "positives": positives,
+        "low": low,
+        "ruled_out": ruled_out,
+        "false_negatives": false_negatives
+    }
+
+
+def train(examples, n_buckets, ngram_min, ngram_max, epochs, learning_rate, l2):
+    """Logistic regression with plain SGD over hashed char n-grams"""
+    data = []
+    for text, label in examples:
+        normalized = normalize_text(text)
+        # The prefilter already rejects replies without treasure stems, train on the rest
+        if not passes_prefilter(normalized):
+            continue
+        data.append((extract_features(normalized, n_buckets, ngram_min, ngram_max), label))
+
+    weights = {}
+    bias = 0.0
+    rng = random.Random(13)
+    for _ in range(epochs):
+        rng.shuffle(data)
+        for features, label in data:
+            p = score(features, bias, weights)
+            gradient = p - label
+            bias -= learning_rate * gradient
+            for k, v in features.items():
+                w = weights.get(k, 0.0)
+                weights[k] = w - learning_rate * (gradient * v + l2 * w)
+    return bias, weights, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="TREASURE_CHECK_LOG JSONL files with LLM verdicts")
+    parser.add_argument("--extra", nargs="*", default=[], help="Hand-labelled JSONL files, used for training only")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of logged replies kept out of training")
+    parser.add_argument("--low", type=float, default=0.1, help="Threshold evaluated on the held-out split (TREASURE_CLASSIFIER_LOW)")
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--buckets", type=int, default=1 << 14)
+    parser.add_argument("--ngram-min", type=int, default=2)
+    parser.add_argument("--ngram-max", type=int, default=4)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--min-weight", type=float, default=1e-3, help="Drop smaller weights to keep the file small")
+    args = parser.parse_args()
+
+    logged = load_examples(args.inputs, "llm_is_similar")
+    train_part, holdout = split_holdout(logged, args.holdout)
+    if not holdout or not any(label for _, label in holdout):
+        sys.exit(f"Held-out split of {len(logged)} logged replies has no treasure-giving examples; log more turns first")
+    examples = train_part + load_examples(args.extra, "label")
+    bias, weights, used = train(
+        examples, args.buckets, args.ngram_min, args.ngram_max,
+        args.epochs, args.learning_rate, args.l2
+    )
+    kept = {str(k): round(w, 4) for k, w in sorted(weights.items()) if abs(w) >= args.min_weight}
+    kept_weights = {int(k): w for k, w in kept.items()}
+    evaluation = evaluate(holdout, round(bias, 4), kept_weights, args.buckets, args.ngram_min, args.ngram_max, args.low)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "n_buckets": args.buckets,
+            "ngram_min": args.ngram_min,
+            "ngram_max": args.ngram_max,
+            "bias": round(bias, 4),
+            "trained_on": used,
+            "holdout": evaluation,
+            "weights": kept
+        }, f, separators=(",", ":"))
+    print(f"Trained on {used}/{len(examples)} examples (rest rejected by prefilter), kept {len(kept)} weights -> {args.output}")
+    print(
+        f"Held-out at low={args.low}: {evaluation['ruled_out']}/{evaluation['examples']} ruled out locally, "
+        f"{evaluation['false_negatives']}/{evaluation['positives']} treasure-giving replies missed"
+    )
+
+
+if __name__ == "__main__":
+    main()
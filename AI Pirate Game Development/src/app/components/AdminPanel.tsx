@@ -1,5 +1,61 @@
 import { useState, useEffect } from "react";
-import { Save, RefreshCw, Trash2, LayoutDashboard, Mic, Key, Globe, Activity } from "lucide-react";
+import { Save, RefreshCw, Trash2, LayoutDashboard, Mic, Key, Globe, Activity, Coins } from "lucide-react";
+
+// Sumy z backendowego rejestru zużycia (GET /api/admin/usage)
+type UsageTotals = {
+  calls: number;
+  prompt_tokens: number;
+  completion_tokens: number;
+  total_tokens: number;
+  characters: number;
+  cost_usd: number;
+  avg_latency_seconds: number | null;
+};
+
+type UsageSummary = {
+  entries: number;
+  games: number;
+  budget_switches: number;
+  total: UsageTotals;
+  by_difficulty: Record<string, UsageTotals>;
+  by_model: Record<string, UsageTotals>;
+  by_stage: Record<string, UsageTotals>;
+};
+
+function UsageTable({ title, rows }: { title: string; rows: Record<string, UsageTotals> }) {
+  const entries = Object.entries(rows);
+  return (
+    <div>
+      <h3 className="text-xs font-bold text-gray-500 mb-2 uppercase">{title}</h3>
+      {entries.length === 0 ? (
+        <p className="text-xs text-gray-600">Brak danych</p>
+      ) : (
+        <table className="w-full text-xs font-mono">
+          <thead>
+            <tr className="text-gray-500 text-left">
+              <th className="py-1">Klucz</th>
+              <th className="py-1 text-right">Wywołania</th>
+              <th className="py-1 text-right">Tokeny</th>
+              <th className="py-1 text-right">Znaki</th>
+              <th className="py-1 text-right">Koszt $</th>
+            </tr>
+          </thead>
+          <tbody>
+            {entries.map(([key, t]) => (
+              <tr key={key} className="border-t border-gray-800">
+                <td className="py-1 text-white break-all">{key}</td>
+                <td className="py-1 text-right">{t.calls}</td>
+                <td className="py-1 text-right">{t.total_tokens}</td>
+                <td className="py-1 text-right">{t.characters}</td>
+                <td className="py-1 text-right">{t.cost_usd.toFixed(4)}</td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+      )}
+    </div>
+  );
+}
 
 export function AdminPanel() {
   // Stan konfiguracji
@@ -7,6 +63,7 @@ export function AdminPanel() {
     baseUrl: "http://localhost:8000",
     endpoints: { zoltodziob: "", korsarz: "", duch: "" },
     apiKeys: { elevenLabs: "", openai: "" }, // Nowość: Klucze
+    adminToken: "", // ADMIN_TOKEN backendu (wymagany przez /api/admin/*)
     selectedMicId: "" // Nowość: Wybrany mikrofon
   });
 
@@ -14,6 +71,8 @@ export function AdminPanel() {
   const [isLocked, setIsLocked] = useState(true);
   const [password, setPassword] = useState("");
   const [status, setStatus] = useState<string>("");
+  const [usage, setUsage] = useState<UsageSummary | null>(null);
+  const [usageError, setUsageError] = useState<string>("");
 
   // Ładowanie configu i urządzeń
   useEffect(() => {
@@ -50,6 +109,25 @@ export function AdminPanel() {
     }
   };
 
+  const loadUsage = async () => {
+    setUsageError("");
+    try {
+        const res = await fetch(`${config.baseUrl}/api/admin/usage`, {
+            headers: { Authorization: `Bearer ${config.adminToken || ""}` }
+        });
+        if (res.status === 401) throw new Error("nieprawidłowy token administratora");
+        if (res.status === 404) throw new Error("ADMIN_TOKEN nie jest ustawiony na backendzie");
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        setUsage(await res.json());
+    } catch (e) {
+        setUsageError(`❌ Nie udało się pobrać zużycia: ${(e as Error).message}`);
+    }
+  };
+
+  useEffect(() => {
+    if (!isLocked) loadUsage();
+  }, [isLocked]);
+
   if (isLocked) {
     return (
       <div className="min-h-screen bg-[#0a0a0a] flex items-center justify-center text-white p-4 font-mono">
@@ -167,10 +245,44 @@ export function AdminPanel() {
                             className="w-full bg-black border border-gray-700 p-3 rounded text-white font-mono text-sm focus:border-purple-500 outline-none"
                         />
                     </div>
+                    <div>
+                        <label className="block text-xs font-bold text-gray-500 mb-1">Token administratora (ADMIN_TOKEN)</label>
+                        <input 
+                            type="password" 
+                            value={config.adminToken || ""}
+                            onChange={(e) => setConfig({...config, adminToken: e.target.value})}
+                            className="w-full bg-black border border-gray-700 p-3 rounded text-white font-mono text-sm focus:border-purple-500 outline-none"
+                        />
+                        <p className="text-xs text-gray-600 mt-2">Wymagany do odczytu zużycia API.</p>
+                    </div>
                 </section>
             </div>
         </div>
 
+        {/* 3. ZUŻYCIE API (tokeny i koszt) */}
+        <section className="bg-gray-900 p-6 rounded-xl border border-gray-800 shadow-lg space-y-6">
+            <div className="flex justify-between items-center">
+                <h2 className="text-xl font-bold text-yellow-400 flex items-center gap-2"><Coins size={20}/> Zużycie API</h2>
+                <button onClick={loadUsage} className="bg-yellow-900/30 text-yellow-400 px-3 py-2 rounded border border-yellow-900 hover:bg-yellow-900/50"><RefreshCw size={18}/></button>
+            </div>
+            {usageError && <p className="text-xs font-mono">{usageError}</p>}
+            {usage && (
+                <>
+                    <div className="grid grid-cols-2 md:grid-cols-4 gap-4 text-center">
+                        <div><p className="text-2xl font-bold text-white">{usage.total.total_tokens}</p><p className="text-xs text-gray-500">Tokeny</p></div>
+                        <div><p className="text-2xl font-bold text-white">${usage.total.cost_usd.toFixed(4)}</p><p className="text-xs text-gray-500">Koszt</p></div>
+                        <div><p className="text-2xl font-bold text-white">{usage.games}</p><p className="text-xs text-gray-500">Gry</p></div>
+                        <div><p className="text-2xl font-bold text-white">{usage.budget_switches}</p><p className="text-xs text-gray-500">Przełączenia budżetu</p></div>
+                    </div>
+                    <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
+                        <UsageTable title="Poziom trudności" rows={usage.by_difficulty} />
+                        <UsageTable title="Etap" rows={usage.by_stage} />
+                        <UsageTable title="Model" rows={usage.by_model} />
+                    </div>
+                </>
+            )}
+        </section>
+
         {/* FOOTER ACTIONS */}
         <div className="fixed bottom-0 left-0 right-0 p-6 bg-[#0a0a0a]/90 backdrop-blur border-t border-gray-800 flex justify-center gap-4">
             <button onClick={handleReset} className="px-8 py-4 bg-red-900/20 hover:bg-red-900/40 text-red-500 border border-red-900/50 rounded-xl font-bold flex items-center gap-2 transition-all">